@@ -1,4 +1,3 @@
-import json
 import logging
 from contextlib import asynccontextmanager
 
@@ -17,16 +16,60 @@ from src.storage.session_handler import (
     load_session_messages,
     list_sessions,
     delete_session,
+    history_writer,
 )
-from langchain_core.messages import AIMessageChunk
+from src.storage.checkpointer import checkpoint_store
+from src.agents.compaction import COMPACTION_WAIT, compactor
+from src.context import TurnCancelled, current_session_id, current_turn_cancelled
+from src.tools.database import pool_stats, close_pool, cancel_session_queries, init_datasources
+from src.tools.query_cache import QUERY_CACHE_ENABLED, query_cache
+from src.tools.datasets import dataset_store
+from src.tools.question_cache import question_cache
+from src.model import prompt_cache_usage
+from src.ws_frames import WS_MSGPACK_ENABLED, FrameSender, frame_stats
+from src.turn_stream import WS_RESUME_GRACE, TurnStream, resume_stats
+from src.router import RESEARCH, VISUALIZATION, route_message, router_stats
+from src.agents.research_agent import run_research
+from src.agents.visualization_agent import run_visualization, _CHART_PATH_RE
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from collections import deque
 import asyncio
+import json
 import os
+import threading
+import time
+
 
+# While a turn is running, new messages are queued ("queue") or refused ("reject")
+WS_BUSY_POLICY = os.getenv("WS_BUSY_POLICY", "queue").lower()
+WS_MAX_QUEUED_TURNS = int(os.getenv("WS_MAX_QUEUED_TURNS", "3"))
+# How long a cancelled turn gets to clean up when its session is closed
+WS_CANCEL_GRACE = float(os.getenv("WS_CANCEL_GRACE", "2"))
+
+_CANCELLED_NOTE = "Cancelled by the user."
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_chat_history()
+    history_writer.start()
+    try:
+        init_datasources()
+    except Exception as e:
+        logging.getLogger(__name__).warning("Database datasources not configured: %s", e)
+    await checkpoint_store.open()
+    main_agent.checkpointer = checkpoint_store.saver
+    maintenance = asyncio.create_task(checkpoint_store.run_maintenance(_conversations.keys()))
+    version_checks = asyncio.create_task(query_cache.run_version_checks()) if QUERY_CACHE_ENABLED else None
     yield
+    maintenance.cancel()
+    if version_checks is not None:
+        version_checks.cancel()
+    for conversation in list(_conversations.values()):
+        await conversation.close()
+    await checkpoint_store.close()
+    # Last, so messages of the turns cancelled above are written too
+    await history_writer.stop()
+    close_pool()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -75,40 +118,331 @@ def _extract_reasoning_and_text(chunk: AIMessageChunk) -> tuple[str, str]:
 
 @app.get("/sessions")
 async def get_sessions():
-    return JSONResponse(content=list_sessions())
+    await history_writer.flush()
+    return JSONResponse(content=await asyncio.to_thread(list_sessions))
 
 
 @app.delete("/sessions/{session_id}")
 async def remove_session(session_id: str):
-    delete_session(session_id)
+    conversation = _conversations.pop(session_id, None)
+    if conversation is not None:
+        await conversation.close()
+    await history_writer.flush()
+    await asyncio.to_thread(delete_session, session_id)
+    dataset_store.drop_session(session_id)
+    await checkpoint_store.delete_thread(session_id)
     return JSONResponse(content={"status": "deleted"})
 
 
+@app.get("/metrics")
+async def get_metrics():
+    return JSONResponse(content={
+        "db_pool": pool_stats(),
+        "query_cache": query_cache.stats(),
+        "question_cache": question_cache.stats(),
+        "datasets": dataset_store.stats(),
+        "prompt_cache": prompt_cache_usage.stats(),
+        "router": router_stats.stats(),
+        "checkpoints": checkpoint_store.stats(),
+        "compaction": compactor.stats(),
+        "chat_history": history_writer.stats(),
+        "websocket": frame_stats.stats(),
+        "turn_resume": resume_stats.stats(),
+    })
+
+
 # ── WebSocket with persistent chat history ──
 
+_SUB_AGENTS = {RESEARCH: run_research, VISUALIZATION: run_visualization}
 
-@app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
 
-    session_id = websocket.query_params.get("session_id") or create_session()
-    config = {"configurable": {"thread_id": session_id}}
+class _TurnAnswer:
+    """
+    The visible answer of one turn as (agent, text) segments: supervisor tokens
+    plus sub-agent answers streamed in pass-through mode. A sub-agent's
+    segments are dropped when it withdraws a speculative answer.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.first_token_after: float | None = None
+        self._segments: list[tuple[str, str]] = []
+        self.charts: list[str] = []
+
+    def append(self, agent: str, text: str) -> None:
+        if self.first_token_after is None:
+            self.first_token_after = time.perf_counter() - self.started
+        self._segments.append((agent, text))
+
+    def reset(self, agent: str) -> None:
+        self._segments = [s for s in self._segments if s[0] != agent]
+
+    def has(self, agent: str) -> bool:
+        return any(a == agent for a, _ in self._segments)
+
+    def text(self) -> str:
+        return "".join(text for _, text in self._segments)
+
+
+async def _send_custom_event(stream: TurnStream, chunk, answer: _TurnAnswer) -> None:
+    """Forwards a sub-agent stream-writer event (answer / chart / tasks / progress text) to the client."""
+    if not isinstance(chunk, dict):
+        return
+    agent = chunk.get("agent", "sub_agent")
+    if "answer" in chunk:
+        answer.append(agent, chunk["answer"])
+        await stream.send({"type": "chunk", "data": chunk["answer"]})
+    elif chunk.get("answer_reset"):
+        # The streamed text was an intermediate step, not the answer: the client redraws from data
+        answer.reset(agent)
+        await stream.send({"type": "chunk_reset", "data": answer.text()})
+    elif "chart" in chunk:
+        filename = os.path.basename(chunk["chart"])
+        chart_url = f"/charts/{filename}"
+        answer.charts.append(chart_url)
+        await stream.send({"type": "chart", "data": chart_url})
+    elif "tasks" in chunk:
+        await stream.send({
+            "type": "tasks_split",
+            "data": chunk["tasks"],
+            "agent": chunk.get("agent", "deep_research_agent"),
+        })
+    elif "text" in chunk:
+        await stream.send({
+            "type": "reasoning",
+            "data": chunk["text"],
+            "agent": agent,
+        })
+
+
+async def _run_direct(stream: TurnStream, target: str, message: str, answer: _TurnAnswer) -> None:
+    """
+    Runs a sub-agent without the supervisor hop: its progress events and
+    answer tokens are forwarded as they happen.
+    """
+    events: asyncio.Queue = asyncio.Queue()
 
-    history = load_session_messages(session_id)
-    await websocket.send_text(json.dumps({
-        "type": "session_init",
-        "session_id": session_id,
-        "history": history,
-    }))
+    async def run() -> str:
+        try:
+            return await _SUB_AGENTS[target](message, events.put_nowait, True)
+        finally:
+            events.put_nowait(None)
 
+    task = asyncio.create_task(run())
     try:
-        while True:
-            data = await websocket.receive_text()
-            save_user_message(session_id, data)
+        while (event := await events.get()) is not None:
+            await _send_custom_event(stream, event, answer)
+    except BaseException:
+        task.cancel()
+        raise
+    result = await task
+
+    if not answer.has(target):
+        # Nothing was streamed (e.g. an error message): send the returned text, minus
+        # the chart paths that already went out as chart events
+        result = "\n".join(
+            line for line in result.splitlines() if not _CHART_PATH_RE.fullmatch(line.strip())
+        ).strip()
+        if result:
+            answer.append(target, result)
+            await stream.send({"type": "chunk", "data": result})
+
+
+async def _record_direct_turn(config: dict, question: str, answer: str) -> None:
+    """Appends a routed turn to the supervisor's thread so later follow-ups see it."""
+    try:
+        await main_agent.aupdate_state(
+            config,
+            {"messages": [HumanMessage(content=question), AIMessage(content=answer or "No result")]},
+            as_node="model",
+        )
+    except Exception as e:
+        logging.getLogger(__name__).warning("Could not record routed turn in supervisor state: %s", e)
 
-            try:
-                ai_response_parts: list[str] = []
 
+def _parse_client_message(raw: str) -> tuple[str, str]:
+    """
+    (kind, text) of a client frame. Plain text is a chat message; JSON frames
+    may be {"type": "cancel"} or {"type": "message", "content": "..."}.
+    """
+    if raw.startswith("{"):
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict) and payload.get("type") in ("cancel", "message"):
+            return payload["type"], str(payload.get("content") or "")
+    return "message", raw
+
+
+async def _close_cancelled_turn(config: dict, partial: str) -> None:
+    """
+    Leaves the supervisor's thread valid after a cancelled turn: tool calls
+    that never got a result are answered, and the turn ends with an AI
+    message holding whatever answer had streamed.
+    """
+    try:
+        state = await main_agent.aget_state(config)
+        messages = state.values.get("messages", [])
+        if not messages:
+            return
+        last = messages[-1]
+        answered = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+        last_ai = next((m for m in reversed(messages) if isinstance(m, AIMessage)), None)
+        updates = [
+            ToolMessage(content=_CANCELLED_NOTE, tool_call_id=call["id"], name=call["name"])
+            for call in (last_ai.tool_calls if last_ai is not None else [])
+            if call["id"] not in answered
+        ]
+        if not updates and isinstance(last, AIMessage):
+            return
+        updates.append(AIMessage(content=f"{partial} [cancelled]" if partial else _CANCELLED_NOTE))
+        await main_agent.aupdate_state(
+            config, {"messages": updates}, as_node="model" if isinstance(last, HumanMessage) else "tools",
+        )
+    except Exception as e:
+        logging.getLogger(__name__).warning("Could not close cancelled turn in supervisor state: %s", e)
+
+
+class _Conversation:
+    """
+    The turns of one chat session. One turn runs at a time as its own task,
+    so the receive loop keeps reading and can cancel it; messages that
+    arrive meanwhile wait in an inbox (or are refused, per WS_BUSY_POLICY).
+
+    Turns stream into a TurnStream rather than a socket: a client that drops
+    and reconnects within WS_RESUME_GRACE picks the turn up where it left
+    off, and a turn nobody comes back for is cancelled.
+    """
+
+    def __init__(self, session_id: str, has_history: bool) -> None:
+        self.session_id = session_id
+        self.config = {"configurable": {"thread_id": session_id}}
+        self.stream = TurnStream(on_detach=self._orphaned)
+        self.has_history = has_history
+        self.answer = _TurnAnswer()
+        self.compaction: asyncio.Task | None = None
+        self.inbox: deque[str] = deque()
+        self.turn: asyncio.Task | None = None
+        self._cancelled: threading.Event | None = None
+        self._orphan_timer: asyncio.Task | None = None
+
+    @property
+    def busy(self) -> bool:
+        return self.turn is not None and not self.turn.done()
+
+    async def attach(self, frames: FrameSender, turn_id: str | None = None, after: int = 0) -> None:
+        """
+        Streams to ``frames`` from now on. With the ``turn_id`` and last ``seq``
+        the client saw, missed events of that turn are replayed first; if some
+        were already evicted, the answer so far is resent in one piece instead.
+        """
+        if self._orphan_timer is not None:
+            self._orphan_timer.cancel()
+            self._orphan_timer = None
+        if turn_id:
+            events = self.stream.replay(turn_id, after)
+            gap = events is None and turn_id == self.stream.turn_id
+            if gap:
+                events = [
+                    {"type": "turn_start", "turn_id": turn_id, "seq": 1},
+                    {"type": "chunk_reset", "data": self.answer.text(), "seq": self.stream.seq},
+                ]
+                events += [{"type": "chart", "data": url} for url in self.answer.charts]
+                if not self.busy:
+                    events.append({"type": "done"})
+            for event in events or ():
+                await frames.send(event)
+            resume_stats.record_resume(len(events or ()), gap)
+        self.stream.attach(frames)
+
+    def detach(self, frames: FrameSender) -> None:
+        """The socket behind ``frames`` closed: the session waits WS_RESUME_GRACE for it to come back."""
+        self.stream.detach(frames)
+
+    def _orphaned(self) -> None:
+        # The stream lost its listener (closed socket or a send to a stalled client)
+        if self._orphan_timer is None:
+            self._orphan_timer = asyncio.create_task(self._expire())
+
+    async def _expire(self) -> None:
+        await asyncio.sleep(WS_RESUME_GRACE)
+        self._orphan_timer = None
+        if self.stream.listener is not None:
+            return
+        if self.busy:
+            logging.getLogger(__name__).info("session %s: no client for %gs, cancelling its turn", self.session_id, WS_RESUME_GRACE)
+            resume_stats.record_orphaned()
+        if _conversations.get(self.session_id) is self:
+            del _conversations[self.session_id]
+        await self.close()
+
+    def submit(self, data: str) -> int | None:
+        """Starts or queues a message; returns its place in the queue (0 = started), None if refused."""
+        if not self.busy:
+            self._start(data)
+            return 0
+        if WS_BUSY_POLICY == "reject" or len(self.inbox) >= WS_MAX_QUEUED_TURNS:
+            return None
+        self.inbox.append(data)
+        return len(self.inbox)
+
+    def cancel(self) -> bool:
+        """
+        Cancels the running turn: its task (model stream, sub-agents), its SQL
+        statements server-side, and the blocking work it has in threads.
+        Queued messages still run afterwards.
+        """
+        if not self.busy:
+            return False
+        self._cancelled.set()
+        cancel_session_queries(self.session_id)
+        self.turn.cancel()
+        return True
+
+    async def close(self) -> None:
+        self.inbox.clear()
+        if self._orphan_timer is not None:
+            self._orphan_timer.cancel()
+        if self.cancel():
+            await asyncio.wait({self.turn}, timeout=WS_CANCEL_GRACE)
+        if self.compaction is not None:
+            self.compaction.cancel()
+
+    def _start(self, data: str) -> None:
+        self._cancelled = threading.Event()
+        self.turn = asyncio.create_task(self._run(data, self._cancelled))
+        self.turn.add_done_callback(self._next)
+
+    def _next(self, task: asyncio.Task) -> None:
+        if task.cancelled():
+            # Cancelled before its first step, so _run never got to say so
+            asyncio.create_task(self.stream.send({"type": "cancelled"}))
+        if self.inbox:
+            self._start(self.inbox.popleft())
+
+    async def _run(self, data: str, cancelled: threading.Event) -> None:
+        # Runs in the task's own context copy: DB and chart threads it starts see this flag
+        current_turn_cancelled.set(cancelled)
+        session_id, config, stream = self.session_id, self.config, self.stream
+        answer = self.answer = _TurnAnswer()
+        route = None
+        # Everything after turn_start is inside the try, so every exit sends done/cancelled/error
+        try:
+            await stream.send({"type": "turn_start", "turn_id": stream.begin()})
+            save_user_message(session_id, data)
+            if self.compaction is not None and not self.compaction.done():
+                # Never run a turn on a thread that is being rewritten
+                try:
+                    await asyncio.wait_for(self.compaction, COMPACTION_WAIT)
+                except asyncio.TimeoutError:
+                    logging.getLogger(__name__).warning("Compaction of %s took too long, cancelled", session_id)
+
+            route = await route_message(data, session_id, self.has_history)
+            if route.direct:
+                await _run_direct(stream, route.target, data, answer)
+                await _record_direct_turn(config, data, answer.text())
+            else:
                 async for stream_mode, chunk in main_agent.astream(
                     {"messages": [{"role": "user", "content": data}]},
                     config=config,
@@ -120,53 +454,111 @@ async def websocket_endpoint(websocket: WebSocket):
                         if isinstance(token, AIMessageChunk):
                             reasoning_text, output_text = _extract_reasoning_and_text(token)
                             if reasoning_text:
-                                await websocket.send_text(
-                                    json.dumps({"type": "reasoning", "data": reasoning_text, "agent": "main_agent"})
-                                )
+                                await stream.send({"type": "reasoning", "data": reasoning_text, "agent": "main_agent"})
                             if output_text:
-                                ai_response_parts.append(output_text)
-                                await websocket.send_text(
-                                    json.dumps({"type": "chunk", "data": output_text})
-                                )
+                                answer.append("main_agent", output_text)
+                                await stream.send({"type": "chunk", "data": output_text})
 
                     elif stream_mode == "custom":
-                        if isinstance(chunk, dict):
-                            if "chart" in chunk:
-                                filename = os.path.basename(chunk["chart"])
-                                chart_url = f"/charts/{filename}"
-                                await websocket.send_text(
-                                    json.dumps({"type": "chart", "data": chart_url})
-                                )
-                            elif "tasks" in chunk:
-                                await websocket.send_text(
-                                    json.dumps({
-                                        "type": "tasks_split",
-                                        "data": chunk["tasks"],
-                                        "agent": chunk.get("agent", "deep_research_agent"),
-                                    })
-                                )
-                            elif "text" in chunk:
-                                await websocket.send_text(
-                                    json.dumps({
-                                        "type": "reasoning",
-                                        "data": chunk["text"],
-                                        "agent": chunk.get("agent", "sub_agent"),
-                                    })
-                                )
-
-                await websocket.send_text(json.dumps({"type": "done"}))
-
-                full_response = "".join(ai_response_parts)
-                if full_response:
-                    asyncio.create_task(
-                        asyncio.to_thread(save_ai_message, session_id,full_response)
-                    )
-            except Exception as e:
-                await websocket.send_text(
-                    json.dumps({"type": "error", "message": str(e)})
+                        await _send_custom_event(stream, chunk, answer)
+
+            await stream.send({"type": "done"})
+            self.has_history = True
+            if answer.first_token_after is not None:
+                logging.getLogger(__name__).info(
+                    "session %s: %s, first answer token after %.2fs, done after %.2fs",
+                    session_id, route.target, answer.first_token_after, time.perf_counter() - answer.started,
                 )
+        except (asyncio.CancelledError, TurnCancelled):
+            # The turn is over either way; clean-up below must not be cut short by the same cancel
+            asyncio.current_task().uncancel()
+            logging.getLogger(__name__).info(
+                "session %s: turn cancelled after %.2fs", session_id, time.perf_counter() - answer.started,
+            )
+            if route is None:
+                pass  # Stopped before it reached an agent: the supervisor's thread is untouched
+            elif route.direct:
+                await _record_direct_turn(config, data, f"{answer.text()} [cancelled]")
+            else:
+                await _close_cancelled_turn(config, answer.text())
+            self.has_history = True
+            await stream.send({"type": "cancelled"})
+        except Exception as e:
+            cancel_session_queries(session_id)
+            await stream.send({"type": "error", "message": str(e)})
+            return
+
+        full_response = answer.text()
+        if full_response:
+            save_ai_message(session_id, full_response)
+        await checkpoint_store.prune_thread(session_id)
+        # Summarize old turns in the background once the thread is over its token budget
+        self.compaction = asyncio.create_task(compactor.compact(main_agent, config))
+
+
+# Sessions with a client attached or a turn waiting for its client to come back.
+# Their checkpoints are never expired as idle.
+_conversations: dict[str, _Conversation] = {}
+
+
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    await websocket.accept()
+
+    params = websocket.query_params
+    session_id = params.get("session_id") or create_session()
+    # Lets DB code find (and cancel) the statements this session's turns start
+    current_session_id.set(session_id)
+    # Token events are coalesced into fewer frames; ?encoding=msgpack switches to binary frames
+    frames = FrameSender(websocket, binary=WS_MSGPACK_ENABLED and params.get("encoding") == "msgpack")
+
+    await history_writer.flush()
+    history = await asyncio.to_thread(load_session_messages, session_id)
+    conversation = _conversations.get(session_id)
+    if conversation is None:
+        conversation = _conversations[session_id] = _Conversation(session_id, has_history=bool(history))
+    # ?turn_id=...&after=<last seq> resumes a turn the client was following when it dropped
+    resume_turn = params.get("turn_id")
+    resumed = resume_turn is not None and resume_turn == conversation.stream.turn_id
+    await frames.send({
+        "type": "session_init",
+        "session_id": session_id,
+        "history": history,
+        "encoding": frames.encoding,
+        "resumed": resumed,
+    })
+    if resumed:
+        try:
+            after = int(params.get("after") or 0)
+        except ValueError:
+            after = 0
+        await conversation.attach(frames, resume_turn, after)
+    elif conversation.busy:
+        # A fresh page on a session with a turn in flight: replay that turn from its start
+        await conversation.attach(frames, conversation.stream.turn_id, 0)
+    else:
+        await conversation.attach(frames)
+
+    try:
+        while True:
+            kind, data = _parse_client_message(await websocket.receive_text())
+            if kind == "cancel":
+                if not conversation.cancel():
+                    await frames.send({"type": "cancelled"})
+                continue
+            if not data.strip():
+                continue
+            position = conversation.submit(data)
+            if position is None:
+                await frames.send({"type": "busy", "message": "A response is still in progress"})
+            elif position:
+                await frames.send({"type": "queued", "position": position})
     except WebSocketDisconnect:
         pass
+    finally:
+        # The turn keeps running (into its buffer) for a while in case the client reconnects
+        conversation.detach(frames)
+        await frames.close()
 
 
 @app.get("/")
@@ -0,0 +1,44 @@
+"""
+Per-turn overhead of building the sub-agent graphs: compiling them on every
+tool call (previous behaviour) vs reusing the graphs compiled once at startup.
+
+No model calls are made; only graph construction and compilation are timed.
+
+    python -m benchmarks.agent_build_bench [--turns 50]
+"""
+import argparse
+import time
+
+
+def _timed(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=50)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    from src.agents import research_agent, visualization_agent
+    import_ms = (time.perf_counter() - started) * 1000
+
+    agents = {
+        "research": (research_agent._create_research_agent, research_agent.get_research_agent),
+        "visualization": (visualization_agent._create_visualization_agent, visualization_agent.get_visualization_agent),
+    }
+    print(f"module import: {import_ms:.0f}ms\n")
+    print(f"{'agent':<14} {'startup ms':>11} {'rebuild/turn ms':>16} {'cached/turn ms':>15} {'saved over N turns':>19}")
+    for name, (build, get) in agents.items():
+        startup_ms = _timed(get, 1)
+        rebuild_ms = _timed(build, args.turns)
+        cached_ms = _timed(get, args.turns)
+        saved = (rebuild_ms - cached_ms) * args.turns
+        print(f"{name:<14} {startup_ms:>11.1f} {rebuild_ms:>16.2f} {cached_ms:>15.4f} {saved:>17.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
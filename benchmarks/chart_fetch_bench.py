@@ -0,0 +1,86 @@
+"""
+Rows/sec and peak RSS of the chart data paths against the configured database
+(.env): the previous fetchall() -> DataFrame path vs the bulk path in
+src/charts/base.py (COPY on PostgreSQL, batched fetchmany on SQL Server).
+
+Each measurement runs in a fresh subprocess so peak RSS is not shared.
+
+    python -m benchmarks.chart_fetch_bench [--rows 100000 200000] [--query "SELECT ..."]
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+# Synthetic scatter/line-shaped result: numeric, timestamp and text columns
+PG_QUERY = (
+    "SELECT g AS x, random() * 1000 AS y, now() - g * interval '1 second' AS ts, "
+    "md5(g::text) AS label FROM generate_series(1, {rows}) AS g"
+)
+SQLSERVER_QUERY = (
+    "SELECT TOP ({rows}) ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) AS x, RAND(CHECKSUM(NEWID())) * 1000 AS y, "
+    "SYSDATETIME() AS ts, CONVERT(VARCHAR(32), NEWID()) AS label FROM sys.all_objects a CROSS JOIN sys.all_objects b"
+)
+
+
+def _child(mode, query):
+    import pandas as pd
+
+    from src.charts import base
+    from src.tools.database import get_connection
+
+    started = time.perf_counter()
+    with get_connection(analytical=True) as (connection, db_type):
+        if mode == "legacy":
+            cursor = connection.cursor()
+            cursor.execute(query)
+            results = cursor.fetchall()
+            df = pd.DataFrame(results, columns=[desc[0] for desc in cursor.description])
+            cursor.close()
+        elif db_type == "postgresql":
+            df = base._copy_to_frame(connection, query)
+        else:
+            cursor = connection.cursor()
+            cursor.execute(query)
+            df = base._fetch_frame_batched(cursor)
+            cursor.close()
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "rows": len(df),
+        "seconds": elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "dtypes": {str(k): str(v) for k, v in df.dtypes.items()},
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 500000])
+    parser.add_argument("--query", help="custom query; {rows} is substituted if present")
+    parser.add_argument("--child", choices=["legacy", "bulk"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.query)
+        return
+
+    from src.tools.database import current_db_type
+
+    template = args.query or (PG_QUERY if current_db_type() == "postgresql" else SQLSERVER_QUERY)
+    print(f"{'rows':>9} {'path':<7} {'seconds':>8} {'rows/sec':>11} {'peak RSS MB':>12}")
+    for rows in args.rows:
+        query = template.format(rows=rows)
+        for mode in ("legacy", "bulk"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.chart_fetch_bench", "--child", mode, "--query", query],
+                capture_output=True, text=True, check=True,
+            )
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            rate = result["rows"] / result["seconds"] if result["seconds"] else 0
+            print(f"{result['rows']:>9} {mode:<7} {result['seconds']:>8.2f} {rate:>11,.0f} {result['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
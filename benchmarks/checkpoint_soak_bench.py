@@ -0,0 +1,100 @@
+"""
+Soak test for the supervisor checkpointer: many turns over many threads,
+with and without the per-turn pruning and thread cap of CheckpointStore.
+
+A stand-in graph replaces the agents (no model calls): each turn appends a
+question and a ~2KB answer, and a nested sub-graph writes its own
+checkpoints the way the sub-agents do inside a tool call.
+
+    python -m benchmarks.checkpoint_soak_bench [--backend memory|sqlite] [--threads 50] [--turns 2000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+
+class _State(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+def _build_graph():
+    sub = StateGraph(_State)
+    sub.add_node("step", lambda state: {"messages": [AIMessage(content="x" * 512)]})
+    sub.add_edge(START, "step")
+    sub.add_edge("step", END)
+    sub_agent = sub.compile()
+
+    async def tool(state):
+        # Invoked like a sub-agent inside a tool: inherits the checkpointer under its own namespace
+        await sub_agent.ainvoke({"messages": [HumanMessage(content="sub-question")]})
+        return {}
+
+    graph = StateGraph(_State)
+    graph.add_node("tool", tool)
+    graph.add_node("model", lambda state: {"messages": [AIMessage(content="y" * 2048)]})
+    graph.add_edge(START, "tool")
+    graph.add_edge("tool", "model")
+    graph.add_edge("model", END)
+    return graph
+
+
+async def _soak(store, threads: int, turns: int, prune: bool, report_every: int) -> None:
+    graph = _build_graph().compile(checkpointer=store.saver)
+    tracemalloc.start()
+    started = time.perf_counter()
+    print(f"{'turns':>7} {'traced MB':>10} {'checkpoints':>12} {'file MB':>8}")
+    for turn in range(1, turns + 1):
+        thread_id = f"soak-{random.randrange(threads)}"
+        await graph.ainvoke(
+            {"messages": [HumanMessage(content=f"question {turn}")]},
+            {"configurable": {"thread_id": thread_id}},
+        )
+        if prune:
+            await store.prune_thread(thread_id)
+        if turn % report_every == 0:
+            current, _ = tracemalloc.get_traced_memory()
+            stats = store.stats()
+            count = stats.get("checkpoints")
+            if count is None:
+                async with store._sqlite.execute("SELECT COUNT(*) FROM checkpoints") as cursor:
+                    (count,) = await cursor.fetchone()
+            size = os.path.getsize(store.path) / 1e6 if getattr(store, "path", None) else 0.0
+            print(f"{turn:>7} {current / 1e6:>10.1f} {count:>12} {size:>8.1f}")
+    tracemalloc.stop()
+    print(f"{turns / (time.perf_counter() - started):.0f} turns/s\n")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--max-threads", type=int, default=20)
+    args = parser.parse_args()
+
+    from src.storage import checkpointer
+
+    for prune in (False, True):
+        print(f"== {args.backend}, {'pruned' if prune else 'unbounded'} ==")
+        store = checkpointer.CheckpointStore()
+        store.saver.max_threads = args.max_threads
+        with tempfile.TemporaryDirectory() as directory:
+            if args.backend == "sqlite":
+                checkpointer.CHECKPOINT_SQLITE_PATH = store.path = os.path.join(directory, "soak.sqlite")
+                await store._open_sqlite()
+                store.backend = "sqlite"
+            await _soak(store, args.threads, args.turns, prune, max(1, args.turns // 10))
+            await store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
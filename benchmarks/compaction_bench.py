@@ -0,0 +1,91 @@
+"""
+Supervisor input tokens per turn over a long session, with and without
+conversation compaction.
+
+Each simulated turn is a question, the supervisor's tool call and the
+sub-agent's answer (a few KB of tabular text, like research results).
+Compaction runs after every turn as it does in the app. Tokens are the
+same approximate count the compactor uses. By default a stand-in summary of
+~150 tokens is used; --live calls the summary agent on Bedrock.
+
+    python -m benchmarks.compaction_bench [--turns 50] [--threshold 12000] [--live]
+"""
+import argparse
+import asyncio
+import random
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.graph.message import add_messages
+
+
+def _turn(i: int, rng: random.Random) -> list:
+    call_id = f"call_{uuid.uuid4().hex[:8]}"
+    rows = "\n".join(
+        f"| region_{rng.randrange(20)} | service_{rng.randrange(50)} | {rng.uniform(10, 99999):.2f} |"
+        for _ in range(rng.randrange(20, 120))
+    )
+    return [
+        HumanMessage(content=f"Question {i}: what was the total cost per region and service last month?"),
+        AIMessage(content="", tool_calls=[{"id": call_id, "name": "research_agent", "args": {"question": f"question {i}"}}]),
+        ToolMessage(
+            content=f"Cost per region and service:\n| region | service | cost |\n|---|---|---|\n{rows}\n\nTotal rows: 120",
+            tool_call_id=call_id,
+            name="research_agent",
+        ),
+    ]
+
+
+async def _stand_in_summary(messages: list) -> str:
+    return "- " + "\n- ".join(f"Asked: {m.text[:60]}" for m in messages if isinstance(m, HumanMessage))[:600]
+
+
+async def _session(turns: int, compactor, system_tokens: int) -> list[int]:
+    rng = random.Random(7)
+    history: list = []
+    per_turn = []
+    for i in range(1, turns + 1):
+        messages = _turn(i, rng)
+        # The supervisor's model call sees the history plus the new question
+        per_turn.append(system_tokens + count_tokens_approximately(history + messages[:1]))
+        history = add_messages(history, messages)
+        if compactor is not None:
+            updates = await compactor.plan(history)
+            if updates:
+                history = add_messages(history, updates)
+    return per_turn
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--threshold", type=int, default=12000)
+    parser.add_argument("--keep-turns", type=int, default=3)
+    parser.add_argument("--live", action="store_true", help="summarize with the Bedrock summary agent")
+    args = parser.parse_args()
+
+    from src.agents.compaction import ConversationCompactor, summarize_with_agent
+    from src.superviser import PROMPT
+
+    system_tokens = count_tokens_approximately([HumanMessage(content=PROMPT)])
+    compactor = ConversationCompactor(
+        summarize=summarize_with_agent if args.live else _stand_in_summary,
+        threshold=args.threshold,
+        keep_turns=args.keep_turns,
+    )
+    baseline = await _session(args.turns, None, system_tokens)
+    compacted = await _session(args.turns, compactor, system_tokens)
+
+    print(f"{'turn':>5} {'no compaction':>14} {'compaction':>11}")
+    for i in range(0, args.turns, max(1, args.turns // 10)):
+        print(f"{i + 1:>5} {baseline[i]:>14} {compacted[i]:>11}")
+    print(f"{args.turns:>5} {baseline[-1]:>14} {compacted[-1]:>11}")
+    total, total_compacted = sum(baseline), sum(compacted)
+    print(f"\ninput tokens over {args.turns} turns: {total} -> {total_compacted} "
+          f"({100 * (1 - total_compacted / total):.0f}% fewer)")
+    print(compactor.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""
+Checks that a slow execute_query does not stall the event loop.
+
+A stand-in driver blocks for --query-seconds in cursor.execute(), the way a
+long psycopg2/pyodbc statement does. While the tool runs, a ticker coroutine
+on the same loop counts how often it gets to run every 10ms. Awaiting the
+tool (the async entry point the agents use) runs the statement on the DB
+executor, so the ticker keeps going; calling the sync entry point on the
+loop is shown for comparison and stalls it.
+
+    python -m benchmarks.db_executor_check [--query-seconds 1] [--concurrent 4]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from contextlib import contextmanager
+
+_TICK = 0.01
+
+
+class _Cursor:
+    description = [("n",)]
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self._rows = [(1,)]
+
+    def execute(self, query: str) -> None:
+        time.sleep(self.seconds)
+
+    def fetchmany(self, size: int) -> list:
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self) -> None:
+        pass
+
+
+async def _ticker(stop: asyncio.Event) -> int:
+    ticks = 0
+    while not stop.is_set():
+        await asyncio.sleep(_TICK)
+        ticks += 1
+    return ticks
+
+
+async def _measure(run) -> tuple[float, int]:
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(stop))
+    started = time.perf_counter()
+    await run()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return elapsed, await ticker
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--query-seconds", type=float, default=1.0)
+    parser.add_argument("--concurrent", type=int, default=4, help="slow queries awaited at once")
+    args = parser.parse_args()
+
+    from src.tools import execute_query as eq
+
+    @contextmanager
+    def connection(**kwargs):
+        yield object(), "postgresql"
+
+    eq.QUERY_CACHE_ENABLED = False
+    eq.current_db_type = lambda: "postgresql"
+    eq.current_datasource = lambda: "check"
+    eq.get_connection = connection
+    eq.check_query_cost = lambda *a: None
+    eq.open_cursor = lambda *a, **kw: _Cursor(args.query_seconds)
+
+    async def awaited():
+        results = await asyncio.gather(*(
+            eq.execute_query.ainvoke({"query": f"SELECT {i} AS n"}) for i in range(args.concurrent)
+        ))
+        assert all(not r.startswith("Error") for r in results), results
+
+    async def blocking():
+        eq.execute_query.invoke({"query": "SELECT 1 AS n"})
+
+    expected = args.query_seconds / _TICK
+    ok = True
+    for name, run, must_progress in (
+        (f"{args.concurrent} x awaited on the DB executor", awaited, True),
+        ("1 x sync call on the loop", blocking, False),
+    ):
+        elapsed, ticks = await _measure(run)
+        progressed = ticks >= 0.5 * expected
+        print(f"{name:<36} {elapsed:>6.2f}s, ticker ran {ticks:>4} times (~{expected:.0f} if never blocked)")
+        if must_progress and not progressed:
+            ok = False
+    print("event loop kept running during slow queries" if ok else "FAILED: the event loop was blocked")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""
+Compares execute_query output formats ("rows" legacy repr vs compact "csv"/"tsv")
+on synthetic result sets shaped like the cars / icrisat_dataset tables.
+
+Offline it reports size, an approximate token count and formatting time.
+With --live it also sends each rendering to the configured Bedrock model and
+reports the real input token count and end-to-end latency of answering a
+question over it.
+
+    python -m benchmarks.result_format_bench [--rows 50] [--live]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.tools.execute_query import _format_results
+from src.tools.result_format import RESULT_FORMATS
+
+
+class _FakeCursor:
+    """Minimal DB-API cursor over in-memory rows."""
+
+    def __init__(self, columns, rows):
+        self.description = [(c,) for c in columns]
+        self._rows = rows
+        self._pos = 0
+
+    def fetchmany(self, size):
+        batch = self._rows[self._pos:self._pos + size]
+        self._pos += len(batch)
+        return batch
+
+
+def _cars_rows(n):
+    columns = ["Id", "Company Names", "Cars Names", "Engines", "CC/Battery Capacity", "HorsePower",
+               "Total Speed", "Performance(0 - 100 )KM/H", "Cars Prices", "Fuel Types", "Seats", "Torque",
+               "Listed At"]
+    rng = random.Random(1)
+    rows = []
+    for i in range(n):
+        rows.append((
+            i + 1, rng.choice(["FERRARI", "ROLLS ROYCE", "FORD", "TOYOTA"]), f"MODEL {rng.randint(1, 999)}",
+            rng.choice(["V8", "V12", "I4"]), f"{rng.randint(990, 6500)} cc", f"{rng.randint(90, 990)} hp",
+            f"{rng.randint(150, 340)} km/h", f"{rng.uniform(2.5, 12):.1f} sec",
+            Decimal(f"{rng.randint(15000, 1100000)}.50"), rng.choice(["Petrol", "Diesel", "plug in hybrid"]),
+            rng.choice([2, 4, 5, 7]), f"{rng.randint(100, 900)} Nm",
+            datetime(2024, 1, 1) + timedelta(hours=rng.randint(0, 9000)),
+        ))
+    return columns, rows
+
+
+def _icrisat_rows(n):
+    crops = ["RICE", "WHEAT", "SORGHUM", "MAIZE", "CHICKPEA", "GROUNDNUT"]
+    columns = ["Dist Code", "Year", "State Name", "Dist Name"]
+    for crop in crops:
+        columns += [f"{crop} AREA (1000 ha)", f"{crop} PRODUCTION (1000 tons)", f"{crop} YIELD (Kg per ha)"]
+    rng = random.Random(2)
+    rows = []
+    for i in range(n):
+        row = [rng.randint(1, 600), 1966 + i % 52, "Andhra Pradesh", f"District {i % 40}"]
+        for _ in crops:
+            row += [Decimal(f"{rng.uniform(0, 500):.2f}"), Decimal(f"{rng.uniform(0, 900):.2f}"),
+                    rng.uniform(0, 4000)]
+        rows.append(tuple(row))
+    return columns, rows
+
+
+def _approx_tokens(text):
+    try:
+        import tiktoken
+
+        return len(tiktoken.get_encoding("cl100k_base").encode(text))
+    except ImportError:
+        return len(text) // 4
+
+
+def _live(text, question):
+    from src.model import bedrock_model
+
+    started = time.perf_counter()
+    reply = bedrock_model.invoke(f"{question}\n\n{text}")
+    elapsed = time.perf_counter() - started
+    usage = getattr(reply, "usage_metadata", None) or {}
+    return usage.get("input_tokens"), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("--live", action="store_true", help="also measure real tokens/latency on Bedrock")
+    args = parser.parse_args()
+
+    datasets = {
+        "cars": (_cars_rows(args.rows), "Which car has the highest price? Answer in one line."),
+        "icrisat": (_icrisat_rows(args.rows), "Which row has the highest rice yield? Answer in one line."),
+    }
+    for name, ((columns, rows), question) in datasets.items():
+        print(f"\n== {name}: {len(rows)} rows x {len(columns)} columns ==")
+        print(f"{'format':<6} {'bytes':>8} {'~tokens':>8} {'format ms':>10}" + ("  live_in_tokens  live_s" if args.live else ""))
+        for fmt in RESULT_FORMATS:
+            started = time.perf_counter()
+            text = _format_results(_FakeCursor(columns, rows), fmt)
+            fmt_ms = (time.perf_counter() - started) * 1000
+            line = f"{fmt:<6} {len(text.encode()):>8} {_approx_tokens(text):>8} {fmt_ms:>10.2f}"
+            if args.live:
+                tokens, elapsed = _live(text, question)
+                line += f"  {tokens!s:>14}  {elapsed:>6.2f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
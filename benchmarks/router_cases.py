@@ -0,0 +1,60 @@
+"""
+Checks the rules-based router on messages that must not skip the supervisor.
+
+Conversational phrases such as "show me", "how many" or "list" also open
+follow-ups and clarifications; routing those straight to the research agent
+loses the conversation history. Only rules are exercised (no router model):
+each negative case must not get a direct research route, and a few real
+data questions are listed to show they still route directly.
+
+    python -m benchmarks.router_cases
+"""
+import sys
+
+# (message, has_history)
+NEGATIVE = [
+    ("how many did you say?", True),
+    ("how many did you say?", False),
+    ("show me that again", True),
+    ("show me", False),
+    ("list them", True),
+    ("how many?", False),
+    ("what was the total again?", True),
+    ("which one is bigger?", False),
+    ("what is the capital of France?", False),
+    ("can you find my previous question", False),
+    ("what is the difference between those two", True),
+    ("how many of them are there", True),
+]
+# (message, has_history, expected target)
+POSITIVE = [
+    ("how many cars are made by Ferrari", False, "research_agent"),
+    ("what is the average rating of movies released after 2010", False, "research_agent"),
+    ("list the districts with the most water bodies", True, "research_agent"),
+    ("top 5 states by rice production", False, "research_agent"),
+    ("plot car prices by fuel type", False, "visualization_agent"),
+]
+
+
+def main():
+    from src.router import RESEARCH, classify
+
+    ok = True
+    for message, has_history in NEGATIVE:
+        route = classify(message, has_history)
+        passed = route is None or route.target != RESEARCH
+        ok &= passed
+        target = route.target if route else "undecided"
+        print(f"no   {message!r:<52} history={has_history!s:<5} -> {target:<20} {'ok' if passed else 'FAILED'}")
+    for message, has_history, expected in POSITIVE:
+        route = classify(message, has_history)
+        passed = route is not None and route.target == expected
+        ok &= passed
+        target = route.target if route else "undecided"
+        print(f"yes  {message!r:<52} history={has_history!s:<5} -> {target:<20} {'ok' if passed else 'FAILED'}")
+    print("router kept conversational messages with the supervisor" if ok else "FAILED: see cases above")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
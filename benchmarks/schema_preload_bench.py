@@ -0,0 +1,77 @@
+"""
+Time to first answer token of the research agent with the compact schema
+preloaded into its prompt vs the previous get_tables-first workflow.
+
+Runs live against the configured Bedrock model and database (.env); each
+question is asked once per variant, alternating, --repeat times.
+
+    python -m benchmarks.schema_preload_bench [--repeat 3] [--question "..."]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from langchain_core.messages import AIMessageChunk
+
+from src.agents import research_agent
+
+QUESTIONS = [
+    "Which car has the highest torque?",
+    "How many movies have more than 100 ratings?",
+    "Which state had the highest total rice production?",
+]
+
+
+async def _run(agent, question):
+    """Returns (seconds to first streamed text token, total seconds, model calls, tool calls)."""
+    started = time.perf_counter()
+    first_token = None
+    model_calls = tool_calls = 0
+    async for mode, chunk in agent.astream(
+        {"messages": [{"role": "user", "content": question}]},
+        stream_mode=["messages", "updates"],
+    ):
+        if mode == "messages":
+            token, _ = chunk
+            if isinstance(token, AIMessageChunk) and token.text and first_token is None:
+                first_token = time.perf_counter() - started
+        else:
+            for node, update in chunk.items():
+                if node == "model":
+                    model_calls += 1
+                elif node == "tools":
+                    tool_calls += len((update or {}).get("messages", []))
+    return first_token, time.perf_counter() - started, model_calls, tool_calls
+
+
+def _build(preload):
+    research_agent.SCHEMA_PRELOAD = preload
+    return research_agent._create_research_agent()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--question", action="append", help="question(s) to ask instead of the built-in set")
+    args = parser.parse_args()
+
+    agents = {"get_tables": _build(False), "preloaded": _build(True)}
+    results = {name: [] for name in agents}
+    for question in args.question or QUESTIONS:
+        for _ in range(args.repeat):
+            for name, agent in agents.items():
+                results[name].append(await _run(agent, question))
+
+    print(f"{'variant':<11} {'ttft p50 s':>11} {'total p50 s':>12} {'model calls':>12} {'tool calls':>11}")
+    for name, runs in results.items():
+        ttft = [r[0] for r in runs if r[0] is not None]
+        print(
+            f"{name:<11} {statistics.median(ttft) if ttft else float('nan'):>11.2f} "
+            f"{statistics.median(r[1] for r in runs):>12.2f} "
+            f"{statistics.mean(r[2] for r in runs):>12.1f} {statistics.mean(r[3] for r in runs):>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
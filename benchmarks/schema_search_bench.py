@@ -0,0 +1,118 @@
+"""
+Build / incremental-update / load / query latency of src/tools/schema_search.py
+on synthetic schemas of 10, 1,000 and 10,000 tables shaped like
+tables_schema.json (the real tables are included so queries have a known answer).
+
+    python -m benchmarks.schema_search_bench [--tables 10 1000 10000] [--queries 200] [--embeddings MODEL]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from src.tools.read_schema_tool import _load_schema
+from src.tools.schema_search import SchemaIndex
+
+_WORDS = (
+    "order customer invoice payment shipment product inventory warehouse supplier region store employee "
+    "department salary campaign click session device account ledger transaction refund subscription plan "
+    "ticket incident asset contract vendor budget forecast sensor reading station route trip vehicle driver "
+    "patient visit diagnosis prescription claim policy premium branch loan deposit crop district rainfall"
+).split()
+_TYPES = ["bigint", "text", "double precision", "timestamp", "boolean", "numeric"]
+
+QUERIES = [
+    ("which car has the highest torque", "cars"),
+    ("total rice production by state", "icrisat_dataset"),
+    ("average rating per movie", "ratings"),
+    ("water bodies encroached in a district", "water_bodies"),
+    ("imdb id of a movie", "links"),
+    ("most common tags users gave", "tags"),
+]
+
+
+def _synthetic_schema(n, real):
+    rng = random.Random(n)
+    tables = list(real)
+    for i in range(max(0, n - len(real))):
+        topic = rng.sample(_WORDS, 3)
+        columns = [{"column_name": "id", "data_type": "bigint", "description": f"Primary key of the {topic[0]} record."}]
+        for _ in range(rng.randint(5, 40)):
+            a, b = rng.sample(_WORDS, 2)
+            columns.append({
+                "column_name": f"{a}_{b}",
+                "data_type": rng.choice(_TYPES),
+                "description": f"The {a} {b} of the {topic[0]} {topic[1]}.",
+            })
+        tables.append({
+            "table_name": f"{topic[0]}_{topic[1]}_{i}",
+            "description": f"Stores {topic[0]} {topic[1]} records for {topic[2]} analysis.",
+            "columns": columns,
+            "relationships": [],
+        })
+    return tables[:n] if n < len(real) else tables
+
+
+def _ms(started):
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--embeddings", default="", help="local sentence-transformers model to fuse in")
+    args = parser.parse_args()
+
+    real = _load_schema()
+    print(f"{'tables':>7} {'build ms':>9} {'update1 ms':>11} {'save ms':>8} {'load ms':>8} {'index KB':>9} "
+          f"{'query p50 ms':>13} {'p95 ms':>8} {'hit@k':>6}")
+    for n in args.tables:
+        tables = _synthetic_schema(n, real)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "schema_index.json")
+            index = SchemaIndex(path=path, embedding_model=args.embeddings)
+
+            started = time.perf_counter()
+            index.update(tables)
+            build_ms = _ms(started)
+
+            changed = json.loads(json.dumps(tables))
+            changed[-1]["description"] += " Updated."
+            started = time.perf_counter()
+            index.update(changed)
+            update_ms = _ms(started)
+
+            started = time.perf_counter()
+            index.save()
+            save_ms = _ms(started)
+            size_kb = os.path.getsize(path) / 1024
+
+            started = time.perf_counter()
+            reloaded = SchemaIndex(path=path, embedding_model=args.embeddings)
+            reloaded.load()
+            load_ms = _ms(started)
+
+            timings, hits, asked = [], 0, 0
+            for i in range(args.queries):
+                question, expected = QUERIES[i % len(QUERIES)]
+                started = time.perf_counter()
+                result = reloaded.search(question, args.top_k)
+                timings.append(_ms(started))
+                if any(t["table_name"] == expected for t in tables):
+                    asked += 1
+                    hits += expected in [name for name, _ in result]
+            timings.sort()
+            print(
+                f"{n:>7} {build_ms:>9.1f} {update_ms:>11.2f} {save_ms:>8.1f} {load_ms:>8.1f} {size_kb:>9.0f} "
+                f"{statistics.median(timings):>13.3f} {timings[int(len(timings) * 0.95) - 1]:>8.3f} "
+                f"{hits / asked if asked else float('nan'):>6.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Regression + timing run for src/tools/sql_guard.py.
+
+The corpus mixes queries seen in agent logs (see notes.txt) with ones written
+against the tables in src/tables_schema.json, plus statements that must stay
+blocked. Each is checked with the AST guard and with the old keyword scan, so
+false rejections of the old check show up side by side.
+
+    python -m benchmarks.sql_guard_bench [--repeat 200]
+"""
+import argparse
+import sys
+import time
+
+from src.tools.sql_guard import UnsafeQuery, enforce_limit
+
+# (dialect, expected_allowed, sql)
+CORPUS = [
+    ("postgresql", True, "SELECT * FROM cars LIMIT 10"),
+    ("sqlserver", True, "SELECT TOP 10 * FROM cars"),
+    ("postgresql", True, 'SELECT "Company Names", "Cars Names", "Torque", "Cars Prices" FROM cars ORDER BY "Torque" DESC LIMIT 10'),
+    ("postgresql", True, 'SELECT "State Name", SUM(CAST("RICE PRODUCTION (1000 tons)" AS NUMERIC)) AS rice FROM icrisat_dataset GROUP BY "State Name" ORDER BY rice DESC'),
+    ("postgresql", True, 'SELECT "Year", AVG(CAST("WHEAT YIELD (Kg per ha)" AS NUMERIC)) FROM icrisat_dataset WHERE "State Name" = \'Punjab\' GROUP BY "Year" ORDER BY "Year"'),
+    ("postgresql", True, "SELECT m.title, AVG(r.rating) AS avg_rating, COUNT(*) AS n FROM ratings r JOIN movies m ON m.movie_id = r.\"movieId\" GROUP BY m.title HAVING COUNT(*) > 50 ORDER BY avg_rating DESC LIMIT 20"),
+    ("postgresql", True, "WITH top_movies AS (SELECT \"movieId\", COUNT(*) AS n FROM ratings GROUP BY \"movieId\" ORDER BY n DESC LIMIT 10) SELECT m.title, t.n FROM top_movies t JOIN movies m ON m.movie_id = t.\"movieId\""),
+    ("postgresql", True, "SELECT t.tag, COUNT(*) FROM tags t GROUP BY t.tag ORDER BY 2 DESC LIMIT 25"),
+    ("postgresql", True, 'SELECT "State Name", COUNT(*) FROM water_bodies GROUP BY "State Name"'),
+    ("postgresql", True, "SELECT created_at, last_updated, updated_by FROM audit_log ORDER BY created_at DESC LIMIT 5"),
+    ("postgresql", True, "SELECT id, description FROM releases WHERE description ILIKE '%drop table%'"),
+    ("postgresql", True, "SELECT 1 AS a UNION ALL SELECT 2"),
+    ("sqlserver", True, "SELECT TOP 5 [Company Names], COUNT(*) AS models FROM cars GROUP BY [Company Names] ORDER BY models DESC"),
+    ("sqlserver", True, "SELECT \"Cars Names\" FROM cars ORDER BY \"Cars Names\" OFFSET 0 ROWS FETCH NEXT 20 ROWS ONLY"),
+    ("postgresql", False, "DROP TABLE cars"),
+    ("postgresql", False, "DELETE FROM cars WHERE 1 = 1"),
+    ("postgresql", False, "UPDATE cars SET \"Cars Prices\" = '0'"),
+    ("postgresql", False, "INSERT INTO cars (\"Id\") VALUES (1)"),
+    ("postgresql", False, "SELECT 1; DROP TABLE cars"),
+    ("postgresql", False, "WITH gone AS (DELETE FROM cars RETURNING *) SELECT * FROM gone"),
+    ("postgresql", False, "SELECT * INTO cars_copy FROM cars"),
+    ("postgresql", False, "SELECT * FROM cars FOR UPDATE"),
+    ("postgresql", False, "SELECT pg_sleep(60)"),
+    ("postgresql", False, "SELECT pg_terminate_backend(pid) FROM pg_stat_activity"),
+    ("postgresql", False, "TRUNCATE cars"),
+    ("postgresql", False, "CREATE TABLE x AS SELECT * FROM cars"),
+    ("postgresql", False, "GRANT ALL ON cars TO public"),
+    ("sqlserver", False, "EXEC xp_cmdshell 'dir'"),
+    ("sqlserver", False, "SELECT * FROM OPENROWSET('SQLNCLI', 'Server=x;', 'SELECT 1')"),
+]
+
+
+def _legacy_check(query):
+    dangerous_keywords = ["DROP", "DELETE", "TRUNCATE", "ALTER", "CREATE", "INSERT", "UPDATE", "GRANT", "REVOKE", "EXEC", "EXECUTE"]
+    return not any(k.lower() in query.lower() for k in dangerous_keywords)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--max-rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    failures = 0
+    legacy_false_rejects = 0
+    timings = []
+    for dialect, expected, sql in CORPUS:
+        try:
+            rewritten = enforce_limit(sql, dialect, args.max_rows)
+            allowed, detail = True, rewritten
+        except UnsafeQuery as e:
+            allowed, detail = False, str(e)
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            try:
+                enforce_limit(sql, dialect, args.max_rows)
+            except UnsafeQuery:
+                pass
+        timings.append((time.perf_counter() - started) / args.repeat * 1000)
+
+        legacy = _legacy_check(sql)
+        if expected and not legacy:
+            legacy_false_rejects += 1
+        status = "ok  " if allowed == expected else "FAIL"
+        failures += allowed != expected
+        print(f"{status} {'allow' if allowed else 'deny '} legacy={'allow' if legacy else 'deny '} {timings[-1]:6.3f}ms  {detail[:110]}")
+
+    timings.sort()
+    print(
+        f"\n{len(CORPUS)} queries, {failures} mismatches, legacy check falsely rejected {legacy_false_rejects}; "
+        f"guard p50 {timings[len(timings) // 2]:.3f}ms, max {timings[-1]:.3f}ms"
+    )
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Checks that a turn whose client disappears is cancelled after the resume
+grace period, for both ways a client can go away:
+
+- "closed":  the socket handler sees the disconnect and detaches the client
+- "stalled": the client stops reading; the frame writer gives up on it
+             (close code 1008) and the next event finds it gone
+
+A stand-in sub-agent streams tokens; no model or database is used.
+
+    python -m benchmarks.turn_orphan_check [--grace 1] [--stall-timeout 0.2]
+"""
+import argparse
+import asyncio
+import sys
+
+
+class _Socket:
+    def __init__(self, stalled: bool) -> None:
+        self.stalled = stalled
+        self.close_code = None
+
+    async def send_text(self, data: str) -> None:
+        if self.stalled:
+            await asyncio.Event().wait()
+
+    async def send_bytes(self, data: bytes) -> None:
+        await self.send_text("")
+
+    async def close(self, code: int = 1000) -> None:
+        self.close_code = code
+
+
+async def _check(app, mode: str, grace: float, stall_timeout: float) -> bool:
+    from src.ws_frames import FrameSender
+
+    session_id = f"orphan-{mode}"
+    socket = _Socket(stalled=mode == "stalled")
+    frames = FrameSender(socket, stall_timeout=stall_timeout)
+    conversation = app._conversations[session_id] = app._Conversation(session_id, has_history=False)
+    await conversation.attach(frames)
+    conversation.submit("question")
+
+    await asyncio.sleep(0.1)
+    if mode == "closed":
+        conversation.detach(frames)
+        await frames.close()
+    else:
+        await asyncio.sleep(stall_timeout + 0.1)
+    timer_started = conversation._orphan_timer is not None
+    await asyncio.sleep(grace + 0.5)
+    registered = session_id in app._conversations
+
+    ok = timer_started and not registered and not conversation.busy
+    extra = f", close code {socket.close_code}" if mode == "stalled" else ""
+    print(f"{mode:<8} orphan timer started: {timer_started}, still registered: {registered}, "
+          f"turn running: {conversation.busy}{extra} -> {'ok' if ok else 'FAILED'}")
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grace", type=float, default=1.0)
+    parser.add_argument("--stall-timeout", type=float, default=0.2)
+    args = parser.parse_args()
+
+    import app
+    from src.router import RESEARCH
+
+    class _Route:
+        direct = True
+        target = RESEARCH
+
+    async def route(message, session_id, has_history):
+        return _Route()
+
+    async def sub_agent(message, emit, stream):
+        for i in range(1000):
+            emit({"answer": f"{i} ", "agent": RESEARCH})
+            await asyncio.sleep(0.01)
+        return ""
+
+    app.init_chat_history()
+    app.route_message = route
+    app._SUB_AGENTS[RESEARCH] = sub_agent
+    app.WS_RESUME_GRACE = args.grace
+
+    results = [await _check(app, mode, args.grace, args.stall_timeout) for mode in ("closed", "stalled")]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""
+WebSocket frames and server CPU for streamed answers: one frame per token
+(previous behaviour) vs coalesced frames, JSON vs msgpack.
+
+Concurrent sessions stream interleaved reasoning and answer tokens through
+FrameSender into a stand-in socket that pays a per-frame cost similar to a
+real one (payload encoding plus a permessage-deflate compressor flush).
+
+    python -m benchmarks.ws_frames_bench [--sessions 50] [--tokens 400] [--interval-ms 4] [--client-delay-ms 50]
+"""
+import argparse
+import asyncio
+import random
+import time
+import zlib
+
+from src.ws_frames import FrameSender, frame_stats
+
+
+class _Socket:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.frames = 0
+        self.bytes = 0
+        self._deflate = zlib.compressobj(wbits=-15)
+
+    async def send_text(self, data: str) -> None:
+        await self.send_bytes(data.encode())
+
+    async def send_bytes(self, data: bytes) -> None:
+        compressed = self._deflate.compress(data) + self._deflate.flush(zlib.Z_SYNC_FLUSH)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.frames += 1
+        self.bytes += len(compressed)
+
+
+async def _session(sender: FrameSender, tokens: int, interval: float, rng: random.Random) -> None:
+    for i in range(tokens):
+        if i < tokens // 3:
+            await sender.send({"type": "reasoning", "data": rng.choice([" the", " cost", " query", " table"]), "agent": "research_agent"})
+        else:
+            await sender.send({"type": "chunk", "data": rng.choice([" Total", " cost", " was", " $1,234", ".\n"])})
+        await asyncio.sleep(interval * rng.uniform(0.5, 1.5))
+    await sender.send({"type": "done"})
+    await sender.close()
+
+
+async def _run(sessions: int, tokens: int, interval: float, window: float, binary: bool, delay: float = 0.0) -> tuple:
+    sockets = [_Socket(delay) for _ in range(sessions)]
+    senders = [FrameSender(socket, binary=binary, window=window) for socket in sockets]
+    rng = random.Random(3)
+    send_cpu = frame_stats.stats()["send_cpu_seconds"]
+    cpu, wall = time.process_time(), time.perf_counter()
+    await asyncio.gather(*(_session(sender, tokens, interval, rng) for sender in senders))
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    send_cpu = frame_stats.stats()["send_cpu_seconds"] - send_cpu
+    frames = sum(s.frames for s in sockets)
+    return frames, frames / wall, sum(s.bytes for s in sockets), send_cpu, cpu
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=400)
+    parser.add_argument("--interval-ms", type=float, default=4)
+    parser.add_argument("--window-ms", type=float, default=30)
+    parser.add_argument("--client-delay-ms", type=float, default=50, help="per-frame delay of the slow-client run")
+    args = parser.parse_args()
+
+    interval, window = args.interval_ms / 1000, args.window_ms / 1000
+    runs = [
+        ("per token, json", 0, False),
+        (f"{args.window_ms:g}ms batches, json", window, False),
+        (f"{args.window_ms:g}ms batches, msgpack", window, True),
+    ]
+    print(f"{args.sessions} sessions x {args.tokens} tokens, one token every ~{args.interval_ms:g}ms\n")
+    print(f"{'mode':<26} {'frames':>8} {'frames/s':>9} {'KB sent':>8} {'send CPU s':>11} {'total CPU s':>12}")
+    for name, run_window, binary in runs:
+        frames, rate, size, send_cpu, cpu = await _run(args.sessions, args.tokens, interval, run_window, binary)
+        print(f"{name:<26} {frames:>8} {rate:>9.0f} {size / 1024:>8.0f} {send_cpu:>11.3f} {cpu:>12.2f}")
+
+    # Slow clients: the agent stream is not throttled; their queues absorb (and merge) the backlog
+    started = time.perf_counter()
+    frames, *_ = await _run(args.sessions, args.tokens, interval, window, False, args.client_delay_ms / 1000)
+    stats = frame_stats.stats()
+    print(f"\nclients taking {args.client_delay_ms:g}ms per frame: all frames delivered after {time.perf_counter() - started:.2f}s, "
+          f"{frames} frames, queue high water {stats['queue_high_water']}, "
+          f"{stats['merged_on_overflow']} merged / {stats['dropped_on_overflow']} dropped on overflow")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,186 @@
+import logging
+import os
+import threading
+from typing import Awaitable, Callable
+
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+COMPACTION_ENABLED = os.getenv("COMPACTION_ENABLED", "true").lower() not in ("0", "false", "no")
+# Approximate history size (tokens) that triggers compaction after a turn
+COMPACTION_TOKEN_THRESHOLD = int(os.getenv("COMPACTION_TOKEN_THRESHOLD", "12000"))
+# The most recent user turns are always kept verbatim
+COMPACTION_KEEP_TURNS = int(os.getenv("COMPACTION_KEEP_TURNS", "3"))
+# Older tool results longer than this are elided before anything is summarized
+COMPACTION_TOOL_RESULT_MAX_CHARS = int(os.getenv("COMPACTION_TOOL_RESULT_MAX_CHARS", "1500"))
+# How long a new turn waits for a running compaction before cancelling it
+COMPACTION_WAIT = float(os.getenv("COMPACTION_WAIT", "10"))
+
+SUMMARY_ID = "conversation-summary"
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+_TRANSCRIPT_MAX_CHARS = 2000
+_ELIDED_MARKER = " characters of this tool result elided]"
+
+
+def _text(message) -> str:
+    return message.text if isinstance(message.content, list) else str(message.content)
+
+
+def recent_start(messages: list, keep_turns: int = COMPACTION_KEEP_TURNS) -> int:
+    """Index of the first message of the last ``keep_turns`` user turns (0 if there are fewer)."""
+    turns = [
+        i for i, m in enumerate(messages)
+        if isinstance(m, HumanMessage) and m.id != SUMMARY_ID
+    ]
+    return turns[-keep_turns] if len(turns) > keep_turns else 0
+
+
+def elide_tool_results(messages: list, end: int, max_chars: int = COMPACTION_TOOL_RESULT_MAX_CHARS) -> list:
+    """Shortened copies (same ids) of the tool results before ``end`` that exceed ``max_chars``."""
+    elided = []
+    for message in messages[:end]:
+        text = _text(message) if isinstance(message, ToolMessage) else ""
+        if len(text) > max_chars and not text.endswith(_ELIDED_MARKER):
+            elided.append(message.model_copy(update={
+                "content": f"{text[:max_chars]}\n[... {len(text) - max_chars}{_ELIDED_MARKER}",
+            }))
+    return elided
+
+
+def render_transcript(messages: list) -> str:
+    """Plain-text transcript of messages for the summary agent."""
+    lines = []
+    for message in messages:
+        text = _text(message)[:_TRANSCRIPT_MAX_CHARS]
+        if isinstance(message, HumanMessage):
+            lines.append(text if message.id == SUMMARY_ID else f"User: {text}")
+        elif isinstance(message, ToolMessage):
+            lines.append(f"Tool result ({message.name}): {text}")
+        elif isinstance(message, AIMessage):
+            if text:
+                lines.append(f"Assistant: {text}")
+            for call in message.tool_calls:
+                lines.append(f"Assistant called {call['name']}({call['args']})")
+    return "\n\n".join(lines)
+
+
+_summarizer = None
+
+
+async def summarize_with_agent(messages: list) -> str:
+    """Summarizes messages with the summary agent, built on first use."""
+    global _summarizer
+    if _summarizer is None:
+        from src.agents.summary_agent import custom_summarization_agent
+
+        _summarizer = custom_summarization_agent()
+    result = await _summarizer.ainvoke(
+        {"messages": [{"role": "user", "content": render_transcript(messages)}]},
+        config={"run_name": "summary_agent"},
+    )
+    return _text(result["messages"][-1]).strip()
+
+
+class ConversationCompactor:
+    """
+    Keeps the supervisor's thread under a token budget.
+
+    Once a thread's history crosses ``threshold`` tokens (approximate), older
+    tool results are elided first; if the history is still too large, every
+    message before the last ``keep_turns`` user turns is replaced with one
+    summary message written by the summary agent. The split always falls on a
+    user message, so tool calls are never separated from their results.
+    """
+
+    def __init__(
+        self,
+        summarize: Callable[[list], Awaitable[str]] = summarize_with_agent,
+        threshold: int = COMPACTION_TOKEN_THRESHOLD,
+        keep_turns: int = COMPACTION_KEEP_TURNS,
+        tool_result_max_chars: int = COMPACTION_TOOL_RESULT_MAX_CHARS,
+    ) -> None:
+        self.summarize = summarize
+        self.threshold = threshold
+        self.keep_turns = keep_turns
+        self.tool_result_max_chars = tool_result_max_chars
+
+        self._lock = threading.Lock()
+        self._elisions = 0
+        self._summaries = 0
+        self._tokens_saved = 0
+        self._failures = 0
+
+    async def plan(self, messages: list) -> list:
+        """Message updates that compact ``messages`` (for the add_messages reducer); [] if none are due."""
+        tokens = count_tokens_approximately(messages)
+        if tokens <= self.threshold:
+            return []
+        end = recent_start(messages, self.keep_turns)
+        if end == 0:
+            return []
+
+        elided = elide_tool_results(messages, end, self.tool_result_max_chars)
+        replaced = {m.id: m for m in elided}
+        compacted = [replaced.get(m.id, m) for m in messages]
+        if count_tokens_approximately(compacted) <= self.threshold:
+            self._record(tokens - count_tokens_approximately(compacted), elisions=len(elided))
+            return elided
+
+        summary = await self.summarize(compacted[:end])
+        summary_message = HumanMessage(content=SUMMARY_PREFIX + summary, id=SUMMARY_ID)
+        # Replace the whole list so the summary lands in front of the kept messages
+        updates = [RemoveMessage(id=REMOVE_ALL_MESSAGES), summary_message, *messages[end:]]
+        self._record(
+            tokens - count_tokens_approximately([summary_message] + messages[end:]),
+            elisions=len(elided),
+            summaries=1,
+        )
+        return updates
+
+    async def compact(self, graph, config: dict) -> None:
+        """Compacts the thread in ``config`` if it is over the threshold; errors are logged, not raised."""
+        if not COMPACTION_ENABLED:
+            return
+        try:
+            state = await graph.aget_state(config)
+            messages = state.values.get("messages", [])
+            updates = await self.plan(messages)
+            if not updates:
+                return
+            # Written as the node that produced the last message, so no step is left pending
+            as_node = "tools" if isinstance(messages[-1], ToolMessage) else "model"
+            await graph.aupdate_state(config, {"messages": updates}, as_node=as_node)
+            logger.info(
+                "Compacted thread %s (%d messages, %d updates)",
+                config["configurable"]["thread_id"], len(messages), len(updates),
+            )
+        except Exception as e:
+            with self._lock:
+                self._failures += 1
+            logger.warning("Conversation compaction failed for %s: %s", config["configurable"]["thread_id"], e)
+
+    def _record(self, saved: int, elisions: int = 0, summaries: int = 0) -> None:
+        with self._lock:
+            self._elisions += elisions
+            self._summaries += summaries
+            self._tokens_saved += max(0, saved)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": COMPACTION_ENABLED,
+                "threshold_tokens": self.threshold,
+                "summaries": self._summaries,
+                "elided_tool_results": self._elisions,
+                "tokens_saved": self._tokens_saved,
+                "failures": self._failures,
+            }
+
+
+compactor = ConversationCompactor()
@@ -1,62 +1,223 @@
 from langchain_core.tools import tool
+import asyncio
+import os
+import re
 import traceback
-from langchain_core.messages import AIMessageChunk
+from langchain_core.messages import AIMessage, ToolMessage
 from langchain.agents import create_agent
 from langgraph.config import get_stream_writer
-from src.model import bedrock_model
-from src.tools.read_schema_tool import read_schema_tool, get_tables
-from src.tools.execute_query import execute_query
+from src.agents.streaming import PASS_THROUGH, AnswerStreamer
+from src.context import current_session_id
+from src.model import bedrock_model, cached_system_prompt, prompt_cache_middleware
+from src.tools.read_schema_tool import read_schema_tool, get_tables, compact_schema_summary, schema_version, _load_schema
+from src.tools.schema_search import search_schema
+from src.tools.execute_query import execute_query, execute_queries, _aexecute_query
+from src.tools.question_cache import question_cache
+
+# Put the compact schema summary into the system prompt so the agent can skip get_tables
+SCHEMA_PRELOAD = os.getenv("RESEARCH_SCHEMA_PRELOAD", "true").lower() not in ("0", "false", "no")
+# Above this many tables the summary gets too large; the agent retrieves tables with search_schema instead
+SCHEMA_PRELOAD_MAX_TABLES = int(os.getenv("RESEARCH_SCHEMA_PRELOAD_MAX_TABLES", "50"))
 
 RESEARCH_PROMPT = """
 You are a fast SQL research agent. Answer the user's question using the database.
 
-Tools: get_tables, read_schema_tool, execute_query.
+Tools: search_schema, get_tables, read_schema_tool, execute_query, execute_queries.
+
+Workflow (be efficient — minimize tool calls):
+1. Call search_schema ONCE with the question to find the relevant tables and columns. Only call get_tables if search_schema does not find what you need.
+2. Only call read_schema_tool if you need full column details (data types, nullability) for a specific table. Skip it if the columns from search_schema are enough to write the query.
+3. Write a precise SQL query with LIMIT (default LIMIT 50 unless the user asks for more). Execute it with execute_query.
+   If the question needs several independent queries (e.g. a total, a breakdown and a top-N), send them together in ONE execute_queries call instead.
+4. Return a clear, concise answer based on the results. Do NOT re-run queries unnecessarily.
+
+Important:
+- Always use LIMIT to avoid huge result sets.
+- Prefer a single well-crafted query over multiple exploratory ones.
+- Keep answers brief and data-focused.
+"""
+
+RESEARCH_PROMPT_WITH_SCHEMA = """
+You are a fast SQL research agent. Answer the user's question using the database.
+
+Tools: execute_query, execute_queries, read_schema_tool, search_schema, get_tables.
+
+Database schema (table(column type, ...) -- description, foreign keys):
+{schema}
 
 Workflow (be efficient — minimize tool calls):
-1. Call get_tables ONCE to see table names, descriptions and column names.
-2. Only call read_schema_tool if you need full column details (data types, nullability) for a specific table. Skip it if column names from get_tables are enough to write the query.
+1. Use the schema above directly; do NOT call get_tables unless a table you need is missing from it.
+2. Only call read_schema_tool if you need column descriptions for a specific table.
 3. Write a precise SQL query with LIMIT (default LIMIT 50 unless the user asks for more). Execute it with execute_query.
+   If the question needs several independent queries (e.g. a total, a breakdown and a top-N), send them together in ONE execute_queries call instead.
 4. Return a clear, concise answer based on the results. Do NOT re-run queries unnecessarily.
 
 Important:
+- Quote column names exactly as listed (most contain spaces or capitals).
 - Always use LIMIT to avoid huge result sets.
 - Prefer a single well-crafted query over multiple exploratory ones.
 - Keep answers brief and data-focused.
 """
 
 
+def _research_prompt() -> str:
+    if not SCHEMA_PRELOAD:
+        return RESEARCH_PROMPT
+    try:
+        if len(_load_schema()) > SCHEMA_PRELOAD_MAX_TABLES:
+            return RESEARCH_PROMPT
+        return RESEARCH_PROMPT_WITH_SCHEMA.format(schema=compact_schema_summary())
+    except Exception:
+        # Missing or unreadable schema file: fall back to discovering it with get_tables
+        traceback.print_exc()
+        return RESEARCH_PROMPT
+
+
+CACHED_SQL_PROMPT = """{question}
+
+This question was answered before. The SQL that answered it has just been re-run; current results:
+
+{results}
+
+The previous answer, as a template for the format (its numbers may be outdated — use the results above):
+{answer}
+
+Answer directly from these results. Do NOT explore the schema; only run another query if the results above do not answer the question."""
+
+CANDIDATE_SQL_PROMPT = """{question}
+
+A similarly worded earlier question ("{previous}") was answered with the SQL below. It has just been re-run; current results:
+
+{results}
+
+This SQL was NOT written for the question above. First check that it answers it exactly (same entities, filters, negations and time range). If it does, answer from these results; if not, ignore them and write and run the right query."""
+
+_QUERY_STATUS_RE = re.compile(r"^### Query (\d+) \[(\w+)\]", re.MULTILINE)
+
+_research_graph = None
+_research_graph_version = None
+
+
 def _create_research_agent():
     return create_agent(
         model=bedrock_model,
-        tools=[read_schema_tool, get_tables, execute_query],
-        system_prompt=RESEARCH_PROMPT,
+        tools=[read_schema_tool, search_schema, get_tables, execute_query, execute_queries],
+        system_prompt=cached_system_prompt(_research_prompt()),
+        middleware=prompt_cache_middleware(),
+        name="research_agent",
     )
 
 
-@tool
-async def research_agent(question: str) -> str:
-    """Data research agent that answers user questions by researching using attached tools. If you need to visualize data, use the visualization agent."""
-    writer = get_stream_writer()
+def get_research_agent():
+    """
+    The compiled research graph, built on first use and shared by all sessions.
+    It has no checkpointer, so concurrent runs only share the immutable graph;
+    per-run state lives in the config passed to astream. Rebuilt when the schema
+    file changes, since the compact schema is part of its prompt.
+    """
+    global _research_graph, _research_graph_version
+    # The schema summary is part of the prompt: rebuild when tables_schema.json changes
+    version = schema_version()
+    if _research_graph is None or version != _research_graph_version:
+        _research_graph = _create_research_agent()
+        _research_graph_version = version
+    return _research_graph
+
+
+def _successful_sql(call: dict, message: ToolMessage) -> list[str]:
+    """The SQL of an execute_query / execute_queries call that ran without error."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    if call["name"] == "execute_query":
+        query = call["args"].get("query")
+        return [query] if query and not content.startswith("Error") else []
+    queries = call["args"].get("queries") or []
+    statuses = {int(i): status for i, status in _QUERY_STATUS_RE.findall(content)}
+    return [q for i, q in enumerate(queries, 1) if statuses.get(i) == "ok"]
+
+
+async def _rerun_cached_sql(queries: list[str]) -> str | None:
+    """Results of the cached SQL in execute_queries format, or None if any statement now fails."""
+    results = await asyncio.gather(*(_aexecute_query(q) for q in queries))
+    if any(r.startswith("Error") for r in results):
+        return None
+    return "\n\n".join(f"### Query {i} [ok]\n{q}\n\n{r}" for i, (q, r) in enumerate(zip(queries, results), 1))
+
+
+async def run_research(question: str, writer, stream_answer: bool = PASS_THROUGH) -> str:
+    """
+    Runs the research agent on a question, reporting progress through ``writer``.
+
+    Args:
+        question: The user's question.
+        writer: Callable taking the custom stream events ({"agent", "text"}).
+        stream_answer: Stream the final answer as {"agent", "answer"} events (see AnswerStreamer).
+
+    Returns:
+        The agent's final answer, or an error message.
+    """
     writer({"agent": "research_agent", "text": "Researching your question..."})
 
     try:
-        agent = _create_research_agent()
+        agent = get_research_agent()
         result_content = ""
+        prompt = question
+
+        # Repeat question: run the SQL that answered it before and skip schema exploration.
+        # A merely similar question gets that SQL as a candidate for the model to check.
+        match = question_cache.get(question)
+        cached = match.entry if match is not None else None
+        if cached is not None:
+            results = await _rerun_cached_sql(cached.queries)
+            if results is None:
+                question_cache.invalidate(cached.question)
+                cached = None
+            elif match.exact:
+                writer({"agent": "research_agent", "text": "Reusing the SQL from an earlier identical question..."})
+                prompt = CACHED_SQL_PROMPT.format(question=question, results=results, answer=cached.answer[:2000])
+            else:
+                writer({"agent": "research_agent", "text": "Checking the SQL of a similar earlier question..."})
+                prompt = CANDIDATE_SQL_PROMPT.format(question=question, previous=cached.question, results=results)
 
+        pending_calls: dict[str, dict] = {}
+        answer_sql: list[str] = []
+
+        streamer = AnswerStreamer("research_agent", writer, stream_answer)
         async for mode, chunk in agent.astream(
-            {"messages": [{"role": "user", "content": question}]},stream_mode=["messages", "updates"],):
+            {"messages": [{"role": "user", "content": prompt}]},
+            config={"run_name": "research_agent", "metadata": {"session_id": current_session_id.get()}},
+            stream_mode=["messages", "updates"],
+        ):
 
             if mode == "messages":
                 token, _ = chunk
-                if isinstance(token, AIMessageChunk) and token.text:
-                    writer({"agent": "research_agent", "text": token.text})
+                streamer.on_token(token)
             elif mode == "updates":
                 for node, update in chunk.items():
                     if "messages" in update and update["messages"]:
                         content = update["messages"][-1].content
                         result_content = content if isinstance(content, str) else str(content)
 
+                    # Remember the SQL of the last successful query step: it is what the answer is based on
+                    step_sql = []
+                    for msg in (update or {}).get("messages", []):
+                        if isinstance(msg, AIMessage):
+                            for call in msg.tool_calls:
+                                if call["name"] in ("execute_query", "execute_queries"):
+                                    pending_calls[call["id"]] = call
+                        elif isinstance(msg, ToolMessage) and msg.tool_call_id in pending_calls:
+                            step_sql += _successful_sql(pending_calls.pop(msg.tool_call_id), msg)
+                    if step_sql:
+                        answer_sql = step_sql
+
+        if (cached is None or not match.exact) and answer_sql and result_content:
+            question_cache.put(question, answer_sql, result_content)
         return result_content or "No result"
     except Exception as e:
         traceback.print_exc()
-        return f"Error: {e}"
\ No newline at end of file
+        return f"Error: {e}"
+
+
+@tool(return_direct=PASS_THROUGH)
+async def research_agent(question: str) -> str:
+    """Data research agent that answers user questions by researching using attached tools. If you need to visualize data, use the visualization agent."""
+    return await run_research(question, get_stream_writer())
@@ -0,0 +1,53 @@
+import os
+
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessageChunk
+
+load_dotenv()
+
+# Sub-agent answers go straight to the client and end the supervisor's turn
+# (return_direct) instead of being regenerated by the supervisor
+PASS_THROUGH = os.getenv("SUPERVISOR_PASS_THROUGH", "true").lower() not in ("0", "false", "no")
+
+
+class AnswerStreamer:
+    """
+    Turns a sub-agent's model tokens into stream-writer events.
+
+    With ``stream_answer`` every text token is sent speculatively as
+    {"agent", "answer"}: the final model call of an agent is the one without
+    tool calls, which is only known once its tool-call chunks arrive. When they
+    do, {"agent", "answer_reset"} withdraws the call's text and it is re-sent as
+    progress ({"agent", "text"}). Without ``stream_answer`` all text is progress,
+    as before.
+    """
+
+    def __init__(self, agent: str, writer, stream_answer: bool = PASS_THROUGH) -> None:
+        self.agent = agent
+        self.writer = writer
+        self.stream_answer = stream_answer
+        self._call_id = None
+        self._call_text: list[str] = []
+        self._call_has_tools = False
+
+    def on_token(self, token) -> None:
+        if not isinstance(token, AIMessageChunk):
+            return
+        if token.id != self._call_id:
+            self._call_id = token.id
+            self._call_text = []
+            self._call_has_tools = False
+
+        if self.stream_answer and token.tool_call_chunks and not self._call_has_tools:
+            self._call_has_tools = True
+            if self._call_text:
+                self.writer({"agent": self.agent, "answer_reset": True})
+                self.writer({"agent": self.agent, "text": "".join(self._call_text)})
+
+        if not token.text:
+            return
+        if self.stream_answer and not self._call_has_tools:
+            self._call_text.append(token.text)
+            self.writer({"agent": self.agent, "answer": token.text})
+        else:
+            self.writer({"agent": self.agent, "text": token.text})
@@ -19,6 +19,7 @@ def custom_summarization_agent():
             model=bedrock_model,
             tools=[],
             system_prompt=SUMMARIZATION_PROMPT,
+            name="summary_agent",
         )
     except Exception as e:
         raise RuntimeError(f"Error creating summarization agent: {e}")
\ No newline at end of file
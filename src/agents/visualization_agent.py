@@ -1,10 +1,12 @@
 import re
 from langchain_core.tools import tool
-from langchain_core.messages import AIMessageChunk
 from langchain.agents import create_agent
 from langgraph.config import get_stream_writer
-from src.model import bedrock_model
+from src.agents.streaming import PASS_THROUGH, AnswerStreamer
+from src.context import current_session_id
+from src.model import bedrock_model, cached_system_prompt, prompt_cache_middleware
 from src.tools.read_schema_tool import read_schema_tool
+from src.tools.datasets import dataset_store
 from src.tools.execute_query import execute_query
 
 _CHART_PATH_RE = re.compile(r"generated_charts[\\/][^\s\"'<>]+\.png")
@@ -37,9 +39,24 @@ Rules:
 Charts available: generate_line_chart, generate_area_chart, generate_bar_chart, generate_boxplot_chart, generate_column_chart, generate_funnel_chart, generate_histogram_chart, generate_liquid_chart, generate_network_graph_chart, generate_pie_chart, generate_radar_chart, generate_scatter_chart, generate_treemap_chart, generate_venn_chart, generate_waterfall_chart, generate_word_cloud_chart.
 
 Pass the SQL query and parameters to the chart tools. Example: generate_line_chart(query="select * from aws_oci_testing_data limit 10", theme="default", width=10, height=6, title="Line Chart", axisXTitle="Time", axisYTitle="Value")
+
+When the request lists datasets already fetched in this conversation and one of them holds the data to plot, pass its handle instead of writing SQL, mapping its columns to the ones the chart expects. Example: generate_bar_chart(dataset="ds_1a2b3c", column_map={"x": "region", "y": "total_cost"}, title="Cost by region")
 """
 
 
+def _with_datasets(query: str) -> str:
+    """Appends the session's recent dataset handles so the agent can chart them without re-querying."""
+    session_id = current_session_id.get()
+    datasets = dataset_store.list(session_id) if session_id is not None else []
+    if not datasets:
+        return query
+    lines = "\n".join(f"- {dataset.describe()}" for dataset in datasets)
+    return f"{query}\n\nDatasets already fetched in this conversation (newest first):\n{lines}"
+
+
+_visualization_graph = None
+
+
 def _create_visualization_agent():
     return create_agent(
         model=bedrock_model,
@@ -63,29 +80,49 @@ def _create_visualization_agent():
             generate_waterfall_chart,
             generate_word_cloud_chart,
         ],
-        system_prompt=VISUALIZATION_PROMPT,
+        system_prompt=cached_system_prompt(VISUALIZATION_PROMPT),
+        middleware=prompt_cache_middleware(),
+        name="visualization_agent",
     )
 
 
-@tool
-async def visualization_agent(query: str) -> str:
-    """Data visualization agent that visualizes data using available chart tools."""
-    writer = get_stream_writer()
+def get_visualization_agent():
+    """The compiled visualization graph, built on first use and shared by all sessions."""
+    global _visualization_graph
+    if _visualization_graph is None:
+        _visualization_graph = _create_visualization_agent()
+    return _visualization_graph
+
+
+async def run_visualization(query: str, writer, stream_answer: bool = PASS_THROUGH) -> str:
+    """
+    Runs the visualization agent on a request, reporting progress and chart
+    paths through ``writer``.
+
+    Args:
+        query: The user's visualization request.
+        writer: Callable taking the custom stream events ({"agent", "text"} / {"agent", "chart"}).
+        stream_answer: Stream the final answer as {"agent", "answer"} events (see AnswerStreamer).
+
+    Returns:
+        The chart paths followed by the agent's final answer, or an error message.
+    """
     writer({"agent": "visualization_agent", "text": "Creating visualization..."})
 
     try:
-        agent = _create_visualization_agent()
+        agent = get_visualization_agent()
         chart_paths: list[str] = []
         result_content = ""
 
+        streamer = AnswerStreamer("visualization_agent", writer, stream_answer)
         async for mode, chunk in agent.astream(
-            {"messages": [{"role": "user", "content": query}]},
+            {"messages": [{"role": "user", "content": _with_datasets(query)}]},
+            config={"run_name": "visualization_agent", "metadata": {"session_id": current_session_id.get()}},
             stream_mode=["messages", "updates"],
         ):
             if mode == "messages":
-                token, metadata = chunk
-                if isinstance(token, AIMessageChunk) and token.text:
-                    writer({"agent": "visualization_agent", "text": token.text})
+                token, _ = chunk
+                streamer.on_token(token)
             elif mode == "updates":
                 for node, update in chunk.items():
                     if "messages" not in update:
@@ -113,5 +150,11 @@ async def visualization_agent(query: str) -> str:
         return f"Error: {e}"
 
 
+@tool(return_direct=PASS_THROUGH)
+async def visualization_agent(query: str) -> str:
+    """Data visualization agent that visualizes data using available chart tools."""
+    return await run_visualization(query, get_stream_writer())
+
+
 # Backward compatibility alias
 visualiation_agent = visualization_agent
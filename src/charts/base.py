@@ -4,42 +4,184 @@ import matplotlib.pyplot as plt
 import psycopg2
 import pandas as pd
 import os
+import tempfile
 import time
+from decimal import Decimal
 from pathlib import Path
 from typing import Any, Dict, List, Optional
+from src.context import TurnCancelled, current_session_id, raise_if_cancelled
+from src.tools.datasets import dataset_store
+from src.tools.database import (
+    StatementCancelled,
+    check_query_cost,
+    current_datasource,
+    current_db_type,
+    get_connection,
+    is_statement_timeout,
+    open_cursor,
+)
+from src.tools.query_cache import QUERY_CACHE_ENABLED, query_cache
+from src.tools.sql_guard import UnsafeQuery, enforce_limit
+
+# Upper bound on rows a chart query may return; injected as LIMIT/TOP when missing
+CHART_MAX_ROWS = int(os.getenv("CHART_MAX_ROWS", "100000"))
+# Bulk fetch tuning: COPY ... TO STDOUT on PostgreSQL, batched fetchmany() elsewhere
+CHART_BULK_FETCH = os.getenv("CHART_BULK_FETCH", "true").lower() not in ("0", "false", "no")
+CHART_FETCH_BATCH_SIZE = int(os.getenv("CHART_FETCH_BATCH_SIZE", "10000"))
+CHART_COPY_SPOOL_BYTES = int(os.getenv("CHART_COPY_SPOOL_BYTES", str(16 * 1024 * 1024)))
 
 # Absolute path to project root (Building_bot/) so charts always land in one place
 _PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 
+# PostgreSQL type OIDs that need help after a CSV round trip
+_PG_TEXT_OIDS = {25, 1042, 1043, 19}          # text, bpchar, varchar, name
+_PG_BOOL_OIDS = {16}
+_PG_DATETIME_OIDS = {1082, 1114, 1184}       # date, timestamp, timestamptz
+
+
+def _copy_to_frame(connection, query: str) -> pd.DataFrame:
+    """
+    PostgreSQL bulk path: streams ``COPY (query) TO STDOUT`` as CSV into a
+    spooled buffer and lets pandas' C parser build the columns, instead of
+    materialising one Python object per cell via fetchall().
+    """
+    cursor = open_cursor(connection, "postgresql")
+    try:
+        # Column names and types without running the query
+        cursor.execute(f"SELECT * FROM ({query}) AS _chart_q LIMIT 0")
+        columns = [desc[0] for desc in cursor.description]
+        type_codes = [desc[1] for desc in cursor.description]
+
+        with tempfile.SpooledTemporaryFile(max_size=CHART_COPY_SPOOL_BYTES, mode="w+b") as buffer:
+            cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv)", buffer)
+            buffer.seek(0)
+            df = pd.read_csv(
+                buffer,
+                header=None,
+                names=range(len(columns)),
+                dtype={i: str for i, oid in enumerate(type_codes) if oid in _PG_TEXT_OIDS | _PG_BOOL_OIDS},
+                keep_default_na=False,
+                na_values=[""],
+            )
+    finally:
+        cursor.close()
+
+    for i, oid in enumerate(type_codes):
+        if oid in _PG_BOOL_OIDS:
+            df[i] = df[i].map({"t": True, "f": False})
+        elif oid in _PG_DATETIME_OIDS:
+            df[i] = pd.to_datetime(df[i], utc=(oid == 1184), errors="coerce")
+    df.columns = columns
+    return df
+
+
+def _fetch_frame_batched(cursor) -> pd.DataFrame:
+    """Generic bulk path (pyodbc): large arraysize fetchmany() batches, one DataFrame per batch."""
+    frames = []
+    while True:
+        batch = cursor.fetchmany(CHART_FETCH_BATCH_SIZE)
+        if not batch:
+            break
+        frames.append(pd.DataFrame.from_records([tuple(row) for row in batch]))
+    # Named cursors only expose a description once the first batch is fetched
+    columns = [desc[0] for desc in cursor.description] if cursor.description else []
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    df.columns = columns
+
+    # Decimal columns come back as object dtype; convert whole columns at once
+    for col in df.columns[df.dtypes == object]:
+        first = df[col].first_valid_index()
+        if first is not None and isinstance(df[col].iat[first], Decimal):
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
 def get_data_from_query(query: str) -> pd.DataFrame:
-    """Executes a SQL query and returns a pandas DataFrame."""
-    connection = None
+    """Executes a SQL query on a pooled connection and returns a pandas DataFrame.
+
+    Reads through the shared query cache, so charting SQL the research agent
+    just ran costs no extra database round trip. Large results are fetched in
+    bulk (COPY on PostgreSQL, batched fetchmany elsewhere).
+    """
     cursor = None
     
     try:
-        USER = os.getenv("user")
-        PASSWORD = os.getenv("password")
-        HOST = os.getenv("host")
-        PORT = os.getenv("port")
-        DBNAME = os.getenv("dbname")
-        
-        connection = psycopg2.connect(user=USER,password=PASSWORD,host=HOST,port=PORT,dbname=DBNAME)
-        cursor = connection.cursor()
-        cursor.execute(query=query)
-        results = cursor.fetchall()
-        # Convert the results to a pandas DataFrame the result is list of tuples
-        df = pd.DataFrame(results, columns=[desc[0] for desc in cursor.description])
-        return df
+        datasource = current_datasource()
+        if QUERY_CACHE_ENABLED:
+            cached = query_cache.get(datasource, query, require_complete=True)
+            if cached is not None:
+                return cached.to_frame()
+
+        safe_query = enforce_limit(query, current_db_type(), CHART_MAX_ROWS)
+        with get_connection(analytical=True) as (connection, db_type):
+            check_query_cost(connection, db_type, safe_query)
+            if db_type == "postgresql" and CHART_BULK_FETCH:
+                df = _copy_to_frame(connection, safe_query)
+            else:
+                try:
+                    cursor = open_cursor(connection, db_type, streaming=True, batch_size=CHART_FETCH_BATCH_SIZE)
+                    cursor.execute(safe_query)
+                    df = _fetch_frame_batched(cursor)
+                finally:
+                    if cursor:
+                        cursor.close()
+
+        if QUERY_CACHE_ENABLED:
+            # A frame that filled the injected cap only answers the capped SQL, not the original
+            capped = safe_query != query and len(df) >= CHART_MAX_ROWS
+            query_cache.put_frame(datasource, safe_query if capped else query, df)
+        return df.copy()
         
+    except (TurnCancelled, StatementCancelled, UnsafeQuery):
+        raise
     except psycopg2.Error as db_error:
+        # A Stop during the fetch cancels the statement; surface it as the cancel, not a DB error
+        if is_statement_timeout(db_error):
+            raise_if_cancelled()
         raise Exception(f"Database error: {str(db_error)}")
     except Exception as e:
+        if is_statement_timeout(e):
+            raise_if_cancelled()
         raise Exception(f"Error executing query: {str(e)}")
-    finally:
-        if cursor:
-            cursor.close()
-        if connection:
-            connection.close()
+
+
+def load_chart_data(query: str = "", dataset: str = "", column_map: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """Returns the DataFrame a chart tool plots, from a SQL query or a dataset handle.
+
+    Args:
+        query: SQL to run (through the query cache) when no dataset is given.
+        dataset: Handle returned by execute_query (e.g. "ds_1a2b3c"). Complete
+            results are charted straight from memory; capped ones re-run their
+            SQL once through the bulk fetch path.
+        column_map: Renames dataset columns to the names the chart expects,
+            as {expected_name: dataset_column}.
+
+    Returns:
+        pd.DataFrame: The data, with ``column_map`` applied.
+    """
+    if dataset:
+        session_id = current_session_id.get()
+        found = dataset_store.get(dataset, session_id) if session_id is not None else None
+        if found is None:
+            raise Exception(f"Unknown or expired dataset '{dataset}'. Pass the SQL as query= instead.")
+        df = found.result.to_frame() if found.complete else get_data_from_query(found.query)
+    elif query:
+        df = get_data_from_query(query)
+    else:
+        raise Exception("Pass either query= (SQL) or dataset= (a handle returned by execute_query).")
+
+    if column_map:
+        missing = [column for column in column_map.values() if column not in df.columns]
+        if missing:
+            raise Exception(
+                f"Column(s) {', '.join(missing)} not in the data; available columns: {', '.join(map(str, df.columns))}"
+            )
+        df = df.rename(columns={source: expected for expected, source in column_map.items()})
+    # Chart tools render in worker threads; stop before plotting if the turn was cancelled
+    raise_if_cancelled()
+    return df
 
 
 def fig_to_base64(fig, title: Optional[str] = None):
@@ -47,6 +189,11 @@ def fig_to_base64(fig, title: Optional[str] = None):
 
     The function name is kept for backward compatibility with all chart modules.
     """
+    try:
+        raise_if_cancelled()
+    except TurnCancelled:
+        plt.close(fig)
+        raise
     output_dir = _PROJECT_ROOT / "generated_charts"
     output_dir.mkdir(exist_ok=True)
 
@@ -1,11 +1,13 @@
 from langchain_core.tools import tool
 from typing import List, Dict, Any, Optional
 import matplotlib.pyplot as plt
-from .base import fig_to_base64, apply_common_style, get_data_from_query
+from .base import fig_to_base64, apply_common_style, load_chart_data
 
 @tool
 def generate_boxplot_chart(
-    query: str,
+    query: str = "",
+    dataset: str = "",
+    column_map: Optional[Dict[str, str]] = None,
     theme: str = "default",
     width: int = 10,
     height: int = 6,
@@ -17,9 +19,13 @@ def generate_boxplot_chart(
     Generates a boxplot chart to visualize the distribution and outliers of data across groups.
     
     Args:
-        query (str): The SQL query to fetch data. Expected columns:
+        query (str): The SQL query (empty when passing dataset) to fetch data. Expected columns:
             - 'group': The name of the group/category for the box.
             - 'value': A numeric value belonging to that group.
+        dataset (str): Handle of an earlier result (e.g. "ds_1a2b3c", reported by
+            execute_query). Use instead of query to chart data already fetched.
+        column_map (dict, optional): Renames dataset columns to the expected ones,
+            as {expected_name: dataset_column}, e.g. {"x": "region", "y": "total"}.
         theme (str): Visual style ('default', 'dark', 'academy').
         width (int): Figure width in inches. Default is 10.
         height (int): Figure height in inches. Default is 6.
@@ -30,7 +36,7 @@ def generate_boxplot_chart(
     Returns:
         str: A base64-encoded PNG image string (data URI).
     """
-    df = get_data_from_query(query)
+    df = load_chart_data(query, dataset, column_map)
     fig, ax = plt.subplots(figsize=(width, height))
     
     groups = df['group'].unique()
@@ -1,11 +1,13 @@
 from langchain_core.tools import tool
 from typing import List, Dict, Any, Optional
 import matplotlib.pyplot as plt
-from .base import fig_to_base64, apply_common_style, get_data_from_query
+from .base import fig_to_base64, apply_common_style, load_chart_data
 
 @tool
 def generate_histogram_chart(
-    query: str,
+    query: str = "",
+    dataset: str = "",
+    column_map: Optional[Dict[str, str]] = None,
     bins: int = 10,
     theme: str = "default",
     width: int = 10,
@@ -18,7 +20,11 @@ def generate_histogram_chart(
     Generates a histogram to visualize the distribution of a numeric dataset.
     
     Args:
-        query (str): The SQL query to fetch data. Expected to return a column named 'value'.
+        query (str): The SQL query (empty when passing dataset) to fetch data. Expected to return a column named 'value'.
+        dataset (str): Handle of an earlier result (e.g. "ds_1a2b3c", reported by
+            execute_query). Use instead of query to chart data already fetched.
+        column_map (dict, optional): Renames dataset columns to the expected ones,
+            as {expected_name: dataset_column}, e.g. {"x": "region", "y": "total"}.
         bins (int): The number of intervals (bins) to use for the distribution. Default is 10.
         theme (str): Visual style ('default', 'dark', 'academy').
         width (int): Figure width in inches. Default is 10.
@@ -30,7 +36,7 @@ def generate_histogram_chart(
     Returns:
         str: A base64-encoded PNG image string (data URI).
     """
-    df = get_data_from_query(query)
+    df = load_chart_data(query, dataset, column_map)
     data = df['value'].tolist()
     fig, ax = plt.subplots(figsize=(width, height))
     
@@ -1,11 +1,13 @@
 from langchain_core.tools import tool
 from typing import List, Dict, Any, Optional
 import matplotlib.pyplot as plt
-from .base import fig_to_base64, apply_common_style, get_data_from_query
+from .base import fig_to_base64, apply_common_style, load_chart_data
 
 @tool
 def generate_liquid_chart(
-    query: str,
+    query: str = "",
+    dataset: str = "",
+    column_map: Optional[Dict[str, str]] = None,
     theme: str = "default",
     width: int = 6,
     height: int = 6,
@@ -15,7 +17,11 @@ def generate_liquid_chart(
     Generates a liquid chart (a circular gauge) to show a percentage or ratio.
     
     Args:
-        query (str): The SQL query to fetch a single numeric value between 0 and 1.
+        query (str): The SQL query (empty when passing dataset) to fetch a single numeric value between 0 and 1.
+        dataset (str): Handle of an earlier result (e.g. "ds_1a2b3c", reported by
+            execute_query). Use instead of query to chart data already fetched.
+        column_map (dict, optional): Renames dataset columns to the expected ones,
+            as {expected_name: dataset_column}, e.g. {"x": "region", "y": "total"}.
         theme (str): Visual style ('default', 'dark', 'academy').
         width (int): Figure width in inches. Default is 6.
         height (int): Figure height in inches. Default is 6.
@@ -24,7 +30,7 @@ def generate_liquid_chart(
     Returns:
         str: A base64-encoded PNG image string (data URI).
     """
-    df = get_data_from_query(query)
+    df = load_chart_data(query, dataset, column_map)
     value = float(df.iloc[0, 0])
     fig, ax = plt.subplots(figsize=(width, height))
     
@@ -2,12 +2,15 @@ from langchain_core.tools import tool
 from typing import List, Dict, Any, Optional
 import matplotlib.pyplot as plt
 import networkx as nx
-from .base import fig_to_base64, apply_common_style, get_data_from_query
+from .base import fig_to_base64, apply_common_style, load_chart_data
 
 @tool
 def generate_network_graph_chart(
-    query_nodes: str,
-    query_edges: str,
+    query_nodes: str = "",
+    query_edges: str = "",
+    dataset_nodes: str = "",
+    dataset_edges: str = "",
+    column_map: Optional[Dict[str, str]] = None,
     theme: str = "default",
     width: int = 10,
     height: int = 8,
@@ -19,6 +22,10 @@ def generate_network_graph_chart(
     Args:
         query_nodes (str): SQL query to fetch nodes. Expected column: 'name'.
         query_edges (str): SQL query to fetch edges. Expected columns: 'source', 'target'.
+        dataset_nodes (str): Handle of an earlier result to use instead of query_nodes.
+        dataset_edges (str): Handle of an earlier result to use instead of query_edges.
+        column_map (dict, optional): Renames dataset columns to the expected ones,
+            as {expected_name: dataset_column}, e.g. {"source": "from_id"}.
         theme (str): Visual style ('default', 'dark', 'academy').
         width (int): Figure width in inches. Default is 10.
         height (int): Figure height in inches. Default is 8.
@@ -27,8 +34,10 @@ def generate_network_graph_chart(
     Returns:
         str: A base64-encoded PNG image string (data URI).
     """
-    df_nodes = get_data_from_query(query_nodes)
-    df_edges = get_data_from_query(query_edges)
+    node_map = {k: v for k, v in (column_map or {}).items() if k == "name"}
+    edge_map = {k: v for k, v in (column_map or {}).items() if k in ("source", "target")}
+    df_nodes = load_chart_data(query_nodes, dataset_nodes, node_map)
+    df_edges = load_chart_data(query_edges, dataset_edges, edge_map)
     
     G = nx.Graph()
     for _, node in df_nodes.iterrows():
@@ -2,11 +2,13 @@ from langchain_core.tools import tool
 from typing import List, Dict, Any, Optional
 import matplotlib.pyplot as plt
 import numpy as np
-from .base import fig_to_base64, apply_common_style, get_data_from_query
+from .base import fig_to_base64, apply_common_style, load_chart_data
 
 @tool
 def generate_radar_chart(
-    query: str,
+    query: str = "",
+    dataset: str = "",
+    column_map: Optional[Dict[str, str]] = None,
     theme: str = "default",
     width: int = 8,
     height: int = 8,
@@ -16,10 +18,14 @@ def generate_radar_chart(
     Generates a radar (spider) chart to compare multiple quantitative variables across categories.
     
     Args:
-        query (str): The SQL query to fetch data. Expected columns:
+        query (str): The SQL query (empty when passing dataset) to fetch data. Expected columns:
             - 'item': The dimension or variable name (e.g., 'Speed', 'Quality').
             - 'score': The numeric value for that dimension.
             - 'group' (optional): A string to create multiple layers (e.g., 'Product A', 'Product B').
+        dataset (str): Handle of an earlier result (e.g. "ds_1a2b3c", reported by
+            execute_query). Use instead of query to chart data already fetched.
+        column_map (dict, optional): Renames dataset columns to the expected ones,
+            as {expected_name: dataset_column}, e.g. {"x": "region", "y": "total"}.
         theme (str): Visual style ('default', 'dark', 'academy').
         width (int): Figure width in inches. Default is 8.
         height (int): Figure height in inches. Default is 8.
@@ -28,7 +34,7 @@ def generate_radar_chart(
     Returns:
         str: A base64-encoded PNG image string (data URI).
     """
-    df = get_data_from_query(query)
+    df = load_chart_data(query, dataset, column_map)
     items = df['item'].unique()
     num_vars = len(items)
 
@@ -2,11 +2,13 @@ from langchain_core.tools import tool
 from typing import List, Dict, Any, Optional
 import matplotlib.pyplot as plt
 from matplotlib_venn import venn2, venn3
-from .base import fig_to_base64, apply_common_style, get_data_from_query
+from .base import fig_to_base64, apply_common_style, load_chart_data
 
 @tool
 def generate_venn_chart(
-    query: str,
+    query: str = "",
+    dataset: str = "",
+    column_map: Optional[Dict[str, str]] = None,
     theme: str = "default",
     width: int = 8,
     height: int = 8,
@@ -16,7 +18,11 @@ def generate_venn_chart(
     Generates a Venn diagram to visualize overlapping sets.
     
     Args:
-        query (str): The SQL query to fetch set names. Expected column: 'name'.
+        query (str): The SQL query (empty when passing dataset) to fetch set names. Expected column: 'name'.
+        dataset (str): Handle of an earlier result (e.g. "ds_1a2b3c", reported by
+            execute_query). Use instead of query to chart data already fetched.
+        column_map (dict, optional): Renames dataset columns to the expected ones,
+            as {expected_name: dataset_column}, e.g. {"x": "region", "y": "total"}.
         theme (str): Visual style ('default', 'dark', 'academy').
         width (int): Figure width in inches. Default is 8.
         height (int): Figure height in inches. Default is 8.
@@ -25,7 +31,7 @@ def generate_venn_chart(
     Returns:
         str: A base64-encoded PNG image string (data URI).
     """
-    df = get_data_from_query(query)
+    df = load_chart_data(query, dataset, column_map)
     names = df['name'].tolist()
     
     fig, ax = plt.subplots(figsize=(width, height))
@@ -2,11 +2,13 @@ from langchain_core.tools import tool
 from typing import List, Dict, Any, Optional
 import matplotlib.pyplot as plt
 from wordcloud import WordCloud
-from .base import fig_to_base64, get_data_from_query
+from .base import fig_to_base64, load_chart_data
 
 @tool
 def generate_word_cloud_chart(
-    query: str,
+    query: str = "",
+    dataset: str = "",
+    column_map: Optional[Dict[str, str]] = None,
     theme: str = "default",
     width: int = 10,
     height: int = 6,
@@ -16,9 +18,13 @@ def generate_word_cloud_chart(
     Generates a word cloud to visualize word frequency or importance.
     
     Args:
-        query (str): The SQL query to fetch data. Expected columns:
+        query (str): The SQL query (empty when passing dataset) to fetch data. Expected columns:
             - 'name': The word or term.
             - 'value': The weight, frequency, or importance of the word.
+        dataset (str): Handle of an earlier result (e.g. "ds_1a2b3c", reported by
+            execute_query). Use instead of query to chart data already fetched.
+        column_map (dict, optional): Renames dataset columns to the expected ones,
+            as {expected_name: dataset_column}, e.g. {"x": "region", "y": "total"}.
         theme (str): Visual style ('default', 'dark', 'academy').
         width (int): Figure width in inches. Default is 10.
         height (int): Figure height in inches. Default is 6.
@@ -27,7 +33,7 @@ def generate_word_cloud_chart(
     Returns:
         str: A base64-encoded PNG image string (data URI).
     """
-    df = get_data_from_query(query)
+    df = load_chart_data(query, dataset, column_map)
     word_freq = dict(zip(df['name'], df['value']))
     
     bg_color = 'white' if theme != 'dark' else '#2c2c2c'
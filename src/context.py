@@ -0,0 +1,20 @@
+import contextvars
+
+# Chat session the current agent turn belongs to. Set by the WebSocket handler;
+# inherited by LangGraph tasks, tool calls and DB executor threads.
+current_session_id: contextvars.ContextVar = contextvars.ContextVar("current_session_id", default=None)
+
+# Set (to a threading.Event) by the WebSocket handler for each turn. Blocking work the
+# turn started in worker threads (DB fetches, chart rendering) cannot be reached by
+# asyncio cancellation, so it checks this flag between steps instead.
+current_turn_cancelled: contextvars.ContextVar = contextvars.ContextVar("current_turn_cancelled", default=None)
+
+
+class TurnCancelled(Exception):
+    """The user cancelled the turn this work belongs to."""
+
+
+def raise_if_cancelled() -> None:
+    event = current_turn_cancelled.get()
+    if event is not None and event.is_set():
+        raise TurnCancelled("Cancelled by the user")
@@ -3,22 +3,126 @@ import boto3
 from strands.models import BedrockModel
 load_dotenv()
 import os
+import threading
+from collections import OrderedDict, defaultdict
 
 from langchain_aws import ChatBedrock
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import SystemMessage
 
 MODEL_ID = os.getenv("BEDROCK_MODEL_ID")
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_REGION = os.getenv("AWS_REGION")
 
+# Bedrock prompt caching for the stable request prefix (tool schemas + system prompt)
+# and the growing conversation; only Anthropic and Nova models support it
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+PROMPT_CACHE_TTL = os.getenv("PROMPT_CACHE_TTL", "5m")
+
+
+class PromptCacheUsage(BaseCallbackHandler):
+    """Aggregates input / cache read / cache write tokens per agent from model usage metadata."""
+
+    # Runs cancelled mid-stream may never report an end or error; the oldest are forgotten
+    max_open_runs = 1024
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._agents_by_run: OrderedDict = OrderedDict()
+        self._totals = defaultdict(lambda: {"calls": 0, "input_tokens": 0, "cache_read": 0, "cache_creation": 0})
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        with self._lock:
+            self._agents_by_run[run_id] = (metadata or {}).get("lc_agent_name") or "model"
+            while len(self._agents_by_run) > self.max_open_runs:
+                self._agents_by_run.popitem(last=False)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            agent = self._agents_by_run.pop(run_id, "model")
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        if not usage:
+            return
+        details = usage.get("input_token_details") or {}
+        input_tokens = usage.get("input_tokens", 0) or 0
+        cache_read = details.get("cache_read", 0) or 0
+        cache_creation = details.get("cache_creation", 0) or 0
+        # Depending on the API path input_tokens may or may not include the cached part
+        if input_tokens < cache_read + cache_creation:
+            input_tokens += cache_read + cache_creation
+        with self._lock:
+            totals = self._totals[agent]
+            totals["calls"] += 1
+            totals["input_tokens"] += input_tokens
+            totals["cache_read"] += cache_read
+            totals["cache_creation"] += cache_creation
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._agents_by_run.pop(run_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = {}
+            for agent, totals in self._totals.items():
+                hit_rate = totals["cache_read"] / totals["input_tokens"] if totals["input_tokens"] else 0.0
+                result[agent] = {**totals, "hit_rate": round(hit_rate, 4)}
+            return {"enabled": prompt_caching_supported(), "agents": result}
+
+
+prompt_cache_usage = PromptCacheUsage()
+
 bedrock_model = ChatBedrock(
     model_id=MODEL_ID,
     region_name=AWS_REGION,
     aws_access_key_id=AWS_ACCESS_KEY_ID,
     aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
     streaming=True,
+    callbacks=[prompt_cache_usage],
 )
 
+
+def prompt_caching_supported(model=bedrock_model) -> bool:
+    """True when prompt caching is enabled and the Bedrock model supports it."""
+    model_id = (getattr(model, "base_model_id", None) or getattr(model, "model_id", None) or "").lower()
+    return PROMPT_CACHE_ENABLED and any(name in model_id for name in ("anthropic", "amazon.nova"))
+
+
+def cached_system_prompt(text: str):
+    """
+    The system prompt for create_agent, with a cache breakpoint after it when the
+    model supports caching. Anthropic requests put tool schemas before the system
+    prompt, so the breakpoint covers both.
+
+    Args:
+        text: The system prompt.
+
+    Returns:
+        A SystemMessage with cache_control, or the plain text for other models.
+    """
+    if not prompt_caching_supported():
+        return text
+    return SystemMessage(content=[{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}])
+
+
+def prompt_cache_middleware() -> list:
+    """
+    Agent middleware that adds a cache breakpoint on the latest message of every
+    model call, so tool results (e.g. get_tables output) are read from cache on the
+    following calls of the same run. Empty when caching is unsupported.
+    """
+    if not prompt_caching_supported():
+        return []
+    try:
+        from langchain_aws.middleware.prompt_caching import BedrockPromptCachingMiddleware
+    except ImportError:
+        return []
+    return [BedrockPromptCachingMiddleware(ttl=PROMPT_CACHE_TTL, unsupported_model_behavior="ignore")]
+
 # Create a custom boto3 session
 session = boto3.Session(
     aws_access_key_id=AWS_ACCESS_KEY_ID,
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from src.tools.read_schema_tool import _load_schema, schema_version
+from src.tools.schema_search import tokenize
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() not in ("0", "false", "no")
+# Optional small Bedrock model asked about messages the rules cannot place
+ROUTER_MODEL_ID = os.getenv("ROUTER_MODEL_ID", "")
+ROUTER_MODEL_TIMEOUT = float(os.getenv("ROUTER_MODEL_TIMEOUT", "2"))
+# Optional JSON-lines file every routing decision is appended to, for auditing
+ROUTER_AUDIT_LOG = os.getenv("ROUTER_AUDIT_LOG", "")
+
+RESEARCH = "research_agent"
+VISUALIZATION = "visualization_agent"
+SUPERVISOR = "supervisor"
+
+_SMALL_TALK_RE = re.compile(
+    r"^\s*(hi|hello|hey|thanks|thank you|ok|okay|bye|good (morning|evening)|who are you|what can you do|help)\b",
+    re.IGNORECASE,
+)
+# Follow-ups only make sense with the conversation history, which only the supervisor has
+_FOLLOW_UP_RE = re.compile(
+    r"^\s*(and|also|now|then|what about|how about|same|again|instead|ok so)\b"
+    r"|\b(it|them|that|those|these|the same|above|previous|earlier|last (one|answer|result|query))\b"
+    r"|\b(you|your|said|say|again)\b",
+    re.IGNORECASE,
+)
+_CHART_RE = re.compile(
+    r"\b(chart|charts|plot|plots|graph|graphs|visuali[sz]e|visuali[sz]ation|histogram|pie|scatter|heat ?map|"
+    r"word ?cloud|treemap|funnel|waterfall|radar|venn|box ?plot|diagram|dashboard)\b",
+    re.IGNORECASE,
+)
+_DATA_RE = re.compile(
+    r"\b(how many|how much|what (is|are|was|were)|which|who|list|count|total|sum|average|avg|mean|median|"
+    r"max(imum)?|min(imum)?|top \d+|highest|lowest|most|least|compare|rank|find|show)\b",
+    re.IGNORECASE,
+)
+# Column words too generic to tie a message to the database on their own
+_GENERIC_SCHEMA_TERMS = frozenset(
+    "id name type value code date time status description created updated total number max unique "
+    "use under within present done exist fully original sub ref dec loc dist link tag dataset".split()
+)
+# A question on top of a chart request ("what is X and plot it") needs both agents
+_QUESTION_RE = re.compile(r"^\s*(what|which|how|who|why|when|is|are|does|do)\b|\?", re.IGNORECASE)
+
+_MODEL_PROMPT = """Classify the user's message for a database assistant. Reply with exactly one word:
+research - a question answered by querying data
+visualization - a request for a chart or graph
+supervisor - anything else (small talk, needs both, unclear)
+
+Message: {message}"""
+
+
+@dataclass
+class Route:
+    """Where a message goes: a sub-agent name or "supervisor", and why."""
+
+    target: str
+    method: str
+    reason: str
+
+    @property
+    def direct(self) -> bool:
+        return self.target != SUPERVISOR
+
+
+def classify(message: str, has_history: bool = False) -> Optional[Route]:
+    """
+    Keyword/regex routing. Returns None when the message is ambiguous and
+    should go to the optional model (or the supervisor).
+    """
+    if not ROUTER_ENABLED:
+        return Route(SUPERVISOR, "disabled", "router disabled")
+    if _SMALL_TALK_RE.search(message):
+        return Route(SUPERVISOR, "rules", "small talk")
+    if has_history and _FOLLOW_UP_RE.search(message):
+        return Route(SUPERVISOR, "rules", "follow-up needs history")
+
+    chart = _CHART_RE.search(message)
+    if chart and not _QUESTION_RE.search(message):
+        return Route(VISUALIZATION, "rules", f"chart keyword '{chart.group(0).lower()}'")
+    if chart:
+        return None
+    # "show me" / "how many" alone are ordinary conversation: also require a table or column word
+    data = _DATA_RE.search(message)
+    if data:
+        terms = schema_terms()
+        subject = next((t for t in tokenize(message) if t in terms), None)
+        if subject is not None:
+            return Route(RESEARCH, "rules", f"data keyword '{data.group(0).lower()}' on '{subject}'")
+    return None
+
+
+_schema_terms: Optional[tuple[float, frozenset]] = None
+
+
+def schema_terms() -> frozenset:
+    """Word tokens of the table and column names in tables_schema.json, cached per schema version."""
+    global _schema_terms
+    version = schema_version()
+    if _schema_terms is None or _schema_terms[0] != version:
+        terms = set()
+        try:
+            for table in _load_schema():
+                terms.update(tokenize(table.get("table_name", "")))
+                for column in table.get("columns", []):
+                    terms.update(tokenize(column.get("column_name", "")))
+        except (OSError, ValueError) as e:
+            logger.warning("Router has no schema terms, data questions go to the supervisor: %s", e)
+        _schema_terms = (version, frozenset(
+            t for t in terms if len(t) > 2 and not t.isdigit() and t not in _GENERIC_SCHEMA_TERMS
+        ))
+    return _schema_terms[1]
+
+
+_router_model = None
+
+
+def _get_router_model():
+    global _router_model
+    if _router_model is None:
+        from langchain_aws import ChatBedrock
+
+        from src.model import AWS_ACCESS_KEY_ID, AWS_REGION, AWS_SECRET_ACCESS_KEY
+
+        _router_model = ChatBedrock(
+            model_id=ROUTER_MODEL_ID,
+            region_name=AWS_REGION,
+            aws_access_key_id=AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+            model_kwargs={"temperature": 0, "max_tokens": 5},
+        )
+    return _router_model
+
+
+async def _classify_with_model(message: str, has_history: bool = False) -> Optional[Route]:
+    # The model only sees this message: anything past the rules in a conversation may lean on its history
+    if has_history:
+        return Route(SUPERVISOR, "model", "ambiguous with history")
+    try:
+        reply = await asyncio.wait_for(
+            _get_router_model().ainvoke(_MODEL_PROMPT.format(message=message)), ROUTER_MODEL_TIMEOUT
+        )
+    except Exception as e:
+        logger.warning("Router model unavailable, falling back to the supervisor: %s", e)
+        return None
+    word = (reply.text or "").strip().split()[0].lower() if (reply.text or "").strip() else ""
+    target = {"research": RESEARCH, "visualization": VISUALIZATION, "supervisor": SUPERVISOR}.get(word.strip(".,"))
+    return Route(target, "model", f"model answered '{word}'") if target else None
+
+
+class RouterStats:
+    """Decision counters for /metrics."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, route: Route) -> None:
+        with self._lock:
+            self._counts[(route.target, route.method)] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = sum(self._counts.values())
+            direct = sum(n for (target, _), n in self._counts.items() if target != SUPERVISOR)
+            return {
+                "enabled": ROUTER_ENABLED,
+                "model": ROUTER_MODEL_ID or None,
+                "decisions": total,
+                "direct_rate": round(direct / total, 4) if total else 0.0,
+                "by_target": {f"{target}/{method}": n for (target, method), n in sorted(self._counts.items())},
+            }
+
+
+router_stats = RouterStats()
+_audit_lock = threading.Lock()
+
+
+async def _audit(session_id: str, message: str, route: Route) -> None:
+    logger.info("route session=%s target=%s method=%s reason=%s", session_id, route.target, route.method, route.reason)
+    if not ROUTER_AUDIT_LOG:
+        return
+    line = json.dumps({"ts": time.time(), "session_id": session_id, "message": message, **asdict(route)})
+    await asyncio.to_thread(_append_audit_line, line)
+
+
+def _append_audit_line(line: str) -> None:
+    try:
+        with _audit_lock, open(ROUTER_AUDIT_LOG, "a") as file:
+            file.write(line + "\n")
+    except OSError as e:
+        logger.warning("Could not write router audit log %s: %s", ROUTER_AUDIT_LOG, e)
+
+
+async def route_message(message: str, session_id: str = "", has_history: bool = False) -> Route:
+    """
+    Picks the agent for a user message: rules first, then the optional router
+    model, and the supervisor for whatever is still ambiguous. Every decision is
+    logged (and appended to ROUTER_AUDIT_LOG when set).
+    """
+    route = classify(message, has_history)
+    if route is None and ROUTER_MODEL_ID:
+        route = await _classify_with_model(message, has_history)
+    if route is None:
+        route = Route(SUPERVISOR, "fallback", "ambiguous")
+    router_stats.record(route)
+    await _audit(session_id, message, route)
+    return route
@@ -0,0 +1,322 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+from langgraph.checkpoint.memory import InMemorySaver
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "auto" tries Postgres (the chat_history database), then SQLite, then memory
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "auto").lower()
+CHECKPOINT_POSTGRES_URL = os.getenv("CHECKPOINT_POSTGRES_URL", "")
+CHECKPOINT_POOL_SIZE = int(os.getenv("CHECKPOINT_POOL_SIZE", "5"))
+CHECKPOINT_SQLITE_PATH = os.getenv(
+    "CHECKPOINT_SQLITE_PATH", str(Path(__file__).resolve().parent.parent.parent / "checkpoints.sqlite")
+)
+# Root checkpoints kept per thread after each turn; sub-agent checkpoints are dropped
+CHECKPOINT_KEEP_PER_THREAD = max(1, int(os.getenv("CHECKPOINT_KEEP_PER_THREAD", "3")))
+# Threads idle this long are deleted by the maintenance task. Off (0) by default: the chat
+# history outlives any TTL, so a thread is otherwise only deleted with its session
+CHECKPOINT_THREAD_TTL = float(os.getenv("CHECKPOINT_THREAD_TTL", "0"))
+CHECKPOINT_PRUNE_INTERVAL = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL", "300"))
+# In-memory backend only: least recently active threads beyond this are evicted
+CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "500"))
+
+# Offset between the UUID epoch (1582-10-15) and the Unix epoch, in 100ns ticks
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+_PG_PRUNE_SQL = [
+    """
+    DELETE FROM checkpoints
+    WHERE thread_id = %(thread_id)s
+      AND (checkpoint_ns <> '' OR checkpoint_id NOT IN (
+          SELECT checkpoint_id FROM checkpoints
+          WHERE thread_id = %(thread_id)s AND checkpoint_ns = ''
+          ORDER BY checkpoint_id DESC LIMIT %(keep)s
+      ))
+    """,
+    """
+    DELETE FROM checkpoint_writes w
+    WHERE w.thread_id = %(thread_id)s AND NOT EXISTS (
+        SELECT 1 FROM checkpoints c
+        WHERE c.thread_id = w.thread_id AND c.checkpoint_ns = w.checkpoint_ns AND c.checkpoint_id = w.checkpoint_id
+    )
+    """,
+    # Blobs are shared between checkpoints by channel version; keep the ones still referenced
+    """
+    DELETE FROM checkpoint_blobs b
+    WHERE b.thread_id = %(thread_id)s AND NOT EXISTS (
+        SELECT 1 FROM checkpoints c
+        WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+          AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+    )
+    """,
+]
+
+_SQLITE_PRUNE_SQL = [
+    """
+    DELETE FROM checkpoints
+    WHERE thread_id = :thread_id
+      AND (checkpoint_ns <> '' OR checkpoint_id NOT IN (
+          SELECT checkpoint_id FROM checkpoints
+          WHERE thread_id = :thread_id AND checkpoint_ns = ''
+          ORDER BY checkpoint_id DESC LIMIT :keep
+      ))
+    """,
+    """
+    DELETE FROM writes
+    WHERE thread_id = :thread_id AND NOT EXISTS (
+        SELECT 1 FROM checkpoints c
+        WHERE c.thread_id = writes.thread_id AND c.checkpoint_ns = writes.checkpoint_ns
+          AND c.checkpoint_id = writes.checkpoint_id
+    )
+    """,
+]
+
+_LAST_CHECKPOINT_SQL = (
+    "SELECT thread_id, MAX(checkpoint_id) AS checkpoint_id FROM checkpoints WHERE checkpoint_ns = '' GROUP BY thread_id"
+)
+
+
+def checkpoint_time(checkpoint_id: str) -> float:
+    """Unix time a checkpoint was written, read from its UUIDv6 id."""
+    value = uuid.UUID(checkpoint_id).int
+    ticks = ((value >> 96) << 28) | (((value >> 80) & 0xFFFF) << 12) | ((value >> 64) & 0x0FFF)
+    return (ticks - _UUID_EPOCH_OFFSET) / 1e7
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    InMemorySaver that can drop old checkpoints and whole threads, so a
+    long-running worker without a database does not grow without bound.
+    """
+
+    def __init__(self, max_threads: int = CHECKPOINT_MAX_THREADS, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+
+    def prune_thread(self, thread_id: str, keep: int) -> None:
+        """Keeps the thread's latest ``keep`` root checkpoints and drops its sub-agent ones."""
+        namespaces = self.storage.get(thread_id)
+        if not namespaces:
+            # Reads of unknown threads leave empty entries behind
+            self.storage.pop(thread_id, None)
+            return
+        for checkpoint_ns in list(namespaces):
+            checkpoints = namespaces[checkpoint_ns]
+            stale = sorted(checkpoints, reverse=True)[keep:] if checkpoint_ns == "" else list(checkpoints)
+            for checkpoint_id in stale:
+                del checkpoints[checkpoint_id]
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            if not checkpoints:
+                del namespaces[checkpoint_ns]
+
+        referenced = set()
+        for checkpoint_ns, checkpoints in namespaces.items():
+            for saved, _, _ in checkpoints.values():
+                for channel, version in self.serde.loads_typed(saved).get("channel_versions", {}).items():
+                    referenced.add((thread_id, checkpoint_ns, channel, version))
+        for key in [k for k in self.blobs if k[0] == thread_id and k not in referenced]:
+            del self.blobs[key]
+        for key in [k for k in self.writes if k[0] == thread_id and k[1] not in namespaces]:
+            del self.writes[key]
+
+    def last_activity(self) -> dict[str, float]:
+        """Unix time of each thread's latest root checkpoint."""
+        return {
+            thread_id: checkpoint_time(max(namespaces[""]))
+            for thread_id, namespaces in self.storage.items()
+            if namespaces.get("")
+        }
+
+    def checkpoint_count(self) -> int:
+        return sum(len(c) for namespaces in self.storage.values() for c in namespaces.values())
+
+
+class CheckpointStore:
+    """
+    Owns the supervisor's LangGraph checkpointer: AsyncPostgresSaver on the
+    chat_history database, AsyncSqliteSaver for local runs, or a bounded
+    in-memory saver when neither is available.
+
+    Retention is applied here rather than by the savers: ``prune_thread``
+    runs after every turn, and ``run_maintenance`` deletes idle threads.
+    """
+
+    def __init__(self) -> None:
+        self.backend = "memory"
+        self.saver = BoundedMemorySaver()
+        self._pool = None
+        self._sqlite = None
+        self._pruned = 0
+        self._expired = 0
+        self._deleted = 0
+        self._errors = 0
+
+    async def open(self) -> None:
+        """Connects the configured backend; keeps the in-memory saver when it cannot."""
+        backends = ["postgres", "sqlite"] if CHECKPOINT_BACKEND == "auto" else [CHECKPOINT_BACKEND]
+        for backend in backends:
+            if backend == "memory":
+                return
+            try:
+                if backend == "postgres":
+                    await self._open_postgres()
+                elif backend == "sqlite":
+                    await self._open_sqlite()
+                else:
+                    raise ValueError(f"unknown CHECKPOINT_BACKEND '{backend}'")
+                self.backend = backend
+                logger.info("Agent checkpoints stored in %s", backend)
+                return
+            except Exception as e:
+                logger.warning("Checkpoint backend %s unavailable (%s)", backend, e)
+        logger.warning("Using in-memory agent checkpoints (max %d threads)", self.saver.max_threads)
+
+    async def _open_postgres(self) -> None:
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        from psycopg.rows import dict_row
+        from psycopg_pool import AsyncConnectionPool
+
+        conninfo = CHECKPOINT_POSTGRES_URL
+        if not conninfo:
+            if not os.getenv("host"):
+                raise RuntimeError("no database configured")
+            conninfo = " ".join(
+                f"{key}={value}"
+                for key, value in (
+                    ("host", os.getenv("host")),
+                    ("port", os.getenv("port", "5432")),
+                    ("dbname", os.getenv("dbname")),
+                    ("user", os.getenv("user")),
+                    ("password", os.getenv("password")),
+                )
+                if value
+            )
+        pool = AsyncConnectionPool(
+            conninfo,
+            max_size=CHECKPOINT_POOL_SIZE,
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+            open=False,
+        )
+        await pool.open(wait=True, timeout=10)
+        try:
+            saver = AsyncPostgresSaver(pool)
+            await saver.setup()
+        except Exception:
+            await pool.close()
+            raise
+        self._pool, self.saver = pool, saver
+
+    async def _open_sqlite(self) -> None:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        connection = await aiosqlite.connect(CHECKPOINT_SQLITE_PATH)
+        try:
+            saver = AsyncSqliteSaver(connection)
+            await saver.setup()
+        except Exception:
+            await connection.close()
+            raise
+        self._sqlite, self.saver = connection, saver
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+        if self._sqlite is not None:
+            await self._sqlite.close()
+
+    async def prune_thread(self, thread_id: str, keep: int = CHECKPOINT_KEEP_PER_THREAD) -> None:
+        """Drops a thread's sub-agent checkpoints and all but its latest ``keep`` root checkpoints."""
+        try:
+            if self.backend == "postgres":
+                async with self._pool.connection() as connection:
+                    for sql in _PG_PRUNE_SQL:
+                        await connection.execute(sql, {"thread_id": thread_id, "keep": keep})
+            elif self.backend == "sqlite":
+                async with self.saver.lock:
+                    for sql in _SQLITE_PRUNE_SQL:
+                        await self._sqlite.execute(sql, {"thread_id": thread_id, "keep": keep})
+                    await self._sqlite.commit()
+            else:
+                self.saver.prune_thread(thread_id, keep)
+                activity = self.saver.last_activity()
+                for stale in sorted(activity, key=activity.get)[:max(0, len(activity) - self.saver.max_threads)]:
+                    self.saver.delete_thread(stale)
+                    self._expired += 1
+            self._pruned += 1
+        except Exception as e:
+            self._errors += 1
+            logger.warning("Could not prune checkpoints of thread %s: %s", thread_id, e)
+
+    async def delete_thread(self, thread_id: str) -> None:
+        try:
+            await self.saver.adelete_thread(thread_id)
+            self._deleted += 1
+        except Exception as e:
+            self._errors += 1
+            logger.warning("Could not delete checkpoints of thread %s: %s", thread_id, e)
+
+    async def _last_activity(self) -> dict[str, float]:
+        if self.backend == "postgres":
+            async with self._pool.connection() as connection:
+                cursor = await connection.execute(_LAST_CHECKPOINT_SQL)
+                rows = [(row["thread_id"], row["checkpoint_id"]) for row in await cursor.fetchall()]
+        elif self.backend == "sqlite":
+            async with self.saver.lock, self._sqlite.execute(_LAST_CHECKPOINT_SQL) as cursor:
+                rows = await cursor.fetchall()
+        else:
+            return self.saver.last_activity()
+        return {thread_id: checkpoint_time(checkpoint_id) for thread_id, checkpoint_id in rows}
+
+    async def expire_idle(self, ttl: float = CHECKPOINT_THREAD_TTL, active: Optional[set] = None) -> int:
+        """Deletes threads whose latest checkpoint is older than ``ttl`` seconds, except ``active`` ones (0 = never)."""
+        if ttl <= 0:
+            return 0
+        cutoff = time.time() - ttl
+        expired = 0
+        for thread_id, last in (await self._last_activity()).items():
+            if last < cutoff and thread_id not in (active or ()):
+                await self.saver.adelete_thread(thread_id)
+                expired += 1
+        self._expired += expired
+        return expired
+
+    async def run_maintenance(self, active_threads: Optional[set] = None) -> None:
+        """Background loop: expires idle threads every CHECKPOINT_PRUNE_INTERVAL seconds."""
+        while True:
+            await asyncio.sleep(CHECKPOINT_PRUNE_INTERVAL)
+            try:
+                expired = await self.expire_idle(active=active_threads)
+                if expired:
+                    logger.info("Expired checkpoints of %d idle threads", expired)
+            except Exception as e:
+                self._errors += 1
+                logger.warning("Checkpoint maintenance failed: %s", e)
+
+    def stats(self) -> dict:
+        stats = {
+            "backend": self.backend,
+            "keep_per_thread": CHECKPOINT_KEEP_PER_THREAD,
+            "thread_ttl": CHECKPOINT_THREAD_TTL,
+            "prunes": self._pruned,
+            "expired_threads": self._expired,
+            "deleted_threads": self._deleted,
+            "errors": self._errors,
+        }
+        if self.backend == "memory":
+            stats["threads"] = sum(1 for namespaces in self.saver.storage.values() if namespaces)
+            stats["checkpoints"] = self.saver.checkpoint_count()
+            stats["max_threads"] = self.saver.max_threads
+        return stats
+
+
+checkpoint_store = CheckpointStore()
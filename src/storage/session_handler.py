@@ -1,18 +1,35 @@
+import asyncio
 import json
 import logging
 import os
+import threading
+import time
 import uuid
+from contextlib import contextmanager
 from datetime import datetime, timezone
+from typing import Optional
 
 import psycopg2
 from dotenv import load_dotenv
+from psycopg2.extras import execute_values
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 
 load_dotenv()
 
 TABLE_NAME = "chat_history"
 
+# Messages are written behind the turn, in multi-row INSERTs of up to this many rows...
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "100"))
+# ... at most this long after they were saved
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL_MS", "200")) / 1000
+# Unwritten messages kept while the database is unreachable; the oldest are dropped past this
+HISTORY_MAX_PENDING = int(os.getenv("HISTORY_MAX_PENDING", "10000"))
+
+logger = logging.getLogger(__name__)
+
 _conn = None
+# The connection is shared by the event loop, the history writer and request threads
+_conn_lock = threading.RLock()
 _storage_backend = "db"  # "db" or "memory"
 _memory_sessions = {}  # session_id -> list of {"role", "content", "created_at"} for list_sessions
 
@@ -33,13 +50,21 @@ def _get_connection():
     return _conn
 
 
+@contextmanager
+def _cursor():
+    """A cursor on the shared connection, held exclusively for the block."""
+    with _conn_lock:
+        conn = _get_connection()
+        with conn.cursor() as cur:
+            yield cur
+
+
 def init_chat_history():
     global _storage_backend
     try:
-        conn = _get_connection()
-        if conn is None:
+        if _storage_backend != "db":
             return
-        with conn.cursor() as cur:
+        with _cursor() as cur:
             cur.execute(f"""
                 CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
                     id SERIAL PRIMARY KEY,
@@ -53,7 +78,7 @@ def init_chat_history():
                 ON {TABLE_NAME} (session_id)
             """)
     except Exception as e:
-        logging.getLogger(__name__).warning(
+        logger.warning(
             "Database unavailable (%s), using in-memory chat history.", e
         )
         _storage_backend = "memory"
@@ -85,48 +110,187 @@ def _deserialize_message(row: dict):
     return HumanMessage(content=content)
 
 
-def save_user_message(session_id: str, content: str):
-    msg = _serialize_message(HumanMessage(content=content))
+def _save(session_id: str, role: str, msg: dict, content: str) -> None:
+    created_at = datetime.now(timezone.utc)
     if _storage_backend == "memory":
         _memory_sessions.setdefault(session_id, []).append({
-            "role": "user",
+            "role": role,
             "content": content,
-            "created_at": datetime.now(timezone.utc),
+            "created_at": created_at,
         })
         return
-    conn = _get_connection()
-    with conn.cursor() as cur:
-        cur.execute(
-            f"INSERT INTO {TABLE_NAME} (session_id, message) VALUES (%s, %s)",
-            (session_id, json.dumps(msg)),
-        )
+    row = (session_id, json.dumps(msg), created_at)
+    if history_writer.enqueue(row):
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _insert_rows([row])
+        return
+    # Writer not running but called on the event loop: write on a thread, not the loop
+    loop.run_in_executor(None, _insert_rows, [row]).add_done_callback(_log_insert_error)
+
+
+def _log_insert_error(future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Could not write chat history row: %s", future.exception())
+
+
+def save_user_message(session_id: str, content: str):
+    _save(session_id, "user", _serialize_message(HumanMessage(content=content)), content)
 
 
 def save_ai_message(session_id: str, content: str):
-    msg = _serialize_message(AIMessage(content=content))
-    if _storage_backend == "memory":
-        _memory_sessions.setdefault(session_id, []).append({
-            "role": "assistant",
-            "content": content,
-            "created_at": datetime.now(timezone.utc),
-        })
-        return
-    conn = _get_connection()
-    with conn.cursor() as cur:
-        cur.execute(
-            f"INSERT INTO {TABLE_NAME} (session_id, message) VALUES (%s, %s)",
-            (session_id, json.dumps(msg)),
+    _save(session_id, "assistant", _serialize_message(AIMessage(content=content)), content)
+
+
+def _insert_rows(rows: list[tuple]) -> None:
+    """One multi-row INSERT for ``rows`` of (session_id, message_json, created_at)."""
+    with _cursor() as cur:
+        execute_values(
+            cur,
+            f"INSERT INTO {TABLE_NAME} (session_id, message, created_at) VALUES %s",
+            rows,
+            page_size=max(len(rows), 1),
         )
 
 
+class HistoryWriter:
+    """
+    Write-behind queue for chat history rows.
+
+    ``enqueue`` only appends to a buffer (it is safe to call from any
+    thread); a task on the event loop writes the buffer with one multi-row
+    INSERT once ``batch_size`` rows are waiting or ``interval`` seconds have
+    passed. Rows carry the time they were saved, so history order does not
+    depend on when they are written. Readers call ``flush()`` first to see
+    every saved message, and ``stop()`` drains the queue on shutdown.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = HISTORY_BATCH_SIZE,
+        interval: float = HISTORY_FLUSH_INTERVAL,
+        max_pending: int = HISTORY_MAX_PENDING,
+    ) -> None:
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._pending: list[tuple] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self._rows = 0
+        self._batches = 0
+        self._failures = 0
+        self._dropped = 0
+        self._write_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Starts the writer task on the running loop (no-op with in-memory history)."""
+        if _storage_backend != "db" or self.running:
+            return
+        self._stopping = False
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the writer task and writes everything still queued."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        await self.flush()
+        if self._pending:
+            logger.warning("Chat history writer stopped with %d unwritten messages", len(self._pending))
+
+    def enqueue(self, row: tuple) -> bool:
+        """Queues a row; False if the writer is not running and the caller should write it itself."""
+        if not self.running:
+            return False
+        with self._lock:
+            self._pending.append(row)
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                del self._pending[:overflow]
+                self._dropped += overflow
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return True
+
+    async def flush(self) -> None:
+        """Writes every queued row (waiting for a write already in progress)."""
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+                if not batch:
+                    return
+                started = time.perf_counter()
+                try:
+                    await asyncio.to_thread(_insert_rows, batch)
+                except Exception as e:
+                    with self._lock:
+                        self._failures += 1
+                        # Back to the front of the queue, in order, for the next flush
+                        self._pending[:0] = batch
+                    logger.warning("Could not write %d chat history rows: %s", len(batch), e)
+                    return
+                with self._lock:
+                    self._rows += len(batch)
+                    self._batches += 1
+                    self._write_seconds += time.perf_counter() - started
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": _storage_backend,
+                "write_behind": self.running,
+                "pending": len(self._pending),
+                "rows_written": self._rows,
+                "batches": self._batches,
+                "rows_per_batch": round(self._rows / self._batches, 2) if self._batches else 0.0,
+                "avg_write_ms": round(1000 * self._write_seconds / self._batches, 2) if self._batches else 0.0,
+                "failures": self._failures,
+                "dropped": self._dropped,
+            }
+
+
+history_writer = HistoryWriter()
+
+
 def load_session_messages(session_id: str) -> list[dict]:
     if _storage_backend == "memory":
         rows = _memory_sessions.get(session_id, [])
         return [{"role": r["role"], "content": r["content"]} for r in rows]
-    conn = _get_connection()
-    with conn.cursor() as cur:
+    with _cursor() as cur:
         cur.execute(
-            f"SELECT message FROM {TABLE_NAME} WHERE session_id = %s ORDER BY created_at ASC",
+            f"SELECT message FROM {TABLE_NAME} WHERE session_id = %s ORDER BY created_at ASC, id ASC",
             (session_id,),
         )
         rows = cur.fetchall()
@@ -158,8 +322,7 @@ def list_sessions() -> list[dict]:
             })
         out.sort(key=lambda x: x["last_active"] or "", reverse=True)
         return out
-    conn = _get_connection()
-    with conn.cursor() as cur:
+    with _cursor() as cur:
         cur.execute(f"""
             WITH session_info AS (
                 SELECT session_id,
@@ -197,8 +360,7 @@ def delete_session(session_id: str):
     if _storage_backend == "memory":
         _memory_sessions.pop(session_id, None)
         return
-    conn = _get_connection()
-    with conn.cursor() as cur:
+    with _cursor() as cur:
         cur.execute(
             f"DELETE FROM {TABLE_NAME} WHERE session_id = %s",
             (session_id,),
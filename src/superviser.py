@@ -1,8 +1,9 @@
 from langchain.agents import create_agent
-from langgraph.checkpoint.memory import MemorySaver
-from src.model import bedrock_model
-from src.agents.research_agent import research_agent
-from src.agents.visualization_agent import visualization_agent
+from src.model import bedrock_model, cached_system_prompt, prompt_cache_middleware
+from src.agents.streaming import PASS_THROUGH
+from src.agents.research_agent import research_agent, get_research_agent
+from src.agents.visualization_agent import visualization_agent, get_visualization_agent
+from src.storage.checkpointer import checkpoint_store
 from src.tools.utils import Initialize_table_details
 
 PROMPT = """You are a supervisor agent that delegates user requests to the right specialist.
@@ -14,15 +15,26 @@ Rules:
 - Pass the user's full question to the tool so it has complete context.
 - Keep your own reply concise — summarize or relay the tool's answer without re-explaining everything."""
 
+PASS_THROUGH_RULES = """
+- The tools' answers are shown to the user directly and end your turn: call the tool right away, without any text of your own.
+- If the request needs both data and a chart, call research_agent and visualization_agent together in the same step.
+- For small talk or questions about yourself, answer directly without a tool."""
+
 
 # initializer = Initialize_table_details()
 # initializer.generate_schema_description()
 
-memory = MemorySaver()
-
+# Bounded in-memory until the app's lifespan opens the Postgres/SQLite checkpointer
+# and swaps it in (see checkpoint_store.open)
 main_agent = create_agent(
-    checkpointer=memory,
+    checkpointer=checkpoint_store.saver,
     model=bedrock_model,
     tools=[research_agent, visualization_agent],
-    system_prompt=PROMPT,
-)
\ No newline at end of file
+    system_prompt=cached_system_prompt(PROMPT + PASS_THROUGH_RULES if PASS_THROUGH else PROMPT),
+    middleware=prompt_cache_middleware(),
+    name="supervisor",
+)
+
+# Compile the sub-agent graphs once at import instead of on the first turn
+get_research_agent()
+get_visualization_agent()
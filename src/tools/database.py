@@ -0,0 +1,791 @@
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from dotenv import load_dotenv
+
+from src.context import current_session_id, raise_if_cancelled
+
+load_dotenv()
+
+# Pool sizing / lifecycle, overridable from .env
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))
+POOL_CHECK_INTERVAL = float(os.getenv("DB_POOL_CHECK_INTERVAL", "30"))
+
+# Per-statement guards
+STATEMENT_TIMEOUT = float(os.getenv("QUERY_STATEMENT_TIMEOUT", "30"))
+# Pooled connections only ever read: PostgreSQL sessions default every transaction to READ ONLY,
+# so a side-effecting function that gets past sql_guard still fails on the server
+DB_READ_ONLY = os.getenv("DB_READ_ONLY", "true").lower() not in ("0", "false", "no")
+QUERY_COST_CHECK = os.getenv("QUERY_COST_CHECK", "true").lower() not in ("0", "false", "no")
+# Planner cost units differ per engine, so each has its own ceiling
+QUERY_MAX_COST = {
+    "postgresql": float(os.getenv("QUERY_MAX_COST", "10000000")),
+    "sqlserver": float(os.getenv("QUERY_MAX_COST_SQLSERVER", "10000")),
+}
+QUERY_MAX_ESTIMATED_ROWS = float(os.getenv("QUERY_MAX_ESTIMATED_ROWS", "50000000"))
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available within the acquire timeout."""
+
+
+class QueryRejected(Exception):
+    """Raised when the planner estimate for a query exceeds the configured cost/row limits."""
+
+
+class StatementCancelled(Exception):
+    """Raised when a connection is requested under a StatementScope that was already cancelled."""
+
+
+# SQLSTATEs of a statement stopped by its timeout or a cancel: PostgreSQL query_canceled,
+# ODBC timeout expired / login timeout / operation canceled (SQL Server via pyodbc)
+_TIMEOUT_SQLSTATES = frozenset({"57014", "HYT00", "HYT01", "HY008"})
+
+
+def is_statement_timeout(error: BaseException) -> bool:
+    """True if a driver error means the statement was stopped by a timeout or cancel."""
+    if isinstance(error, StatementCancelled):
+        return True
+    try:
+        from psycopg2.extensions import QueryCanceledError
+
+        if isinstance(error, QueryCanceledError):
+            return True
+    except ImportError:
+        pass
+    code = getattr(error, "pgcode", None)
+    if code is None and error.args and isinstance(error.args[0], str):
+        code = error.args[0]  # pyodbc puts the SQLSTATE first
+    return code in _TIMEOUT_SQLSTATES
+
+
+@dataclass
+class _PooledConnection:
+    conn: Any
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections shared by the whole process.
+
+    Works for any driver (psycopg2, pyodbc) through the ``connect`` factory.
+    Idle connections are health-checked before reuse, recycled after
+    ``max_idle`` seconds (down to ``min_size``) and replaced after ``max_lifetime``.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        db_type: str,
+        min_size: int = POOL_MIN_SIZE,
+        max_size: int = POOL_MAX_SIZE,
+        acquire_timeout: float = POOL_ACQUIRE_TIMEOUT,
+        max_idle: float = POOL_MAX_IDLE,
+        max_lifetime: float = POOL_MAX_LIFETIME,
+        check_interval: float = POOL_CHECK_INTERVAL,
+    ) -> None:
+        self._connect = connect
+        self.db_type = db_type
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.acquire_timeout = acquire_timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+
+        self._cond = threading.Condition()
+        self._idle: list[_PooledConnection] = []
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._acquired_total = 0
+        self._acquire_timeouts = 0
+        self._acquire_time_total = 0.0
+        self._acquire_time_max = 0.0
+        self._created_total = 0
+        self._discarded_total = 0
+
+        for _ in range(self.min_size):
+            self._idle.append(self._open())
+            self._size += 1
+
+    # ------------------------------------------------------------------ #
+    #  Connection lifecycle
+    # ------------------------------------------------------------------ #
+    def _open(self) -> _PooledConnection:
+        conn = self._connect()
+        with self._cond:
+            self._created_total += 1
+        return _PooledConnection(conn)
+
+    def _close_quietly(self, pooled: _PooledConnection) -> None:
+        # The condition's lock is reentrant: callers may already hold it
+        with self._cond:
+            self._discarded_total += 1
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, pooled: _PooledConnection) -> bool:
+        """Cheap liveness probe, only run when the connection sat idle for a while."""
+        if getattr(pooled.conn, "closed", 0):
+            return False
+        now = time.monotonic()
+        if now - pooled.created_at > self.max_lifetime:
+            return False
+        if now - pooled.last_used < self.check_interval:
+            return True
+        try:
+            cursor = pooled.conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            pooled.conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _recycle_idle(self) -> None:
+        """Close connections idle longer than max_idle, keeping min_size around. Caller holds the lock."""
+        now = time.monotonic()
+        keep: list[_PooledConnection] = []
+        for pooled in self._idle:
+            if self._size > self.min_size and now - pooled.last_used > self.max_idle:
+                self._size -= 1
+                self._close_quietly(pooled)
+            else:
+                keep.append(pooled)
+        self._idle = keep
+
+    # ------------------------------------------------------------------ #
+    #  Acquire / release
+    # ------------------------------------------------------------------ #
+    def acquire(self, timeout: Optional[float] = None) -> _PooledConnection:
+        """Borrow a connection, waiting up to ``timeout`` seconds for one to free up."""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            self._recycle_idle()
+            self._waiting += 1
+            try:
+                while True:
+                    if self._idle:
+                        pooled = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        pooled = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        if not self._idle and self._size >= self.max_size:
+                            self._acquire_timeouts += 1
+                            raise PoolTimeout(
+                                f"Timed out after {timeout:.1f}s waiting for a database connection "
+                                f"({self._size} in use, max {self.max_size})"
+                            )
+            finally:
+                self._waiting -= 1
+
+        # Connect / health-check outside the lock so slow I/O does not block other borrowers.
+        try:
+            if pooled is not None and not self._is_healthy(pooled):
+                self._close_quietly(pooled)
+                pooled = None
+            if pooled is None:
+                pooled = self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self._acquired_total += 1
+            self._acquire_time_total += elapsed
+            self._acquire_time_max = max(self._acquire_time_max, elapsed)
+        return pooled
+
+    def release(self, pooled: _PooledConnection, discard: bool = False) -> None:
+        """Return a connection to the pool, ending any open transaction first."""
+        if not discard:
+            try:
+                pooled.conn.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            if discard or self._closed or getattr(pooled.conn, "closed", 0):
+                self._size -= 1
+                self._close_quietly(pooled)
+            else:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Context manager yielding a raw driver connection from the pool."""
+        pooled = self.acquire(timeout)
+        discard = False
+        try:
+            yield pooled.conn
+        except Exception:
+            discard = bool(getattr(pooled.conn, "closed", 0))
+            raise
+        finally:
+            self.release(pooled, discard=discard)
+
+    def stats(self) -> dict:
+        with self._cond:
+            acquired = self._acquired_total
+            return {
+                "db_type": self.db_type,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiting": self._waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "acquired_total": acquired,
+                "acquire_timeouts": self._acquire_timeouts,
+                "acquire_latency_avg_ms": round(self._acquire_time_total / acquired * 1000, 3) if acquired else 0.0,
+                "acquire_latency_max_ms": round(self._acquire_time_max * 1000, 3),
+                "created_total": self._created_total,
+                "discarded_total": self._discarded_total,
+            }
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            for pooled in self._idle:
+                self._close_quietly(pooled)
+            self._size -= len(self._idle)
+            self._idle = []
+            self._cond.notify_all()
+
+
+# ---------------------------------------------------------------------- #
+#  Datasource registry
+# ---------------------------------------------------------------------- #
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("DB_BREAKER_FAILURES", "3"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("DB_BREAKER_RESET_TIMEOUT", "30"))
+# How long a read waits for a busy replica's pool before falling back to the primary
+REPLICA_ACQUIRE_TIMEOUT = float(os.getenv("DB_REPLICA_ACQUIRE_TIMEOUT", "2"))
+
+
+class DatasourceUnavailable(Exception):
+    """Raised when no configured datasource can currently serve a connection."""
+
+
+class CircuitBreaker:
+    """
+    Stops re-probing a datasource that keeps failing to connect.
+
+    After ``failure_threshold`` consecutive connection failures the breaker
+    opens and callers fail fast. Once ``reset_timeout`` has passed a single
+    trial connection is let through (half-open); its outcome closes or
+    re-opens the breaker.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """Gives back a half-open trial that ended without a verdict (e.g. pool timeout)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+@dataclass
+class Datasource:
+    """A named database endpoint with its own pool and circuit breaker."""
+
+    name: str
+    db_type: str
+    connect: Callable[[], Any]
+    role: str = "primary"
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    pool: Optional[ConnectionPool] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def get_pool(self) -> ConnectionPool:
+        """Return this datasource's pool, creating it on first use."""
+        if self.pool is None:
+            with self._lock:
+                if self.pool is None:
+                    self.pool = ConnectionPool(self.connect, self.db_type)
+        return self.pool
+
+    def stats(self) -> dict:
+        return {
+            "role": self.role,
+            "db_type": self.db_type,
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            **(self.pool.stats() if self.pool is not None else {}),
+        }
+
+
+_datasources: Optional[dict[str, Datasource]] = None
+_registry_lock = threading.Lock()
+
+# In-flight queries per chat session, so a disconnect or abort can cancel them server-side
+_inflight: dict[str, set] = {}
+_inflight_by_conn: dict[int, "_InFlight"] = {}
+_inflight_lock = threading.Lock()
+
+# Set by a caller that must be able to stop exactly the statements it starts
+# (execute_queries does, for a query that overran its time budget)
+current_statement_scope: contextvars.ContextVar = contextvars.ContextVar("current_statement_scope", default=None)
+
+# DB-bound work runs here instead of on the event loop. Sized to the pool so
+# queued queries wait for a worker rather than parking threads on acquire().
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _env(prefix: str, name: str) -> Optional[str]:
+    """Reads ``<prefix><name>``; prefixed (replica) settings fall back to the primary's value."""
+    return os.getenv(prefix + name) or (os.getenv(name) if prefix else None)
+
+
+def _postgres_connect(prefix: str = "") -> Optional[Callable[[], Any]]:
+    pg_host = os.getenv(prefix + "host")
+    pg_port = _env(prefix, "port")
+    pg_dbname = _env(prefix, "dbname")
+    pg_user = _env(prefix, "user")
+    pg_password = _env(prefix, "password")
+    if not (pg_host and pg_dbname and pg_user and pg_password):
+        return None
+
+    import psycopg2
+
+    options = f"-c statement_timeout={int(STATEMENT_TIMEOUT * 1000)}"
+    if DB_READ_ONLY:
+        options += " -c default_transaction_read_only=on"
+
+    def connect():
+        return psycopg2.connect(
+            user=pg_user,
+            password=pg_password,
+            host=pg_host,
+            port=pg_port or "5432",
+            dbname=pg_dbname,
+            options=options,
+        )
+
+    return connect
+
+
+def _sqlserver_connect(prefix: str = "") -> Optional[Callable[[], Any]]:
+    sql_server = os.getenv(prefix + "server")
+    sql_database = _env(prefix, "database")
+    sql_username = _env(prefix, "username")
+    if not (sql_server and sql_database and sql_username):
+        return None
+
+    import pyodbc
+
+    connection_string = (
+        f"DRIVER={_env(prefix, 'driver') or '{ODBC Driver 17 for SQL Server}'};"
+        f"SERVER={sql_server};"
+        f"DATABASE={sql_database};"
+        f"UID={sql_username};"
+        f"PWD={_env(prefix, 'password')};"
+    )
+    if DB_READ_ONLY:
+        # SQL Server has no read-only transactions; this routes to readable secondaries
+        # where configured, and a read-only login is what actually enforces it
+        connection_string += "ApplicationIntent=ReadOnly;"
+
+    def connect():
+        connection = pyodbc.connect(connection_string)
+        connection.timeout = int(STATEMENT_TIMEOUT)  # per-statement query timeout, in seconds
+        return connection
+
+    return connect
+
+
+def _resolve_datasources() -> dict[str, Datasource]:
+    """
+    Reads the .env configuration once.
+
+    - "primary": PostgreSQL (host, port, dbname, user, password) or SQL Server
+      (server, database, username, password). If both are configured, PostgreSQL
+      wins unless it is unreachable at startup.
+    - "replica" (optional): same engine as the primary, enabled by replica_host
+      (or replica_server); other replica_* settings default to the primary's.
+    """
+    configured = []
+    for db_type, factory in (("postgresql", _postgres_connect), ("sqlserver", _sqlserver_connect)):
+        try:
+            connect = factory()
+        except ImportError:
+            continue  # driver not installed
+        if connect is not None:
+            configured.append((db_type, connect))
+
+    if not configured:
+        raise Exception(
+            "Could not establish database connection. Please check your .env file.\n"
+            "For PostgreSQL, provide: host, port, dbname, user, password\n"
+            "For SQL Server, provide: server, database, username, password"
+        )
+
+    primary_type, primary_connect = configured[0]
+    if len(configured) > 1:
+        try:
+            primary_connect().close()
+        except Exception:
+            primary_type, primary_connect = configured[1]
+
+    sources = {"primary": Datasource("primary", primary_type, primary_connect)}
+    replica_factory = _postgres_connect if primary_type == "postgresql" else _sqlserver_connect
+    replica_connect = replica_factory("replica_")
+    if replica_connect is not None:
+        sources["replica"] = Datasource("replica", primary_type, replica_connect, role="replica")
+    return sources
+
+
+def init_datasources() -> dict[str, Datasource]:
+    """Resolve the datasource registry (once per process) and return it."""
+    global _datasources
+    if _datasources is None:
+        with _registry_lock:
+            if _datasources is None:
+                _datasources = _resolve_datasources()
+    return _datasources
+
+
+def get_datasource(name: str = "primary") -> Datasource:
+    sources = init_datasources()
+    if name not in sources:
+        raise KeyError(f"Unknown datasource '{name}'. Configured: {', '.join(sources)}")
+    return sources[name]
+
+
+def _route(analytical: bool) -> list[Datasource]:
+    """Candidates in preference order: analytical reads try replicas before the primary."""
+    sources = init_datasources()
+    candidates = [s for s in sources.values() if s.role == "replica"] if analytical else []
+    candidates.append(sources["primary"])
+    return candidates
+
+
+class _InFlight:
+    """A borrowed connection (and its pyodbc cursors) that may need to be cancelled."""
+
+    def __init__(self, connection, db_type: str) -> None:
+        self.connection = connection
+        self.db_type = db_type
+        self.cursors: list = []
+
+    def cancel(self) -> None:
+        try:
+            if self.db_type == "postgresql":
+                self.connection.cancel()  # same as pg_cancel_backend() for this backend
+            else:
+                for cursor in list(self.cursors):
+                    cursor.cancel()
+        except Exception:
+            pass
+
+
+class StatementScope:
+    """Connections borrowed while this scope is current; cancel() stops their statements server-side."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._inflight: list[_InFlight] = []
+        self.cancelled = False
+
+    def add(self, inflight: _InFlight) -> None:
+        with self._lock:
+            if self.cancelled:
+                raise StatementCancelled("Statement cancelled before it started")
+            self._inflight.append(inflight)
+
+    def discard(self, inflight: _InFlight) -> None:
+        with self._lock:
+            if inflight in self._inflight:
+                self._inflight.remove(inflight)
+
+    def cancel(self) -> int:
+        """Cancels the statements running under this scope; later connections are refused."""
+        with self._lock:
+            self.cancelled = True
+            inflight = list(self._inflight)
+        for query in inflight:
+            query.cancel()
+        return len(inflight)
+
+
+@contextmanager
+def get_connection(timeout: Optional[float] = None, datasource: Optional[str] = None, analytical: bool = False):
+    """
+    Borrow a pooled connection.
+
+    Args:
+        timeout: Seconds to wait for a free connection (defaults to the pool's acquire timeout).
+        datasource: Explicit datasource name; otherwise the connection is routed.
+        analytical: Route to a read replica when one is configured and healthy,
+            falling back to the primary.
+
+    While borrowed, the connection is registered against the current chat
+    session (see src/context.py) so cancel_session_queries() can stop it.
+
+    Yields:
+        tuple: (connection, db_type) where db_type is 'postgresql' or 'sqlserver'
+    """
+    # A cancelled turn starts no new statements
+    raise_if_cancelled()
+    candidates = [get_datasource(datasource)] if datasource else _route(analytical)
+    source = pool = pooled = last_error = None
+    for i, source in enumerate(candidates):
+        if not source.breaker.allow():
+            continue
+        fallback = i < len(candidates) - 1
+        try:
+            pool = source.get_pool()
+            pooled = pool.acquire(REPLICA_ACQUIRE_TIMEOUT if fallback and timeout is None else timeout)
+        except PoolTimeout as e:
+            if not fallback:
+                source.breaker.release_trial()
+                raise
+            # An exhausted replica pool counts against the replica; the read goes to the primary
+            source.breaker.record_failure()
+            last_error = e
+            continue
+        except Exception as e:
+            source.breaker.record_failure()
+            last_error = e
+            continue
+        source.breaker.record_success()
+        break
+
+    if pooled is None:
+        names = ", ".join(f"{s.name} (retry in {s.breaker.retry_in():.0f}s)" for s in candidates)
+        detail = f" Last error: {last_error}" if last_error else ""
+        raise DatasourceUnavailable(f"No database connection available: {names}.{detail}") from last_error
+
+    conn = pooled.conn
+    session_id = current_session_id.get()
+    scope = current_statement_scope.get()
+    inflight = _InFlight(conn, source.db_type)
+    with _inflight_lock:
+        _inflight_by_conn[id(conn)] = inflight
+        if session_id:
+            _inflight.setdefault(session_id, set()).add(inflight)
+    discard = False
+    try:
+        if scope is not None:
+            scope.add(inflight)
+        yield conn, source.db_type
+    except Exception:
+        discard = bool(getattr(conn, "closed", 0))
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight_by_conn.pop(id(conn), None)
+            if session_id and session_id in _inflight:
+                _inflight[session_id].discard(inflight)
+                if not _inflight[session_id]:
+                    del _inflight[session_id]
+        if scope is not None:
+            scope.discard(inflight)
+        pool.release(pooled, discard=discard)
+
+
+def open_cursor(connection, db_type: str, streaming: bool = False, batch_size: int = 500):
+    """
+    Opens a cursor on a connection borrowed via get_connection().
+
+    With ``streaming`` rows are read in batches instead of being buffered
+    client-side; PostgreSQL needs a named (server-side) cursor for that,
+    pyodbc cursors stream by default.
+    """
+    if db_type == "postgresql" and streaming:
+        cursor = connection.cursor(name=f"query_{uuid.uuid4().hex}")
+        cursor.itersize = batch_size
+    else:
+        cursor = connection.cursor()
+        if db_type != "postgresql":
+            cursor.arraysize = batch_size
+    with _inflight_lock:
+        inflight = _inflight_by_conn.get(id(connection))
+        if inflight is not None:
+            inflight.cursors.append(cursor)
+    return cursor
+
+
+def cancel_session_queries(session_id: str) -> int:
+    """Cancels every statement currently running for a chat session. Returns how many were signalled."""
+    with _inflight_lock:
+        inflight = list(_inflight.pop(session_id, ()))
+    for query in inflight:
+        query.cancel()
+    return len(inflight)
+
+
+def _estimate_cost(connection, db_type: str, query: str) -> tuple[float, float]:
+    """Returns the planner's (total cost, estimated rows) without running the query."""
+    cursor = connection.cursor()
+    try:
+        if db_type == "postgresql":
+            cursor.execute("EXPLAIN (FORMAT JSON) " + query)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            top = plan[0]["Plan"]
+            return float(top["Total Cost"]), float(top["Plan Rows"])
+
+        cursor.execute("SET SHOWPLAN_XML ON")
+        try:
+            cursor.execute(query)
+            plan_xml = cursor.fetchone()[0]
+        finally:
+            cursor.execute("SET SHOWPLAN_XML OFF")
+        cost = re.search(r'StatementSubTreeCost="([^"]+)"', plan_xml)
+        rows = re.search(r'StatementEstRows="([^"]+)"', plan_xml)
+        return float(cost.group(1)) if cost else 0.0, float(rows.group(1)) if rows else 0.0
+    finally:
+        cursor.close()
+
+
+def check_query_cost(connection, db_type: str, query: str) -> None:
+    """
+    Runs EXPLAIN first and raises QueryRejected if the estimate is over budget.
+    Planner failures are ignored here; the real execution will report them.
+    """
+    if not QUERY_COST_CHECK:
+        return
+    try:
+        cost, rows = _estimate_cost(connection, db_type, query)
+    except Exception:
+        connection.rollback()
+        return
+    max_cost = QUERY_MAX_COST.get(db_type, float("inf"))
+    if cost > max_cost or rows > QUERY_MAX_ESTIMATED_ROWS:
+        raise QueryRejected(
+            f"Query rejected: estimated cost {cost:,.0f} (limit {max_cost:,.0f}), "
+            f"estimated rows {rows:,.0f} (limit {QUERY_MAX_ESTIMATED_ROWS:,.0f}). "
+            "Add filters, aggregate the data or select fewer columns/tables."
+        )
+
+
+def current_datasource() -> str:
+    """Name of the logical database queries read from; replicas serve the same data, so this is the primary."""
+    return get_datasource().name
+
+
+def current_db_type() -> str:
+    """SQL dialect of the configured datasources: 'postgresql' or 'sqlserver'."""
+    return get_datasource().db_type
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _registry_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=POOL_MAX_SIZE, thread_name_prefix="db")
+    return _executor
+
+
+async def run_in_db_executor(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run blocking database code on the bounded DB executor and await the result.
+
+    Context variables are propagated, so callbacks and per-session state set by
+    the caller stay visible inside ``func``.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_get_executor(), functools.partial(ctx.run, func, *args, **kwargs))
+
+
+def pool_stats() -> dict:
+    """Per-datasource pool and circuit-breaker metrics; empty until the registry is resolved."""
+    if _datasources is None:
+        return {}
+    return {name: source.stats() for name, source in _datasources.items()}
+
+
+def close_pool() -> None:
+    global _executor
+    with _registry_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        for source in (_datasources or {}).values():
+            if source.pool is not None:
+                source.pool.close()
+                source.pool = None
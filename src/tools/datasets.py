@@ -0,0 +1,144 @@
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from src.tools.query_cache import CachedResult
+
+load_dotenv()
+
+DATASET_STORE_MAX_BYTES = int(os.getenv("DATASET_STORE_MAX_BYTES", str(32 * 1024 * 1024)))
+DATASET_TTL = float(os.getenv("DATASET_TTL", "1800"))
+DATASET_MAX_PER_SESSION = int(os.getenv("DATASET_MAX_PER_SESSION", "20"))
+
+
+@dataclass
+class Dataset:
+    """A query result a session can chart by handle instead of re-running its SQL."""
+
+    id: str
+    session_id: str
+    query: str
+    result: CachedResult
+    created_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def complete(self) -> bool:
+        return self.result.complete
+
+    @property
+    def kept_rows(self) -> int:
+        """Rows actually held; fewer than the query returned when the result was capped."""
+        _, total = self.result.head(0)
+        return total - self.result.more_rows
+
+    def describe(self) -> str:
+        """One line for prompts: handle, shape, columns and the SQL it came from."""
+        columns = ", ".join(f'"{c}"' for c in self.result.columns)
+        size = f"{self.kept_rows} rows" if self.complete else f"first {self.kept_rows} rows of a larger result"
+        return f"{self.id} ({size}; columns: {columns}) from: {' '.join(self.query.split())}"
+
+
+class DatasetStore:
+    """
+    Short-lived, session-scoped store of query results.
+
+    Results are shared with the query cache entry they came from, not copied.
+    Handles expire after ``ttl`` seconds, each session keeps its latest
+    ``max_per_session`` results, and the oldest ones are dropped when the
+    store exceeds ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DATASET_STORE_MAX_BYTES,
+        ttl: float = DATASET_TTL,
+        max_per_session: int = DATASET_MAX_PER_SESSION,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_per_session = max_per_session
+
+        self._lock = threading.Lock()
+        self._datasets: "OrderedDict[str, Dataset]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def put(self, session_id: str, query: str, result: CachedResult) -> Optional[Dataset]:
+        """Stores a result for the session and returns its handle; None if it is too large."""
+        if result.nbytes > self.max_bytes // 4:
+            return None
+        with self._lock:
+            # The same SQL in the same session keeps one handle
+            for existing in self._datasets.values():
+                if existing.session_id == session_id and existing.query == query:
+                    self._remove(existing.id)
+                    break
+            dataset = Dataset(id=f"ds_{secrets.token_hex(3)}", session_id=session_id, query=query, result=result)
+            self._datasets[dataset.id] = dataset
+            self._bytes += result.nbytes
+            self._evict(session_id)
+            return dataset
+
+    def get(self, dataset_id: str, session_id: str) -> Optional[Dataset]:
+        with self._lock:
+            self._expire()
+            dataset = self._datasets.get(dataset_id.strip())
+            if dataset is None or dataset.session_id != session_id:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return dataset
+
+    def list(self, session_id: str, limit: int = 5) -> list[Dataset]:
+        """The session's most recent datasets, newest first."""
+        with self._lock:
+            self._expire()
+            own = [d for d in self._datasets.values() if d.session_id == session_id]
+            return own[::-1][:limit]
+
+    def drop_session(self, session_id: str) -> None:
+        with self._lock:
+            for dataset_id in [k for k, d in self._datasets.items() if d.session_id == session_id]:
+                self._remove(dataset_id)
+
+    def _remove(self, dataset_id: str) -> None:
+        """Caller holds the lock."""
+        dataset = self._datasets.pop(dataset_id, None)
+        if dataset is not None:
+            self._bytes -= dataset.result.nbytes
+
+    def _expire(self) -> None:
+        """Caller holds the lock."""
+        now = time.monotonic()
+        for dataset_id in [k for k, d in self._datasets.items() if now - d.created_at > self.ttl]:
+            self._remove(dataset_id)
+
+    def _evict(self, session_id: str) -> None:
+        """Caller holds the lock."""
+        self._expire()
+        own = [k for k, d in self._datasets.items() if d.session_id == session_id]
+        for dataset_id in own[:max(0, len(own) - self.max_per_session)]:
+            self._remove(dataset_id)
+        while self._bytes > self.max_bytes and self._datasets:
+            self._remove(next(iter(self._datasets)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "datasets": len(self._datasets),
+                "sessions": len({d.session_id for d in self._datasets.values()}),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+dataset_store = DatasetStore()
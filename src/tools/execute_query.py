@@ -1,87 +1,125 @@
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
 from dotenv import load_dotenv
 load_dotenv()
+import asyncio
 import os
 import json
+from src.tools.database import (
+    STATEMENT_TIMEOUT,
+    StatementScope,
+    check_query_cost,
+    current_statement_scope,
+    is_statement_timeout,
+    current_datasource,
+    current_db_type,
+    get_connection,
+    open_cursor,
+    run_in_db_executor,
+)
+from src.context import current_session_id, raise_if_cancelled
+from src.tools.datasets import dataset_store
+from src.tools.query_cache import QUERY_CACHE_ENABLED, CachedResult, query_cache
+from src.tools.sql_guard import UnsafeQuery, enforce_limit
+from src.tools.result_format import DEFAULT_RESULT_FORMAT, RowEncoder
 
-def check_query_safety(query: str) -> bool:
+# Hard caps on what a single tool call can hand back to the model
+MAX_RESULT_ROWS = int(os.getenv("QUERY_MAX_ROWS", "200"))
+MAX_RESULT_BYTES = int(os.getenv("QUERY_MAX_BYTES", "32768"))
+FETCH_BATCH_SIZE = int(os.getenv("QUERY_FETCH_BATCH_SIZE", "500"))
+# Rows past the cap are only counted, and only up to this many; the LIMIT
+# injected into unbounded queries is MAX_RESULT_ROWS + MAX_COUNTED_ROWS
+MAX_COUNTED_ROWS = int(os.getenv("QUERY_MAX_COUNTED_ROWS", "10000"))
+# execute_queries: statements per call, and the client-side budget for each one
+MAX_BATCH_QUERIES = int(os.getenv("QUERY_MAX_BATCH", "6"))
+BATCH_QUERY_TIMEOUT = float(os.getenv("QUERY_BATCH_TIMEOUT", str(STATEMENT_TIMEOUT + 5)))
+
+# Prefix of the error returned for a statement stopped by its timeout (or a cancel), on any driver
+_TIMEOUT_ERROR = "Error: query timed out or was cancelled"
+
+def _fetch_result(cursor) -> tuple[list, list, int]:
     """
-    Checks if the query is safe to execute.
+    Reads an executed cursor in fetchmany() batches.
+
+    At most MAX_RESULT_ROWS rows are kept; any remaining rows are counted (not
+    kept) so memory stays flat regardless of the table size.
+
+    Returns:
+        tuple: (columns, rows, more_rows)
     """
-    dangerous_keywords = ["DROP", "DELETE", "TRUNCATE", "ALTER", "CREATE", "INSERT", "UPDATE", "GRANT", "REVOKE", "EXEC", "EXECUTE"]
-    for keyword in dangerous_keywords:
-        if keyword.lower() in query.lower():
-            return False
-    return True
+    rows: list = []
+    more = 0
+
+    while more < MAX_COUNTED_ROWS:
+        batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not batch:
+            break
+        raise_if_cancelled()
+        room = MAX_RESULT_ROWS - len(rows)
+        if room > 0:
+            rows.extend(batch[:room])
+        more += max(0, len(batch) - room)
+
+    # Named cursors only expose a description once the first batch is fetched
+    columns = [desc[0] for desc in cursor.description] if cursor.description else []
+    return columns, rows, more
 
-def _get_database_connection():
+def _render_result(columns: list, rows: list, more: int = 0, fmt: str = DEFAULT_RESULT_FORMAT) -> str:
     """
-    Establishes a database connection to either PostgreSQL or SQL Server.
-    Tries PostgreSQL first, then falls back to SQL Server.
-    
-    Returns:
-        tuple: (connection, db_type) where db_type is 'postgresql' or 'sqlserver'
+    Renders a fetched result in a single pass.
+
+    The default "csv" format is a header row followed by plain values, which
+    costs far fewer tokens than Python reprs; see src/tools/result_format.py.
+    Output stops at MAX_RESULT_BYTES and anything not shown is reported with an
+    explicit truncation marker.
     """
-    # Check for PostgreSQL environment variables
-    pg_host = os.getenv("host")
-    pg_port = os.getenv("port")
-    pg_dbname = os.getenv("dbname")
-    pg_user = os.getenv("user")
-    pg_password = os.getenv("password")
-    
-    # Check for SQL Server environment variables
-    sql_server = os.getenv("server")
-    sql_database = os.getenv("database")
-    sql_username = os.getenv("username")
-    
-    # Try PostgreSQL connection first
-    if pg_host and pg_dbname and pg_user and pg_password:
-        try:
-            import psycopg2
-            connection = psycopg2.connect(
-                user=pg_user,
-                password=pg_password,
-                host=pg_host,
-                port=pg_port or "5432",
-                dbname=pg_dbname
-            )
-            return connection, "postgresql"
-        except ImportError:
-            pass  # psycopg2 not installed, try SQL Server
-        except Exception:
-            pass  # Connection failed, try SQL Server
-    
-    # Try SQL Server connection
-    if sql_server and sql_database and sql_username:
-        try:
-            import pyodbc
-            sql_password = os.getenv("password")
-            sql_driver = os.getenv("driver", "{ODBC Driver 17 for SQL Server}")
-            
-            connection_string = (
-                f"DRIVER={sql_driver};"
-                f"SERVER={sql_server};"
-                f"DATABASE={sql_database};"
-                f"UID={sql_username};"
-                f"PWD={sql_password};"
-            )
-            
-            connection = pyodbc.connect(connection_string)
-            return connection, "sqlserver"
-        except ImportError:
-            pass  # pyodbc not installed
-        except Exception:
-            pass  # Connection failed
-    
-    # If we get here, no connection was established
-    raise Exception(
-        "Could not establish database connection. Please check your .env file.\n"
-        "For PostgreSQL, provide: host, port, dbname, user, password\n"
-        "For SQL Server, provide: server, database, username, password"
+    if not rows:
+        return "Query executed successfully. No rows returned."
+
+    encoder = RowEncoder(columns, fmt)
+    header = encoder.header()
+    parts: list[str] = [header]
+    size = len(header.encode("utf-8"))
+    shown = 0
+
+    for row in rows:
+        line = encoder.row(shown + 1, row)
+        line_size = len(line.encode("utf-8"))
+        if size + line_size > MAX_RESULT_BYTES:
+            break
+        parts.append(line)
+        size += line_size
+        shown += 1
+
+    more += len(rows) - shown
+    if not more:
+        return f"Query returned {shown} row(s):\n\n" + "".join(parts)
+
+    counted = f"at least {more}" if more >= MAX_COUNTED_ROWS else str(more)
+    return (
+        f"Query returned more rows than can be shown; showing the first {shown}:\n\n"
+        + "".join(parts)
+        + f"\n... truncated: {counted} more row(s) not shown "
+        f"(limit {MAX_RESULT_ROWS} rows / {MAX_RESULT_BYTES} bytes). "
+        "Narrow the query with filters, aggregation or LIMIT.\n"
     )
 
-@tool
-def execute_query(query: str) -> str:
+def _format_results(cursor, fmt: str = DEFAULT_RESULT_FORMAT) -> str:
+    """Fetches and renders an executed cursor."""
+    columns, rows, more = _fetch_result(cursor)
+    return _render_result(columns, rows, more, fmt)
+
+def _dataset_note(query: str, result: CachedResult) -> str:
+    """Keeps the result as a session dataset and tells the agent its handle."""
+    session_id = current_session_id.get()
+    if session_id is None:
+        return ""
+    dataset = dataset_store.put(session_id, query, result)
+    if dataset is None:
+        return ""
+    return f'\n\nDataset: {dataset.id} (pass dataset="{dataset.id}" to a chart tool to plot this result without re-running the SQL)'
+
+
+def _execute_query(query: str) -> str:
     """
     Executes a given SQL query on the database and returns the results.
     Automatically detects and connects to either PostgreSQL or SQL Server.
@@ -97,39 +135,105 @@ def execute_query(query: str) -> str:
     Returns:
         A string representation of the query results.   
     """
-    connection = None
-    cursor = None
-    
     try:
-        # Check query safety
-        if not check_query_safety(query):
-            return "Error: Query is not safe to execute. Only SELECT queries are allowed."
-        
-        # Establish connection
-        connection, db_type = _get_database_connection()
-        
-        # Execute query
-        cursor = connection.cursor()
-        cursor.execute(query)
-        results = cursor.fetchall()
+        # Check query safety on the parsed AST and cap the row count in the SQL itself
+        try:
+            safe_query = enforce_limit(query, current_db_type(), MAX_RESULT_ROWS + MAX_COUNTED_ROWS)
+        except UnsafeQuery as e:
+            return f"Error: Query is not safe to execute. {e} Only a single read-only SELECT is allowed."
         
-        # Format results as string
-        if not results:
-            return "Query executed successfully. No rows returned."
+        # Identical SQL answered recently (e.g. by the other agent) is served from the cache
+        datasource = current_datasource()
+        cached = query_cache.get(datasource, query) if QUERY_CACHE_ENABLED else None
+        if cached is not None:
+            rows, more = cached.head(MAX_RESULT_ROWS)
+            return _render_result(cached.columns, rows, more) + _dataset_note(query, cached)
         
-        # Convert results to readable format
-        result_str = f"Query returned {len(results)} row(s):\n\n"
-        for i, row in enumerate(results, 1):
-            result_str += f"Row {i}: {row}\n"
+        # Borrow a pooled connection and stream the result in batches
+        with get_connection(analytical=True) as (connection, db_type):
+            check_query_cost(connection, db_type, safe_query)
+            cursor = open_cursor(connection, db_type, streaming=True, batch_size=FETCH_BATCH_SIZE)
+            try:
+                cursor.execute(safe_query)
+                columns, rows, more = _fetch_result(cursor)
+            finally:
+                # Clean up resources; the connection goes back to the pool
+                cursor.close()
         
-        return result_str
+        if QUERY_CACHE_ENABLED:
+            result = query_cache.put(datasource, query, columns, rows, more)
+        else:
+            result = CachedResult.from_rows(query, columns, rows, more)
+        return _render_result(columns, rows, more) + _dataset_note(query, result)
         
     except Exception as e:
+        if is_statement_timeout(e):
+            return f"{_TIMEOUT_ERROR}: {str(e)}"
         return f"Error executing query: {str(e)}"
-    
-    finally:
-        # Clean up resources
-        if cursor:
-            cursor.close()
-        if connection:
-            connection.close()
\ No newline at end of file
+
+
+async def _aexecute_query(query: str) -> str:
+    """Async entry point: runs the blocking driver call on the DB executor so the event loop keeps streaming."""
+    return await run_in_db_executor(_execute_query, query)
+
+
+execute_query = StructuredTool.from_function(
+    func=_execute_query,
+    coroutine=_aexecute_query,
+    name="execute_query",
+)
+
+
+def _execute_queries(queries: list[str]) -> str:
+    """
+    Executes several independent SQL queries concurrently and returns all results in one reply.
+    Use it instead of multiple execute_query calls when a question needs e.g. a total,
+    a breakdown and a top-N that do not depend on each other.
+
+    Important:
+    - Every query is checked and limited exactly like execute_query (SELECT only)
+    - Each result is labelled with its status: ok, error or timeout
+    - At most a handful of queries per call; send dependent queries separately
+
+    Args:
+        queries (list[str]): The SQL queries to run (SELECT statements only).
+
+    Returns:
+        The labelled results of every query, in the order given.
+    """
+    return asyncio.run(_aexecute_queries(queries))
+
+
+async def _aexecute_queries(queries: list[str]) -> str:
+    """Runs the queries side by side on the DB executor / connection pool."""
+    if not queries:
+        return "Error: no queries given."
+    if len(queries) > MAX_BATCH_QUERIES:
+        return f"Error: at most {MAX_BATCH_QUERIES} queries per call, got {len(queries)}."
+
+    async def run_one(query: str) -> tuple[str, str]:
+        # Each query runs in its own task (gather), so this scope covers only its own statement
+        scope = StatementScope()
+        current_statement_scope.set(scope)
+        try:
+            result = await asyncio.wait_for(_aexecute_query(query), BATCH_QUERY_TIMEOUT)
+        except asyncio.TimeoutError:
+            # The executor thread cannot be interrupted: stop the statement so it frees its connection
+            scope.cancel()
+            return "timeout", f"Error: query did not finish within {BATCH_QUERY_TIMEOUT:.0f}s."
+        if not result.startswith("Error"):
+            return "ok", result
+        return ("timeout" if result.startswith(_TIMEOUT_ERROR) else "error"), result
+
+    outcomes = await asyncio.gather(*(run_one(q) for q in queries))
+    return "\n\n".join(
+        f"### Query {i} [{status}]\n{query}\n\n{result}"
+        for i, (query, (status, result)) in enumerate(zip(queries, outcomes), 1)
+    )
+
+
+execute_queries = StructuredTool.from_function(
+    func=_execute_queries,
+    coroutine=_aexecute_queries,
+    name="execute_queries",
+)
@@ -0,0 +1,297 @@
+import asyncio
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+# How often a background task polls table modification counters; cache reads never hit the DB
+QUERY_CACHE_VERSION_CHECK_INTERVAL = float(os.getenv("QUERY_CACHE_VERSION_CHECK_INTERVAL", "10"))
+
+_QUOTED_RE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_TABLE_RE = re.compile(
+    r"\b(?:from|join)\s+((?:\"[^\"]+\"|\[[^\]]+\]|\w+)(?:\s*\.\s*(?:\"[^\"]+\"|\[[^\]]+\]|\w+))?)",
+    re.IGNORECASE,
+)
+
+_TABLE_COUNTER_QUERIES = {
+    "postgresql": "SELECT relname, n_tup_ins + n_tup_upd + n_tup_del FROM pg_stat_user_tables",
+    "sqlserver": (
+        "SELECT OBJECT_NAME(object_id), SUM(user_updates) FROM sys.dm_db_index_usage_stats "
+        "WHERE database_id = DB_ID() GROUP BY object_id"
+    ),
+}
+
+
+def normalize_sql(query: str) -> str:
+    """Collapses whitespace, case and trailing semicolons outside of quoted literals/identifiers."""
+    parts = _QUOTED_RE.split(query.strip().rstrip(";").strip())
+    normalized = []
+    for i, part in enumerate(parts):
+        # Odd indexes are the quoted segments captured by the split
+        normalized.append(part if i % 2 else re.sub(r"\s+", " ", part).lower())
+    return "".join(normalized).strip()
+
+
+def referenced_tables(query: str) -> frozenset:
+    """Best-effort set of (lower-cased, unqualified) table names a query reads from."""
+    tables = set()
+    for match in _TABLE_RE.findall(query):
+        name = re.split(r"\s*\.\s*", match)[-1]
+        tables.add(name.strip('"[]').lower())
+    return frozenset(tables)
+
+
+def _estimate_bytes(rows: list) -> int:
+    """Rough in-memory size of a row list, extrapolated from a sample of rows."""
+    if not rows:
+        return 64
+    sample = rows[:100]
+    sample_size = sum(sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row) for row in sample)
+    return sys.getsizeof(rows) + sample_size * len(rows) // len(sample)
+
+
+@dataclass
+class CachedResult:
+    """
+    A query result as kept in the cache: either a row list (execute_query) or a
+    DataFrame (bulk chart fetch). ``complete`` is False when rows were capped.
+    """
+
+    columns: list
+    rows: Optional[list] = None
+    frame: Any = None
+    more_rows: int = 0
+    tables: frozenset = frozenset()
+    nbytes: int = 0
+    created_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def complete(self) -> bool:
+        return self.more_rows == 0
+
+    def head(self, n: int) -> tuple[list, int]:
+        """First ``n`` rows as tuples, plus how many more rows the result holds."""
+        if self.frame is not None:
+            head = self.frame.head(n)
+            head = head.astype(object).where(head.notna(), None)
+            return list(head.itertuples(index=False, name=None)), len(self.frame) - len(head) + self.more_rows
+        return self.rows[:n], max(0, len(self.rows) - n) + self.more_rows
+
+    @classmethod
+    def from_rows(cls, query: str, columns: list, rows: list, more_rows: int = 0) -> "CachedResult":
+        return cls(
+            columns=list(columns),
+            rows=rows,
+            more_rows=more_rows,
+            tables=referenced_tables(query),
+            nbytes=_estimate_bytes(rows),
+        )
+
+    def to_frame(self):
+        """A DataFrame the caller may freely modify."""
+        import pandas as pd
+
+        if self.frame is not None:
+            return self.frame.copy()
+        return pd.DataFrame(self.rows, columns=self.columns)
+
+
+class QueryCache:
+    """
+    Byte-bounded LRU cache of query results keyed on (datasource, normalized SQL).
+
+    Entries expire after ``ttl`` seconds and are dropped early when the
+    modification counters of a table they read from change, as polled in the
+    background by ``run_version_checks()``.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = QUERY_CACHE_MAX_BYTES,
+        ttl: float = QUERY_CACHE_TTL,
+        version_check_interval: float = QUERY_CACHE_VERSION_CHECK_INTERVAL,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, CachedResult]" = OrderedDict()
+        self._bytes = 0
+
+        self._version_lock = threading.Lock()
+        self._versions: dict[str, dict[str, Any]] = {}
+        self._datasources: set[str] = set()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def key(datasource: str, query: str) -> tuple:
+        return (datasource, normalize_sql(query))
+
+    def get(self, datasource: str, query: str, require_complete: bool = False) -> Optional[CachedResult]:
+        key = self.key(datasource, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created_at > self.ttl:
+                self._remove(key)
+                self._expirations += 1
+                entry = None
+            if entry is None or (require_complete and not entry.complete):
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, datasource: str, query: str, columns: list, rows: list, more_rows: int = 0) -> CachedResult:
+        entry = CachedResult.from_rows(query, columns, rows, more_rows)
+        self._store(datasource, query, entry)
+        return entry
+
+    def put_frame(self, datasource: str, query: str, frame) -> None:
+        self._store(datasource, query, CachedResult(
+            columns=list(frame.columns),
+            frame=frame,
+            tables=referenced_tables(query),
+            nbytes=int(frame.memory_usage(index=True, deep=True).sum()),
+        ))
+
+    def _store(self, datasource: str, query: str, entry: CachedResult) -> None:
+        # A single result may not take more than a quarter of the cache
+        if entry.nbytes > self.max_bytes // 4:
+            return
+        key = self.key(datasource, query)
+        with self._lock:
+            existing = self._entries.get(key)
+            # Never replace a complete result with a capped one for the same query
+            if existing is not None and existing.complete and not entry.complete:
+                return
+            self._remove(key)
+            self._entries[key] = entry
+            self._datasources.add(datasource)
+            self._bytes += entry.nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate_tables(self, datasource: str, tables) -> int:
+        tables = {t.lower() for t in tables}
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if key[0] == datasource and entry.tables & tables
+            ]
+            for key in stale:
+                self._remove(key)
+            self._invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: tuple) -> None:
+        """Caller holds the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def refresh_table_versions(self) -> int:
+        """
+        Polls the table modification counters of every datasource that has had
+        results cached and drops entries reading from changed tables. Blocking;
+        returns the number of entries invalidated.
+        """
+        if not self._version_lock.acquire(blocking=False):
+            return 0  # another thread is already polling
+        try:
+            with self._lock:
+                datasources = list(self._datasources)
+            invalidated = 0
+            for datasource in datasources:
+                counters = _read_table_counters(datasource)
+                if counters is None:
+                    continue
+                previous = self._versions.get(datasource, {})
+                changed = {t for t, v in counters.items() if t in previous and previous[t] != v}
+                self._versions[datasource] = counters
+                if changed:
+                    invalidated += self.invalidate_tables(datasource, changed)
+            return invalidated
+        finally:
+            self._version_lock.release()
+
+    async def run_version_checks(self) -> None:
+        """Background loop: refreshes table versions every ``version_check_interval`` seconds on the DB executor."""
+        from src.tools.database import run_in_db_executor
+
+        while True:
+            await asyncio.sleep(self.version_check_interval)
+            try:
+                invalidated = await run_in_db_executor(self.refresh_table_versions)
+                if invalidated:
+                    logger.info("Invalidated %d cached results of changed tables", invalidated)
+            except Exception as e:
+                logger.warning("Query cache version check failed: %s", e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": QUERY_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
+
+
+def _read_table_counters(datasource: str) -> Optional[dict]:
+    """
+    Returns {table: modification counter}, or None when the catalog can't be read.
+    Always read from the named datasource itself: statistics on a streaming
+    replica do not count replayed writes.
+    """
+    from src.tools.database import get_connection
+
+    try:
+        with get_connection(datasource=datasource) as (connection, db_type):
+            sql = _TABLE_COUNTER_QUERIES.get(db_type)
+            if sql is None:
+                return None
+            cursor = connection.cursor()
+            try:
+                cursor.execute(sql)
+                return {str(name).lower(): count for name, count in cursor.fetchall() if name is not None}
+            finally:
+                cursor.close()
+    except Exception:
+        return None
+
+
+query_cache = QueryCache()
@@ -0,0 +1,182 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from src.tools.read_schema_tool import SCHEMA_PATH, schema_version
+from src.tools.schema_search import tokenize
+
+load_dotenv()
+
+QUESTION_CACHE_ENABLED = os.getenv("QUESTION_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+QUESTION_CACHE_MAX_ENTRIES = int(os.getenv("QUESTION_CACHE_MAX_ENTRIES", "500"))
+QUESTION_CACHE_TTL = float(os.getenv("QUESTION_CACHE_TTL", str(7 * 24 * 3600)))
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_QUOTED_RE = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+
+
+def normalize_question(question: str) -> str:
+    """Lower-cased question with punctuation and repeated whitespace removed."""
+    return " ".join(re.sub(r"[^\w\s.]", " ", question.lower()).split()).strip(" .")
+
+
+def _literals(question: str) -> frozenset:
+    """Numbers and quoted values: two questions only share SQL when these are identical."""
+    quoted = {a or b for a, b in _QUOTED_RE.findall(question.lower())}
+    return frozenset(_NUMBER_RE.findall(question)) | frozenset(quoted)
+
+
+@dataclass
+class CachedSQL:
+    """SQL that answered a question before, plus that answer as a template for the new one."""
+
+    question: str
+    tokens: frozenset
+    literals: frozenset
+    queries: list
+    answer: str
+    fingerprint: str
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+@dataclass
+class QuestionMatch:
+    """
+    A cache lookup result. ``exact`` matches are the same normalized question
+    and their SQL is the answer; other matches only share every content word
+    and literal (different stopwords, plurals or word order), so their SQL is
+    a candidate the model has to check against the new question.
+    """
+
+    entry: CachedSQL
+    exact: bool
+
+
+class QuestionSQLCache:
+    """
+    LRU map from normalized questions to the SQL that answered them.
+
+    Lookups match the normalized question exactly first. Otherwise an entry
+    with the same content words (stopwords dropped, plurals folded) and the
+    same literals is returned as a candidate: any differing word, such as
+    another name or a "not", is a miss. All in process. Every entry is tagged with the schema fingerprint it was derived
+    from; all entries are dropped when tables_schema.json changes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = QUESTION_CACHE_MAX_ENTRIES,
+        ttl: float = QUESTION_CACHE_TTL,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedSQL]" = OrderedDict()
+        self._fingerprint: Optional[tuple[float, str]] = None
+
+        self._hits = 0
+        self._similar_hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def schema_fingerprint(self) -> str:
+        """Content hash of tables_schema.json, recomputed only when its mtime changes."""
+        version = schema_version()
+        if self._fingerprint is None or self._fingerprint[0] != version:
+            try:
+                digest = hashlib.sha1(SCHEMA_PATH.read_bytes()).hexdigest()
+            except OSError:
+                digest = ""
+            self._fingerprint = (version, digest)
+        return self._fingerprint[1]
+
+    def get(self, question: str) -> Optional[QuestionMatch]:
+        if not QUESTION_CACHE_ENABLED:
+            return None
+        fingerprint = self.schema_fingerprint()
+        key = normalize_question(question)
+        tokens = frozenset(tokenize(key))
+        literals = _literals(question)
+        now = time.time()
+
+        with self._lock:
+            stale = [
+                k for k, e in self._entries.items()
+                if e.fingerprint != fingerprint or now - e.created_at > self.ttl
+            ]
+            for k in stale:
+                del self._entries[k]
+            self._invalidations += len(stale)
+
+            entry = self._entries.get(key)
+            exact = entry is not None
+            if entry is None and tokens:
+                entry = next(
+                    (
+                        candidate for candidate in reversed(self._entries.values())
+                        if candidate.tokens == tokens and candidate.literals == literals
+                    ),
+                    None,
+                )
+                if entry is not None:
+                    self._similar_hits += 1
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(entry.question)
+            entry.hits += 1
+            self._hits += 1
+            return QuestionMatch(entry, exact)
+
+    def put(self, question: str, queries: list, answer: str) -> None:
+        if not QUESTION_CACHE_ENABLED or not queries:
+            return
+        key = normalize_question(question)
+        entry = CachedSQL(
+            question=key,
+            tokens=frozenset(tokenize(key)),
+            literals=_literals(question),
+            queries=list(queries),
+            answer=answer,
+            fingerprint=self.schema_fingerprint(),
+        )
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, question: str) -> None:
+        """Drops the entry for a question whose cached SQL stopped working."""
+        with self._lock:
+            if self._entries.pop(normalize_question(question), None) is not None:
+                self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": QUESTION_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "similar_hits": self._similar_hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self._invalidations,
+            }
+
+
+question_cache = QuestionSQLCache()
@@ -4,19 +4,69 @@ import json
 
 SCHEMA_PATH = Path(__file__).parent.parent / "tables_schema.json"
 
-# Module-level cache – loaded once on first access, stays in memory.
+# Module-level cache – loaded on first access, reloaded when the file changes on disk.
 _schema_cache: list | None = None
+_schema_mtime: float | None = None
+_summary_cache: tuple[float, str] | None = None
+
+
+def schema_version() -> float:
+    """Modification time of tables_schema.json; changes whenever the schema is regenerated."""
+    try:
+        return SCHEMA_PATH.stat().st_mtime
+    except OSError:
+        return 0.0
 
 
 def _load_schema() -> list:
-    """Return the cached schema list, reading from disk only on first call."""
-    global _schema_cache
-    if _schema_cache is None:
+    """Return the cached schema list, reading from disk on first call and after the file changes."""
+    global _schema_cache, _schema_mtime
+    mtime = schema_version()
+    if _schema_cache is None or mtime != _schema_mtime:
         with open(SCHEMA_PATH, "r") as file:
             _schema_cache = json.load(file)
+        _schema_mtime = mtime
     return _schema_cache
 
 
+def _first_sentence(text: str) -> str:
+    text = " ".join((text or "").split())
+    end = text.find(". ")
+    return text if end == -1 else text[:end + 1]
+
+
+def summary_line(table: dict, columns: list | None = None) -> str:
+    """
+    ``table(col type, ...) -- first sentence of the description FK ...`` for one
+    schema entry; ``columns`` restricts the listed columns (all by default).
+    """
+    if columns is None:
+        columns = table.get("columns", [])
+    listed = ", ".join(f'"{c["column_name"]}" {c.get("data_type") or ""}'.rstrip() for c in columns)
+    line = f'{table["table_name"]}({listed})'
+    if table.get("description"):
+        line += f" -- {_first_sentence(table['description'])}"
+    for rel in table.get("relationships") or []:
+        line += f' FK "{rel["column"]}" -> {rel["references_table"]}."{rel["references_column"]}"'
+    return line
+
+
+def compact_schema_summary() -> str:
+    """
+    One line per table with column names and types, a one-sentence description
+    and foreign keys – small enough to live in the research agent's system prompt.
+    Rebuilt only when tables_schema.json changes.
+    """
+    global _summary_cache
+    data = _load_schema()
+    if _summary_cache is not None and _summary_cache[0] == _schema_mtime:
+        return _summary_cache[1]
+
+    summary = "\n".join(summary_line(table) for table in data)
+    _summary_cache = (_schema_mtime, summary)
+    return summary
+
+
 @tool
 def read_schema_tool(table_name: str) -> str:
     """
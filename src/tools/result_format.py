@@ -0,0 +1,64 @@
+import csv
+import io
+import os
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Sequence
+
+# "csv" / "tsv": header row + one line per row with plain values (compact, token-cheap)
+# "rows": the legacy "Row N: (Decimal('1.5'), ...)" Python repr format
+RESULT_FORMATS = ("csv", "tsv", "rows")
+DEFAULT_RESULT_FORMAT = os.getenv("QUERY_RESULT_FORMAT", "csv").lower()
+
+
+def format_value(value: Any) -> str:
+    """Renders a single cell as plain text instead of its Python repr."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, Decimal):
+        text = format(value, "f")
+        if "." in text:
+            text = text.rstrip("0").rstrip(".")
+        return text or "0"
+    if isinstance(value, float):
+        text = repr(value)
+        return text[:-2] if text.endswith(".0") else text
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(bytes(value))} bytes>"
+    return str(value).strip()
+
+
+class RowEncoder:
+    """Encodes a result set one line at a time so callers can enforce size caps as they go."""
+
+    def __init__(self, columns: Sequence[str], fmt: str = DEFAULT_RESULT_FORMAT) -> None:
+        if fmt not in RESULT_FORMATS:
+            raise ValueError(f"Unknown result format '{fmt}'. Use one of: {', '.join(RESULT_FORMATS)}")
+        self.columns = list(columns)
+        self.fmt = fmt
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    def header(self) -> str:
+        if self.fmt == "rows":
+            return ""
+        return self._line(self.columns)
+
+    def row(self, index: int, row: Sequence[Any]) -> str:
+        if self.fmt == "rows":
+            return f"Row {index}: {row}\n"
+        return self._line([format_value(v) for v in row])
+
+    def _line(self, values: list[str]) -> str:
+        if self.fmt == "tsv":
+            return "\t".join(v.replace("\t", " ").replace("\n", " ") for v in values) + "\n"
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._writer.writerow(values)
+        return self._buffer.getvalue()
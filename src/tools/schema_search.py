@@ -0,0 +1,360 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+from langchain_core.tools import tool
+
+from src.tools.read_schema_tool import SCHEMA_PATH, _load_schema, schema_version, summary_line
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Where the index is persisted; rebuilt incrementally from tables_schema.json
+SCHEMA_INDEX_PATH = Path(os.getenv("SCHEMA_INDEX_PATH", str(SCHEMA_PATH.with_name("schema_index.json"))))
+SCHEMA_SEARCH_TOP_K = int(os.getenv("SCHEMA_SEARCH_TOP_K", "5"))
+# Columns listed per matched table; the best matching ones are kept when a table is wider
+SCHEMA_SEARCH_MAX_COLUMNS = int(os.getenv("SCHEMA_SEARCH_MAX_COLUMNS", "25"))
+# Optional local sentence-transformers model (name in the local HF cache or a path);
+# loaded with local_files_only, never downloaded
+SCHEMA_EMBEDDING_MODEL = os.getenv("SCHEMA_EMBEDDING_MODEL", "")
+
+_INDEX_FORMAT = 1
+_BM25_K1 = 1.5
+_BM25_B = 0.75
+# Wide tables keep their first columns (ids, keys, dimensions) in search results
+_LEADING_COLUMNS = 6
+# Reciprocal-rank-fusion constant for combining BM25 and embedding rankings
+_RRF_K = 60
+
+_CAMEL_RE = re.compile(r"([a-z0-9])([A-Z])")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was were what "
+    "which who with all any each per show me list give find get".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased word tokens with camelCase / snake_case split and a plural 's' stripped."""
+    tokens = []
+    for token in _TOKEN_RE.findall(_CAMEL_RE.sub(r"\1 \2", text or "").lower()):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _table_terms(table: dict) -> Counter:
+    """Weighted bag of words for one table: name x3, column names x2, descriptions x1."""
+    terms = Counter()
+    for token in tokenize(table["table_name"]):
+        terms[token] += 3
+    for column in table.get("columns", []):
+        for token in tokenize(column["column_name"]):
+            terms[token] += 2
+        terms.update(tokenize(column.get("description") or ""))
+    terms.update(tokenize(table.get("description") or ""))
+    return terms
+
+
+def _table_text(table: dict) -> str:
+    """Text that is embedded for a table."""
+    columns = ", ".join(c["column_name"] for c in table.get("columns", []))
+    return f"{table['table_name']}: {table.get('description') or ''} Columns: {columns}"
+
+
+def _table_hash(table: dict) -> str:
+    return hashlib.sha1(json.dumps(table, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class SchemaIndex:
+    """
+    BM25 index over the tables in tables_schema.json, with an optional local
+    embedding ranking fused in.
+
+    Each table is hashed; update() only re-indexes tables that were added or
+    changed and drops removed ones, and save()/load() persist the per-table term
+    counts (JSON) and vectors (.npz) so restarts do not rebuild from scratch.
+    """
+
+    def __init__(self, path: Path = SCHEMA_INDEX_PATH, embedding_model: str = SCHEMA_EMBEDDING_MODEL) -> None:
+        self.path = Path(path)
+        self.embedding_model = embedding_model
+        self.schema_version: Optional[float] = None
+
+        self._lock = threading.RLock()
+        self._hashes: dict[str, str] = {}
+        self._terms: dict[str, dict[str, int]] = {}
+        self._lengths: dict[str, int] = {}
+        self._total_length = 0
+        self._postings: dict[str, dict[str, int]] = defaultdict(dict)
+
+        self._encoder = None
+        self._vectors: dict = {}
+        self._matrix = None  # (names, stacked vectors), rebuilt lazily after updates
+
+    # ── building ──
+
+    def _add(self, name: str, table_hash: str, terms: dict) -> None:
+        self._hashes[name] = table_hash
+        self._terms[name] = terms
+        length = sum(terms.values())
+        self._lengths[name] = length
+        self._total_length += length
+        for term, tf in terms.items():
+            self._postings[term][name] = tf
+
+    def _remove(self, name: str) -> None:
+        terms = self._terms.pop(name, {})
+        self._hashes.pop(name, None)
+        self._total_length -= self._lengths.pop(name, 0)
+        self._vectors.pop(name, None)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(name, None)
+                if not postings:
+                    del self._postings[term]
+
+    def update(self, tables: list) -> tuple[int, int]:
+        """
+        Brings the index in line with ``tables``.
+
+        Returns:
+            (tables re-indexed, tables removed)
+        """
+        with self._lock:
+            current = {table["table_name"]: table for table in tables}
+            removed = [name for name in self._hashes if name not in current]
+            for name in removed:
+                self._remove(name)
+
+            changed = []
+            for name, table in current.items():
+                table_hash = _table_hash(table)
+                if self._hashes.get(name) == table_hash:
+                    continue
+                self._remove(name)
+                self._add(name, table_hash, dict(_table_terms(table)))
+                changed.append(table)
+
+            if changed and self._get_encoder() is not None:
+                vectors = self._encoder.encode(
+                    [_table_text(t) for t in changed], batch_size=64, normalize_embeddings=True,
+                    show_progress_bar=False,
+                )
+                for table, vector in zip(changed, vectors):
+                    self._vectors[table["table_name"]] = vector
+            if changed or removed:
+                self._matrix = None
+            return len(changed), len(removed)
+
+    def _get_encoder(self):
+        if not self.embedding_model:
+            return None
+        if self._encoder is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+
+                self._encoder = SentenceTransformer(self.embedding_model, local_files_only=True)
+            except Exception as e:
+                logger.warning("Schema embeddings disabled, could not load %s locally: %s", self.embedding_model, e)
+                self.embedding_model = ""
+                return None
+        return self._encoder
+
+    # ── persistence ──
+
+    def save(self) -> None:
+        with self._lock:
+            payload = {
+                "format": _INDEX_FORMAT,
+                "schema_version": self.schema_version,
+                "embedding_model": self.embedding_model,
+                "tables": {
+                    name: {"hash": self._hashes[name], "terms": self._terms[name]} for name in self._hashes
+                },
+            }
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w") as file:
+                json.dump(payload, file, separators=(",", ":"))
+            os.replace(tmp, self.path)
+
+            if self.embedding_model and self._vectors:
+                import numpy as np
+
+                names = list(self._vectors)
+                with open(self._vectors_path(), "wb") as file:
+                    np.savez(file, names=np.array(names), vectors=np.stack([self._vectors[n] for n in names]))
+
+    def load(self) -> bool:
+        """Loads a persisted index; returns False when there is none (or it is unusable)."""
+        try:
+            with open(self.path) as file:
+                payload = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if payload.get("format") != _INDEX_FORMAT:
+            return False
+
+        with self._lock:
+            for name, entry in payload.get("tables", {}).items():
+                self._add(name, entry["hash"], entry["terms"])
+            self.schema_version = payload.get("schema_version")
+
+            if self.embedding_model and payload.get("embedding_model") == self.embedding_model:
+                try:
+                    import numpy as np
+
+                    with np.load(self._vectors_path()) as data:
+                        for name, vector in zip(data["names"].tolist(), data["vectors"]):
+                            if name in self._hashes:
+                                self._vectors[name] = vector
+                except (OSError, ValueError, ImportError):
+                    pass
+            # Tables without a stored vector are re-embedded by the next update(); forgetting the
+            # schema version makes get_schema_index() run one now instead of after a schema change
+            missing = [n for n in self._hashes if self.embedding_model and n not in self._vectors]
+            for name in missing:
+                self._hashes[name] = ""
+            if missing:
+                self.schema_version = None
+        return True
+
+    def _vectors_path(self) -> Path:
+        return self.path.with_suffix(".npz")
+
+    # ── searching ──
+
+    def _bm25(self, query_terms: list[str]) -> dict[str, float]:
+        n = len(self._hashes)
+        if not n:
+            return {}
+        avg_length = self._total_length / n or 1.0
+        scores: dict[str, float] = defaultdict(float)
+        for term in set(query_terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for name, tf in postings.items():
+                norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * self._lengths[name] / avg_length)
+                scores[name] += idf * tf * (_BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def _cosine(self, question: str, limit: int) -> list[str]:
+        if not self._vectors or self._get_encoder() is None:
+            return []
+        import numpy as np
+
+        if self._matrix is None:
+            names = list(self._vectors)
+            self._matrix = (names, np.stack([self._vectors[n] for n in names]))
+        names, matrix = self._matrix
+        query = self._encoder.encode([question], normalize_embeddings=True, show_progress_bar=False)[0]
+        similarities = matrix @ query
+        top = np.argsort(-similarities)[:limit]
+        return [names[i] for i in top]
+
+    def search(self, question: str, top_k: int = SCHEMA_SEARCH_TOP_K) -> list[tuple[str, float]]:
+        """The ``top_k`` most relevant table names for ``question`` with their scores."""
+        with self._lock:
+            bm25 = self._bm25(tokenize(question))
+            lexical = sorted(bm25, key=bm25.get, reverse=True)
+            semantic = self._cosine(question, max(top_k * 4, 20))
+            if not semantic:
+                return [(name, round(bm25[name], 4)) for name in lexical[:top_k]]
+
+            # Reciprocal rank fusion of both rankings
+            fused: dict[str, float] = defaultdict(float)
+            for ranking in (lexical[:max(top_k * 4, 20)], semantic):
+                for rank, name in enumerate(ranking):
+                    fused[name] += 1 / (_RRF_K + rank + 1)
+            ranked = sorted(fused, key=fused.get, reverse=True)[:top_k]
+            return [(name, round(fused[name], 4)) for name in ranked]
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+
+def relevant_columns(table: dict, question: str, limit: int = SCHEMA_SEARCH_MAX_COLUMNS) -> list:
+    """
+    All columns of narrow tables. For wide ones the leading key/dimension columns
+    plus the columns that best match the question, ``limit`` in total, in table order.
+    """
+    columns = table.get("columns", [])
+    if len(columns) <= limit:
+        return columns
+    terms = set(tokenize(question))
+    leading = min(_LEADING_COLUMNS, limit // 2)
+
+    def score(column):
+        name_hits = len(terms.intersection(tokenize(column["column_name"])))
+        description_hits = len(terms.intersection(tokenize(column.get("description") or "")))
+        return 2 * name_hits + description_hits
+
+    ranked = sorted(range(leading, len(columns)), key=lambda i: (-score(columns[i]), i))[:limit - leading]
+    return columns[:leading] + [columns[i] for i in sorted(ranked)]
+
+
+_index: Optional[SchemaIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_schema_index() -> SchemaIndex:
+    """
+    The process-wide index: loaded from disk on first use and updated
+    incrementally whenever tables_schema.json changes.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SchemaIndex()
+            _index.load()
+        version = schema_version()
+        if _index.schema_version != version:
+            added, removed = _index.update(_load_schema())
+            _index.schema_version = version
+            if added or removed:
+                logger.info("Schema index: %d table(s) re-indexed, %d removed", added, removed)
+            try:
+                _index.save()
+            except OSError as e:
+                logger.warning("Could not persist schema index to %s: %s", _index.path, e)
+        return _index
+
+
+@tool
+def search_schema(question: str, top_k: int = SCHEMA_SEARCH_TOP_K) -> str:
+    """
+    Finds the tables (and their most relevant columns) for a question, without
+    listing the whole database. Use it before writing SQL when you do not know
+    which tables hold the data.
+
+    Args:
+        question: The user's question or the data you are looking for.
+        top_k: How many tables to return (default 5).
+
+    Returns:
+        One line per matching table: table("column" type, ...) -- description FK ...
+    """
+    try:
+        index = get_schema_index()
+        tables = {table["table_name"]: table for table in _load_schema()}
+        matches = [name for name, _ in index.search(question, top_k) if name in tables]
+        if not matches:
+            return "No matching tables found. Call get_tables to list all tables."
+        return "\n".join(summary_line(tables[name], relevant_columns(tables[name], question)) for name in matches)
+    except Exception as e:
+        return f"Error searching schema: {e}"
@@ -0,0 +1,116 @@
+from typing import Optional
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError
+
+_DIALECTS = {"postgresql": "postgres", "sqlserver": "tsql"}
+
+# Statement / clause node types that are never allowed anywhere in the tree
+# (covers data-modifying CTEs, SELECT ... INTO, FOR UPDATE, SET, EXEC, ...)
+_FORBIDDEN_NODES = tuple(
+    getattr(exp, name)
+    for name in (
+        "Insert", "Update", "Delete", "Merge", "Create", "Drop", "Alter", "TruncateTable",
+        "Grant", "Revoke", "Command", "Set", "Into", "Copy", "Use", "Transaction", "Commit",
+        "Rollback", "Pragma", "LoadData", "Lock", "Analyze", "Kill", "Execute",
+    )
+    if hasattr(exp, name)
+)
+
+# Side-effecting / server-level functions a read-only SELECT could still call.
+# A denylist cannot be complete: PostgreSQL tool connections also run every
+# statement in a read-only transaction (see database.DB_READ_ONLY).
+_FORBIDDEN_FUNCTIONS = {
+    "pg_sleep", "pg_terminate_backend", "pg_cancel_backend", "pg_reload_conf", "pg_read_file",
+    "pg_read_binary_file", "pg_ls_dir", "pg_stat_file", "lo_import", "lo_export", "dblink",
+    "dblink_exec", "set_config", "pg_advisory_lock", "pg_advisory_xact_lock", "nextval", "setval",
+    "openrowset", "opendatasource", "openquery", "xp_cmdshell",
+    "lo_creat", "lo_create", "lo_unlink", "lo_put", "lo_from_bytea", "lo_open", "lowrite",
+    "lo_truncate", "lo_truncate64", "txid_current", "pg_current_xact_id", "pg_notify",
+    "pg_logical_emit_message", "pg_switch_wal", "pg_create_restore_point", "pg_promote",
+    "pg_rotate_logfile", "pg_log_backend_memory_contexts", "pg_stat_reset",
+}
+# Whole families of functions with side effects (large objects, locks, replication, WAL)
+_FORBIDDEN_FUNCTION_PREFIXES = (
+    "lo_", "pg_advisory", "pg_try_advisory", "pg_logical_", "pg_replication_", "pg_create_",
+    "pg_drop_", "pg_copy_", "pg_wal_", "pg_stat_reset", "dblink", "xp_", "sp_",
+)
+
+
+class UnsafeQuery(ValueError):
+    """Raised when a query is not a single read-only SELECT."""
+
+
+def _dialect(db_type: str) -> str:
+    return _DIALECTS.get(db_type, "postgres")
+
+
+def parse_select(query: str, db_type: str = "postgresql") -> exp.Query:
+    """
+    Parses ``query`` and returns its AST if it is exactly one read-only
+    SELECT / WITH ... SELECT / set operation; raises UnsafeQuery otherwise.
+    """
+    try:
+        statements = [s for s in sqlglot.parse(query, read=_dialect(db_type)) if s is not None]
+    except ParseError as e:
+        raise UnsafeQuery(f"Could not parse SQL: {e}") from e
+
+    if len(statements) != 1:
+        raise UnsafeQuery(f"Exactly one statement is allowed, got {len(statements)}.")
+    root = statements[0]
+    if not isinstance(root, exp.Query):
+        raise UnsafeQuery(f"Only SELECT queries are allowed, got {root.key.upper()}.")
+
+    for node in root.walk():
+        if isinstance(node, _FORBIDDEN_NODES):
+            raise UnsafeQuery(f"{node.key.upper()} is not allowed in a read-only query.")
+        if isinstance(node, exp.Func):
+            name = (node.name if isinstance(node, exp.Anonymous) else node.sql_name()).lower()
+            if name in _FORBIDDEN_FUNCTIONS or name.startswith(_FORBIDDEN_FUNCTION_PREFIXES):
+                raise UnsafeQuery(f"Function {name}() is not allowed.")
+    return root
+
+
+def _literal_int(node: Optional[exp.Expression]) -> Optional[int]:
+    if isinstance(node, exp.Literal) and not node.is_string:
+        try:
+            return int(node.this)
+        except ValueError:
+            return None
+    return None
+
+
+def enforce_limit(query: str, db_type: str = "postgresql", max_rows: int = 1000) -> str:
+    """
+    Validates ``query`` with parse_select() and makes sure the outermost query
+    returns at most ``max_rows`` rows, injecting LIMIT/TOP when missing and
+    clamping larger literal limits. The original text is returned untouched
+    when no rewrite is needed.
+    """
+    root = parse_select(query, db_type)
+
+    limit = root.args.get("limit")
+    if isinstance(limit, exp.Fetch):
+        current = _literal_int(limit.args.get("count"))
+        if current is not None and current <= max_rows:
+            return query
+        limit.set("count", exp.Literal.number(max_rows))
+    elif limit is not None:
+        current = _literal_int(limit.expression)
+        if current is not None and current <= max_rows:
+            return query
+        limit.set("expression", exp.Literal.number(max_rows))
+    else:
+        root = root.limit(max_rows, copy=False)
+
+    return root.sql(dialect=_dialect(db_type))
+
+
+def check_query_safety(query: str, db_type: str = "postgresql") -> bool:
+    """Returns True if the query is a single read-only SELECT."""
+    try:
+        parse_select(query, db_type)
+        return True
+    except UnsafeQuery:
+        return False
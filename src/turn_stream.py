@@ -0,0 +1,131 @@
+import logging
+import os
+import threading
+import uuid
+from collections import deque
+from typing import Callable, Optional
+
+from dotenv import load_dotenv
+from starlette.websockets import WebSocketDisconnect
+
+from src.ws_frames import FrameSender
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Events of the latest turn kept per session for clients that reconnect mid-turn
+WS_TURN_BUFFER_EVENTS = int(os.getenv("WS_TURN_BUFFER_EVENTS", "2000"))
+# A turn with no client attached for this long is cancelled
+WS_RESUME_GRACE = float(os.getenv("WS_RESUME_GRACE", "30"))
+
+
+class ResumeStats:
+    """Detached, resumed and orphaned turns, for /metrics."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._detached = 0
+        self._resumed = 0
+        self._replayed = 0
+        self._gaps = 0
+        self._orphaned = 0
+
+    def record_detach(self) -> None:
+        with self._lock:
+            self._detached += 1
+
+    def record_resume(self, replayed: int, gap: bool) -> None:
+        with self._lock:
+            self._resumed += 1
+            self._replayed += replayed
+            self._gaps += int(gap)
+
+    def record_orphaned(self) -> None:
+        with self._lock:
+            self._orphaned += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "buffer_events": WS_TURN_BUFFER_EVENTS,
+                "resume_grace_seconds": WS_RESUME_GRACE,
+                "detached": self._detached,
+                "resumed": self._resumed,
+                "replayed_events": self._replayed,
+                "resumed_with_gap": self._gaps,
+                "orphaned_turns_cancelled": self._orphaned,
+            }
+
+
+resume_stats = ResumeStats()
+
+
+class TurnStream:
+    """
+    Server events of a session's turns, decoupled from the socket.
+
+    ``begin()`` starts a turn with a new id; every event sent after that gets
+    the next sequence number (``seq``) and is kept in a bounded buffer, then
+    forwarded to the attached FrameSender, if any. A socket that goes away
+    only detaches the listener: the turn keeps streaming into the buffer, and
+    a reconnecting client replays what it missed with ``replay()``.
+    ``on_detach`` is called whenever the listener goes away, whether the
+    socket handler detached it or a send found the client gone.
+    """
+
+    def __init__(
+        self,
+        max_events: int = WS_TURN_BUFFER_EVENTS,
+        on_detach: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.turn_id: Optional[str] = None
+        self.seq = 0
+        self.listener: Optional[FrameSender] = None
+        self.on_detach = on_detach
+        self._events: deque[dict] = deque(maxlen=max_events)
+
+    def begin(self) -> str:
+        self.turn_id = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self._events.clear()
+        return self.turn_id
+
+    async def send(self, event: dict) -> None:
+        self.seq += 1
+        event = {**event, "seq": self.seq}
+        self._events.append(event)
+        listener = self.listener
+        if listener is None:
+            return
+        try:
+            # A copy: the sender merges text into the events it queues
+            await listener.send(dict(event))
+        except WebSocketDisconnect:
+            self.detach(listener)
+
+    def replay(self, turn_id: str, after: int) -> Optional[list[dict]]:
+        """
+        Copies of the buffered events of ``turn_id`` with a sequence number
+        above ``after``; None if that turn is not buffered or events after
+        ``after`` were already evicted.
+        """
+        if turn_id != self.turn_id:
+            return None
+        if after < self.seq and (not self._events or self._events[0]["seq"] > after + 1):
+            return None
+        return [dict(event) for event in self._events if event["seq"] > after]
+
+    def attach(self, listener: FrameSender) -> None:
+        """Makes ``listener`` the socket the turn streams to (replacing any other)."""
+        self.listener = listener
+
+    def detach(self, listener: FrameSender) -> bool:
+        """Stops streaming to ``listener``; False if it was not the attached one."""
+        if self.listener is not listener:
+            return False
+        self.listener = None
+        resume_stats.record_detach()
+        if self.on_detach is not None:
+            self.on_detach()
+        return True
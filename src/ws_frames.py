@@ -0,0 +1,303 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import ormsgpack
+from dotenv import load_dotenv
+from starlette.websockets import WebSocketDisconnect
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Token events of the same type (and agent) arriving within this window go out as one frame
+WS_BATCH_WINDOW = float(os.getenv("WS_BATCH_WINDOW_MS", "30")) / 1000
+# ... unless their text grows past this many characters first
+WS_BATCH_MAX_CHARS = int(os.getenv("WS_BATCH_MAX_CHARS", "2048"))
+# Clients may ask for msgpack binary frames with ?encoding=msgpack
+WS_MSGPACK_ENABLED = os.getenv("WS_MSGPACK_ENABLED", "true").lower() not in ("0", "false", "no")
+
+# Outbound events a connection may queue before text events are merged or dropped
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+# A client that takes longer than this to accept a frame is disconnected
+WS_STALL_TIMEOUT = float(os.getenv("WS_STALL_TIMEOUT", "15"))
+
+COALESCED_TYPES = ("chunk", "reasoning")
+# Progress text may be dropped when a client cannot keep up; answer text never is
+DROPPABLE_TYPES = ("reasoning",)
+
+
+class FrameStats:
+    """Events in, frames out, send queues and the CPU spent encoding and sending, for /metrics."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._events = 0
+        self._frames = {"json": 0, "msgpack": 0}
+        self._bytes = 0
+        self._cpu = 0.0
+        self._depths: dict[int, int] = {}
+        self._high_water = 0
+        self._merged = 0
+        self._dropped = 0
+        self._stalled = 0
+
+    def record_event(self) -> None:
+        with self._lock:
+            self._events += 1
+
+    def record_frame(self, encoding: str, size: int, cpu: float) -> None:
+        with self._lock:
+            self._frames[encoding] += 1
+            self._bytes += size
+            self._cpu += cpu
+
+    def record_depth(self, connection: int, depth: Optional[int]) -> None:
+        """Current queue depth of a connection; None once it is closed."""
+        with self._lock:
+            if depth is None:
+                self._depths.pop(connection, None)
+            else:
+                self._depths[connection] = depth
+                self._high_water = max(self._high_water, depth)
+
+    def record_overflow(self, merged: int = 0, dropped: int = 0) -> None:
+        with self._lock:
+            self._merged += merged
+            self._dropped += dropped
+
+    def record_stall(self) -> None:
+        with self._lock:
+            self._stalled += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            frames = sum(self._frames.values())
+            uptime = time.monotonic() - self._started
+            return {
+                "batch_window_ms": WS_BATCH_WINDOW * 1000,
+                "events": self._events,
+                "frames": frames,
+                "frames_by_encoding": dict(self._frames),
+                "events_per_frame": round(self._events / frames, 2) if frames else 0.0,
+                "frames_per_sec": round(frames / uptime, 2) if uptime else 0.0,
+                "bytes": self._bytes,
+                "send_cpu_seconds": round(self._cpu, 3),
+                "connections": len(self._depths),
+                "queue_depth": sum(self._depths.values()),
+                "queue_depth_max": max(self._depths.values(), default=0),
+                "queue_high_water": self._high_water,
+                "queue_size": WS_SEND_QUEUE_SIZE,
+                "merged_on_overflow": self._merged,
+                "dropped_on_overflow": self._dropped,
+                "stalled_disconnects": self._stalled,
+            }
+
+
+frame_stats = FrameStats()
+
+
+def _same_stream(a: dict, b: dict) -> bool:
+    return a.get("type") == b.get("type") and a.get("agent") == b.get("agent")
+
+
+def _merge_into(target: dict, event: dict) -> None:
+    """Appends ``event``'s text to ``target``; a merged frame carries the last sequence number."""
+    target["data"] += event["data"]
+    if "seq" in event:
+        target["seq"] = event["seq"]
+
+
+class FrameSender:
+    """
+    Per-connection writer for server events.
+
+    Consecutive ``chunk``/``reasoning`` events of the same type and agent are
+    merged (their ``data`` concatenated) and flushed after ``window`` seconds,
+    once ``max_chars`` is reached, or as soon as any other event is sent, so
+    ordering is preserved. With ``binary`` frames are msgpack-encoded bytes
+    instead of JSON text. A merged event keeps the ``seq`` of the last event
+    in it, so a client's last seen sequence number stays exact.
+
+    Frames go into a bounded queue drained by a writer task, so the agent
+    stream never waits on the client. A full queue first merges adjacent
+    text events, then drops reasoning text; answer text and control events
+    are always kept. A client that does not take a frame within
+    ``stall_timeout`` is disconnected, and further sends raise
+    WebSocketDisconnect so the turn stops.
+    """
+
+    def __init__(
+        self,
+        websocket,
+        binary: bool = False,
+        window: float = WS_BATCH_WINDOW,
+        max_chars: int = WS_BATCH_MAX_CHARS,
+        queue_size: int = WS_SEND_QUEUE_SIZE,
+        stall_timeout: float = WS_STALL_TIMEOUT,
+    ) -> None:
+        self.websocket = websocket
+        self.binary = binary
+        self.window = window
+        self.max_chars = max_chars
+        self.queue_size = queue_size
+        self.stall_timeout = stall_timeout
+        self.closed = False
+
+        self._pending: Optional[dict] = None
+        self._parts: list[str] = []
+        self._size = 0
+        self._timer: Optional[asyncio.Task] = None
+
+        self._queue: deque[dict] = deque()
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+    @property
+    def encoding(self) -> str:
+        return "msgpack" if self.binary else "json"
+
+    async def send(self, event: dict) -> None:
+        if self.closed:
+            raise WebSocketDisconnect(code=1011, reason="client stalled or disconnected")
+        frame_stats.record_event()
+        if self.window > 0 and event.get("type") in COALESCED_TYPES and isinstance(event.get("data"), str):
+            if self._pending is not None and not _same_stream(self._pending, event):
+                self.flush()
+            if self._pending is None:
+                self._pending = dict(event)
+                self._timer = asyncio.create_task(self._flush_later())
+            self._parts.append(event["data"])
+            self._size += len(event["data"])
+            if "seq" in event:
+                self._pending["seq"] = event["seq"]
+            if self._size >= self.max_chars:
+                self.flush()
+            return
+        self.flush()
+        self._enqueue(event)
+
+    def flush(self) -> None:
+        """Queues the merged pending event, if any."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending is None:
+            return
+        event, self._pending = self._pending, None
+        event["data"] = "".join(self._parts)
+        self._parts, self._size = [], 0
+        self._enqueue(event)
+
+    async def close(self) -> None:
+        """Flushes and delivers what is queued (up to the stall timeout), then stops the writer."""
+        if not self.closed:
+            self.flush()
+            if self._writer is not None and self._queue:
+                self._queue.append(None)
+                self._ready.set()
+                try:
+                    await asyncio.wait_for(asyncio.shield(self._writer), self.stall_timeout)
+                except (asyncio.TimeoutError, Exception):
+                    pass
+        self.closed = True
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._writer is not None:
+            self._writer.cancel()
+        frame_stats.record_depth(id(self), None)
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window)
+        self._timer = None
+        self.flush()
+
+    def _enqueue(self, event: dict) -> None:
+        if self.closed:
+            return
+        if len(self._queue) >= self.queue_size:
+            self._relieve(event)
+        if self._queue and event.get("type") in COALESCED_TYPES and len(self._queue) >= self.queue_size:
+            tail = self._queue[-1]
+            if tail is not None and _same_stream(tail, event):
+                _merge_into(tail, event)
+                frame_stats.record_overflow(merged=1)
+                return
+            if event.get("type") in DROPPABLE_TYPES:
+                frame_stats.record_overflow(dropped=1)
+                return
+        self._queue.append(event)
+        frame_stats.record_depth(id(self), len(self._queue))
+        self._ready.set()
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._drain())
+
+    def _relieve(self, incoming: dict) -> None:
+        """Full queue: merges adjacent text events of the same stream, then drops reasoning text."""
+        merged: deque[dict] = deque()
+        merges = 0
+        for event in self._queue:
+            previous = merged[-1] if merged else None
+            if (
+                previous is not None and event is not None
+                and event.get("type") in COALESCED_TYPES and _same_stream(previous, event)
+            ):
+                _merge_into(previous, event)
+                merges += 1
+            else:
+                merged.append(event)
+        dropped = 0
+        if len(merged) >= self.queue_size:
+            kept = deque(e for e in merged if e is None or e.get("type") not in DROPPABLE_TYPES)
+            dropped = len(merged) - len(kept)
+            merged = kept
+        self._queue = merged
+        frame_stats.record_overflow(merged=merges, dropped=dropped)
+
+    async def _drain(self) -> None:
+        while True:
+            if not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            event = self._queue.popleft()
+            frame_stats.record_depth(id(self), len(self._queue))
+            if event is None:
+                return
+            try:
+                await asyncio.wait_for(self._write(event), self.stall_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("WebSocket client stalled for %gs, disconnecting", self.stall_timeout)
+                frame_stats.record_stall()
+                await self._abort(1008)
+                return
+            except Exception as e:
+                logger.debug("WebSocket send failed: %s", e)
+                await self._abort(None)
+                return
+
+    async def _abort(self, code: Optional[int]) -> None:
+        self.closed = True
+        self._queue.clear()
+        frame_stats.record_depth(id(self), None)
+        if code is not None:
+            try:
+                await asyncio.wait_for(self.websocket.close(code=code), 1)
+            except Exception:
+                pass
+
+    async def _write(self, event: dict) -> None:
+        started = time.process_time()
+        if self.binary:
+            payload = ormsgpack.packb(event)
+            await self.websocket.send_bytes(payload)
+        else:
+            payload = json.dumps(event)
+            await self.websocket.send_text(payload)
+        frame_stats.record_frame(self.encoding, len(payload), time.process_time() - started)